@@ -1,9 +1,14 @@
+import os
+
 from flask import Flask, session
 from secrets import token_urlsafe
 
 from .prefixmiddleware import PrefixMiddleWare
 
 app = Flask(__name__)
-app.config['SECRET_KEY'] = token_urlsafe(64)   # Way stronger than recommended but hey...
+# Way stronger than recommended but hey...
+# Multiple workers or containers sharing sessions (see sessionStore in config.yml) need the same key.
+# The session store redis refuses to start without it (see YmlConfigurator.initializeSessionManager).
+app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY') or token_urlsafe(64)
 app.config['SESSION_TYPE'] = "redis"
 app.wsgi_app = PrefixMiddleWare(app.wsgi_app, prefix='/api')
\ No newline at end of file
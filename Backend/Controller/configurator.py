@@ -1,11 +1,17 @@
+import os
 import yaml
+from concurrent.futures import ThreadPoolExecutor
 from Pinger.AdvancedMock import AdvancedMockPinger
+from Pinger.ClientPool import VendorClientPool, LazyPinger, createHttpAdapter
 from Pinger.Entities import *
-from Pinger.GeneArt import GeneArt
-from Pinger.IDT import IDT
-from Pinger.Twist import Twist
+from Pinger.GeneArt import GeneArt, GeneArtClient
+from Pinger.IDT import IDT, IDTClient
+from Pinger.OfferCache import InMemoryOfferCache, SqliteOfferCache, CachingPinger
+from Pinger.Screening import ScreeningProfile, ScreeningPinger
+from Pinger.Twist import Twist, TwistClient, PollingStrategy
+from Pinger.Validator import EntityValidator, ValidationLevel
 from .parser import BoostClient
-from .session import SessionManager
+from .session import SessionManager, InMemorySessionManager, RedisSessionManager
 import traceback
 
 # project imports
@@ -31,12 +37,31 @@ class Configurator:
     def initializePinger(self, session: SessionManager) -> ManagedPinger:
         raise NotImplementedError
 
+    #
+    #   Desc:   Configures the session store.
+    #
+    #   @result
+    #           The SessionManager class to create sessions with.
+    #
+    def initializeSessionManager(self):
+        raise NotImplementedError
+
+    #
+    #   Desc:   Starts authenticating at all configured vendors in the background.
+    #           Sessions created before a vendor is ready skip this vendor while searching.
+    #
+    def warmUpVendors(self):
+        raise NotImplementedError
+
 
 #
 #   Desc:   Takes a yaml-file with all configuration-properties
 #
 class YmlConfigurator(Configurator):
 
+    # Classes of the vendor pingers created with a pooled client (see createVendorPinger)
+    vendorPingerClasses = {"PINGER_TWIST": Twist, "PINGER_IDT": IDT, "PINGER_GENEART": GeneArt}
+
     #
     #   Desc:   Constructor
     #
@@ -55,6 +80,18 @@ class YmlConfigurator(Configurator):
     def __init__(self, filename) -> None:
         self.vendors = []
         self.cfg = None
+        self.searchExecutor = None
+        self.maxSearchJobs = 32
+        self.streamBatchSize = 96
+        self.streamKeepAlive = 15
+        self.offerCache = None
+        self.sessionTimeout = 3600
+        self.maxSessions = 1000
+        self.sessionSweepInterval = 60
+        self.sessionStore = "memory"
+        self.redisUrl = None
+        self.clientPool = VendorClientPool()
+        self.boostAdapter = None
 
         # Acquire config from YAML file
         handle = open(filename, "r")
@@ -71,12 +108,47 @@ class YmlConfigurator(Configurator):
                 self.vendors.append(vendorInfo)
                 key = key + 1
 
+        # Shared thread pool for searching all vendors at the same time.
+        # It is bounded, so the number of concurrent vendor requests of the whole process is limited.
+        if cfg_controller.get("parallelSearch", False):
+            self.searchExecutor = ThreadPoolExecutor(max_workers=cfg_controller.get("maxSearchWorkers", 16))
+
+        # Number of search jobs running in the background at the same time
+        self.maxSearchJobs = cfg_controller.get("maxSearchJobs", self.maxSearchJobs)
+
+        # Number of sequences sent per event while streaming offers
+        self.streamBatchSize = cfg_controller.get("streamBatchSize", self.streamBatchSize)
+        # Seconds without events, after which a comment is sent, so proxies keep the stream open
+        self.streamKeepAlive = cfg_controller.get("streamKeepAlive", self.streamKeepAlive)
+
+        # Limits of the session store
+        self.sessionTimeout = cfg_controller.get("sessionTimeout", self.sessionTimeout)
+        self.maxSessions = cfg_controller.get("maxSessions", self.maxSessions)
+        self.sessionSweepInterval = cfg_controller.get("sessionSweepInterval", self.sessionSweepInterval)
+        # The environment overrides the store, so containers can be configured without changing config.yml
+        self.sessionStore = os.environ.get("SESSION_STORE") or cfg_controller.get("sessionStore", "memory")
+        self.redisUrl = os.environ.get("REDIS_URL") or cfg_controller.get("redisUrl", "redis://localhost:6379/0")
+
+        # Objects built by the backend are only validated in strict mode
+        EntityValidator.configure(ValidationLevel(cfg_controller.get("validation", "strict")))
+
+        # Offers shared by all sessions, so sequences searched before are not sent to the vendors again
+        cfg_cache = cfg_controller.get("offerCache", {})
+        if cfg_cache.get("enabled", False):
+            if cfg_cache.get("backend", "memory") == "sqlite":
+                # Stored on disk, so the offers are kept when the backend is restarted
+                self.offerCache = SqliteOfferCache(path=cfg_cache.get("path", "cache/offers.db"),
+                                                   ttl=cfg_cache.get("ttl", 3600))
+            else:
+                self.offerCache = InMemoryOfferCache(ttl=cfg_cache.get("ttl", 3600),
+                                                     maxEntries=cfg_cache.get("maxEntries", 10000))
+
     #
     #   see Configurator.initializePinger
     #
     def initializePinger(self, session: SessionManager) -> ManagedPinger:
         cfg_controller = self.cfg["controller"]
-        pinger = CompositePinger()
+        pinger = CompositePinger(executor=self.searchExecutor)
         pingerIDTuples = []
         key = 0
         for vendor in cfg_controller["vendors"]:
@@ -92,12 +164,36 @@ class YmlConfigurator(Configurator):
                 continue
             if isinstance(newPinger, AdvancedMockPinger):
                 session.addGlobalMessages(["Warning: A mock vendor is being used. Contact an administrator."])
+            # Offers holding state for ordering them can not be used by other sessions
+            if self.offerCache is not None and newPinger.sharedOffers and not isinstance(newPinger, InvalidPinger):
+                newPinger = CachingPinger(newPinger, self.offerCache, pingerInfo[0].key,
+                                          self.getPingerOptions(pingerInfo[1]))
+            # Sequences the vendor is sure to reject are neither sent to the vendor nor looked up in the cache
+            profile = self.getScreeningProfile(pingerInfo[1])
+            if profile is not None and not isinstance(newPinger, InvalidPinger):
+                newPinger = ScreeningPinger(newPinger, profile)
             pinger.registerVendor(vendorInformation=pingerInfo[0], vendorPinger=newPinger)
         return pinger
 
+    #
+    #   see Configurator.initializeSessionManager
+    #
+    def initializeSessionManager(self):
+        if self.sessionStore == "redis":
+            # Every worker must read the session cookies of the others (see app.py)
+            if not os.environ.get("SECRET_KEY"):
+                raise RuntimeError("The session store redis requires the environment variable SECRET_KEY")
+            RedisSessionManager.configure(url=self.redisUrl, idleTimeout=self.sessionTimeout,
+                                          maxSessions=self.maxSessions, sweepInterval=self.sessionSweepInterval)
+            return RedisSessionManager
+        InMemorySessionManager.configure(idleTimeout=self.sessionTimeout, maxSessions=self.maxSessions,
+                                         sweepInterval=self.sessionSweepInterval)
+        return InMemorySessionManager
+
     #
     #   Gets the right pinger for a given pinger identifier.
-    #   Put pinger specific initialization here.
+    #   Pingers of real vendors are ready as soon as their shared client is authenticated (see LazyPinger),
+    #   so creating a session never waits for a vendor.
     #
     #   @param id A valid pinger identifier
     #
@@ -105,45 +201,12 @@ class YmlConfigurator(Configurator):
     #
     def getPingerFromKey(self, id: str) -> BasePinger:
         try:
-            cfg_pinger = self.cfg["pinger"]
-            if id == "PINGER_TWIST":
-                cfg_twist = cfg_pinger["twist"]
-                return Twist(cfg_twist["email"],
-                             cfg_twist["password"],
-                             cfg_twist["apitoken"],
-                             cfg_twist["eutoken"],
-                             cfg_twist["username"],
-                             cfg_twist["firstname"],
-                             cfg_twist["lastname"],
-                             host=cfg_twist["server"])
-            if id == "PINGER_IDT":
-                cfg_idt = cfg_pinger["idt"]
-                pinger = IDT(idt_username=cfg_idt["username"],
-                             idt_password=cfg_idt["password"],
-                             client_id=cfg_idt["client_id"],
-                             client_secret=cfg_idt["client_secret"],
-                             shared_secret=cfg_idt["shared_secret"],
-                             scope=cfg_idt["scope"])
-                token = pinger.getToken()
-                # This may return a message instead of a token in case of failure
-                if isinstance(token, Message):
-                    return token
-                else:
-                    pinger.token = token
-                return pinger
-
-            if id == "PINGER_GENEART":
-                cfg_geneart = cfg_pinger["geneart"]
-                return GeneArt(username=cfg_geneart["username"],
-                               token=cfg_geneart["token"],
-                               server=cfg_geneart["server"],
-                               validate=cfg_geneart["validate"],
-                               status=cfg_geneart["status"],
-                               addToCart=cfg_geneart["addToCart"],
-                               upload=cfg_geneart["upload"],
-                               dnaStrings=cfg_geneart["dnaStrings"],
-                               hqDnaStrings=cfg_geneart["hqDnaStrings"],
-                               timeout=cfg_geneart["timeout"])
+            clientFactory = self.getClientFactory(id)
+            if clientFactory is not None:
+                factory, maxAge = clientFactory
+                return LazyPinger(self.clientPool, id, factory,
+                                  lambda client: self.createVendorPinger(id, client), maxAge,
+                                  sharedOffers=self.vendorPingerClasses[id].sharedOffers)
             if id == "PINGER_MOCK":
                 return AdvancedMockPinger()
             else:
@@ -151,16 +214,196 @@ class YmlConfigurator(Configurator):
         except:
             return InvalidPinger()
 
+    #
+    #   Gets the function creating the authenticated client of a vendor.
+    #   Put client specific initialization here.
+    #
+    #   @param id A valid pinger identifier
+    #
+    #   @result tuple (function without parameters creating the client, maximum age of the client in seconds)
+    #           or None if the pinger has no client
+    #
+    #   @throws KeyError
+    #           if there is a required configuration item missing
+    #
+    def getClientFactory(self, id: str):
+        cfg_pinger = self.cfg["pinger"]
+        if id == "PINGER_TWIST":
+            cfg_twist = cfg_pinger["twist"]
+            cfg_polling = cfg_twist.get("polling", {})
+            polling = PollingStrategy(initial_interval=cfg_polling.get("initialInterval", 0.5),
+                                      max_interval=cfg_polling.get("maxInterval", 30),
+                                      multiplier=cfg_polling.get("multiplier", 2),
+                                      jitter=cfg_polling.get("jitter", 0.2),
+                                      deadline=cfg_polling.get("deadline", 600))
+            return (lambda: TwistClient(cfg_twist["email"],
+                                        cfg_twist["password"],
+                                        cfg_twist["apitoken"],
+                                        cfg_twist["eutoken"],
+                                        cfg_twist["username"],
+                                        cfg_twist["firstname"],
+                                        cfg_twist["lastname"],
+                                        host=cfg_twist["server"],
+                                        poolSize=cfg_twist.get("poolSize", 10),
+                                        polling=polling,
+                                        profile_max_age=cfg_twist.get("profileMaxAge", 3600)),
+                    cfg_twist.get("clientMaxAge"))
+        if id == "PINGER_IDT":
+            cfg_idt = cfg_pinger["idt"]
+            # The token expires after one hour, so the client is created again before.
+            # Tokens rejected earlier are refreshed by the client itself.
+            return (lambda: IDTClient(IDT.token_server_default,
+                                      IDT.screening_server_default,
+                                      cfg_idt["username"],
+                                      cfg_idt["password"],
+                                      cfg_idt["client_id"],
+                                      cfg_idt["client_secret"],
+                                      cfg_idt["shared_secret"],
+                                      cfg_idt["scope"],
+                                      poolSize=cfg_idt.get("poolSize", 10)),
+                    cfg_idt.get("tokenMaxAge", 3000))
+        if id == "PINGER_GENEART":
+            cfg_geneart = cfg_pinger["geneart"]
+            return (lambda: GeneArtClient(cfg_geneart["server"],
+                                          cfg_geneart["validate"],
+                                          cfg_geneart["status"],
+                                          cfg_geneart["addToCart"],
+                                          cfg_geneart["upload"],
+                                          cfg_geneart["username"],
+                                          cfg_geneart["token"],
+                                          cfg_geneart["dnaStrings"],
+                                          cfg_geneart["hqDnaStrings"],
+                                          cfg_geneart["timeout"],
+                                          poolSize=cfg_geneart.get("poolSize", 10)),
+                    cfg_geneart.get("clientMaxAge"))
+        return None
+
+    #
+    #   Creates the pinger of a vendor using a client created by getClientFactory.
+    #   Put pinger specific initialization here.
+    #
+    #   @param id A valid pinger identifier
+    #
+    #   @param client The authenticated client shared by all sessions
+    #
+    #   @result A pinger of type as specified by id
+    #
+    def createVendorPinger(self, id: str, client) -> BasePinger:
+        cfg_pinger = self.cfg["pinger"]
+        if id == "PINGER_TWIST":
+            cfg_twist = cfg_pinger["twist"]
+            return Twist(cfg_twist["email"],
+                         cfg_twist["password"],
+                         cfg_twist["apitoken"],
+                         cfg_twist["eutoken"],
+                         cfg_twist["username"],
+                         cfg_twist["firstname"],
+                         cfg_twist["lastname"],
+                         host=cfg_twist["server"],
+                         client=client,
+                         batchSize=cfg_twist.get("batchSize", 96),
+                         parallelism=cfg_twist.get("parallelism", 4),
+                         quoteMaxAge=cfg_twist.get("quoteMaxAge", 1800))
+        if id == "PINGER_IDT":
+            cfg_idt = cfg_pinger["idt"]
+            return IDT(idt_username=cfg_idt["username"],
+                       idt_password=cfg_idt["password"],
+                       client_id=cfg_idt["client_id"],
+                       client_secret=cfg_idt["client_secret"],
+                       shared_secret=cfg_idt["shared_secret"],
+                       scope=cfg_idt["scope"],
+                       client=client,
+                       batchSize=cfg_idt.get("batchSize", IDT.batchSize_default),
+                       parallelism=cfg_idt.get("parallelism", IDT.parallelism_default))
+        if id == "PINGER_GENEART":
+            cfg_geneart = cfg_pinger["geneart"]
+            return GeneArt(username=cfg_geneart["username"],
+                           token=cfg_geneart["token"],
+                           server=cfg_geneart["server"],
+                           validate=cfg_geneart["validate"],
+                           status=cfg_geneart["status"],
+                           addToCart=cfg_geneart["addToCart"],
+                           upload=cfg_geneart["upload"],
+                           dnaStrings=cfg_geneart["dnaStrings"],
+                           hqDnaStrings=cfg_geneart["hqDnaStrings"],
+                           timeout=cfg_geneart["timeout"],
+                           client=client,
+                           batchSize=cfg_geneart.get("batchSize", GeneArt.batchSize_default),
+                           parallelism=cfg_geneart.get("parallelism", GeneArt.parallelism_default))
+        raise InvalidInputError("Pinger " + id + " has no client")
+
+    #
+    #   see Configurator.warmUpVendors
+    #
+    def warmUpVendors(self):
+        for vendor in self.cfg["controller"].get("vendors", []):
+            try:
+                clientFactory = self.getClientFactory(vendor["pinger"])
+            except KeyError:
+                # Reported as invalid vendor configuration, when the pinger is created
+                continue
+            if clientFactory is not None:
+                factory, maxAge = clientFactory
+                self.clientPool.warmUp(vendor["pinger"], factory, maxAge)
+
+    #
+    #   Describes the settings of a pinger that change its offers.
+    #   Offers found with other settings are not taken from the offer cache.
+    #
+    #   @param id A valid pinger identifier
+    #
+    #   @result string describing the settings
+    #
+    def getPingerOptions(self, id: str) -> str:
+        if id == "PINGER_GENEART":
+            cfg_geneart = self.cfg["pinger"]["geneart"]
+            return "dnaStrings=" + str(cfg_geneart["dnaStrings"]) + ",hqDnaStrings=" + str(cfg_geneart["hqDnaStrings"])
+        return ""
+
+    #
+    #   Gets the rules a vendor checks sequences with (see Screening.ScreeningProfile).
+    #
+    #   @param id A valid pinger identifier
+    #
+    #   @result ScreeningProfile or None if screening is disabled for the pinger
+    #
+    def getScreeningProfile(self, id: str):
+        sections = {"PINGER_TWIST": "twist", "PINGER_IDT": "idt", "PINGER_GENEART": "geneart"}
+        if id not in sections:
+            return None
+        cfg_screening = self.cfg.get("pinger", {}).get(sections[id], {}).get("screening", {})
+        if not cfg_screening.get("enabled", False):
+            return None
+        return ScreeningProfile(minLength=cfg_screening.get("minLength"),
+                                maxLength=cfg_screening.get("maxLength"),
+                                minGc=cfg_screening.get("minGc"),
+                                maxGc=cfg_screening.get("maxGc"),
+                                gcWindow=cfg_screening.get("gcWindow"),
+                                minWindowGc=cfg_screening.get("minWindowGc"),
+                                maxWindowGc=cfg_screening.get("maxWindowGc"),
+                                terminalWindow=cfg_screening.get("terminalWindow"),
+                                minTerminalGc=cfg_screening.get("minTerminalGc"),
+                                maxTerminalGc=cfg_screening.get("maxTerminalGc"),
+                                maxHomopolymer=cfg_screening.get("maxHomopolymer"),
+                                repeatLength=cfg_screening.get("repeatLength"),
+                                homologyLength=cfg_screening.get("homologyLength"),
+                                maxSimilarity=cfg_screening.get("maxSimilarity"),
+                                rejectHomologs=cfg_screening.get("rejectHomologs", False))
+
     def initializeBoostClient(self):
         try:
             cfg_boost = self.cfg["boost"]
+            # The clients of all sessions share their connections to the BOOST server
+            if self.boostAdapter is None:
+                self.boostAdapter = createHttpAdapter(cfg_boost.get("poolSize", 10))
             return BoostClient(url_job=cfg_boost["url_job"],
                                url_hosts=cfg_boost["url_hosts"],
                                url_submit=cfg_boost["url_submit"],
                                url_login=cfg_boost["url_login"],
                                username=cfg_boost["username"],
                                password=cfg_boost["password"],
-                               timeout=cfg_boost["timeout"])
+                               timeout=cfg_boost["timeout"],
+                               adapter=self.boostAdapter)
         except Exception as error:
             print(traceback.format_exc())
             return None
@@ -31,5 +31,6 @@ class SearchResponse(object):
                 }
             ],
             "globalMessage": [],
-            "vendorMessage": []
+            "vendorMessage": [],
+            "searchRunning": False
         }
\ No newline at end of file
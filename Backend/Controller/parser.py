@@ -6,6 +6,8 @@ import sbol
 import time
 import requests
 
+from Pinger.ClientPool import createHttpSession
+
 # Object representing a sequence
 class SeqObject():
     def __init__(self, idN, name, sequence):
@@ -18,8 +20,9 @@ class SeqObject():
         return {"idN": self.idN, "name": self.name, "sequence": self.sequence}
 
 # This class is used to communicate with the BOOST-Server
+# If an adapter is given, its connections are shared with other clients (see ClientPool.createHttpAdapter).
 class BoostClient:
-    def __init__(self, url_job, url_hosts, url_submit, url_login, username, password, timeout = 60):
+    def __init__(self, url_job, url_hosts, url_submit, url_login, username, password, timeout = 60, adapter = None):
         self.url_job = url_job
         self.url_hosts = url_hosts
         self.url_submit = url_submit
@@ -30,11 +33,13 @@ class BoostClient:
         self.token = "NO_TOKEN"
         self.jwt = {'NO': 'TOKEN'}
         self.uuid = "NO_UUID"
+        # Every client has its own cookies, but may share the connections
+        self.session = createHttpSession(adapter=adapter)
 
     # Log in the BOOST-Server and get your token.
     def login(self):
         data = {"username": self.username, "password": self.password}
-        response = requests.post(url = self.url_login, json = data, timeout = self.timeout)
+        response = self.session.post(url = self.url_login, json = data, timeout = self.timeout)
         self.token = response.json()["boost-jwt"]
         self.jwt = {"boost-jwt": self.token}
     
@@ -82,18 +87,18 @@ class BoostClient:
                 "format": "FASTA"
             }
         }
-        response = requests.post(url='https://boost.jgi.doe.gov/rest/jobs/submit', json = job, cookies = self.jwt, timeout = self.timeout)
+        response = self.session.post(url='https://boost.jgi.doe.gov/rest/jobs/submit', json = job, cookies = self.jwt, timeout = self.timeout)
         self.uuid = response.json()["job-uuid"]
 
         # Get information for this job
     def getInformation(self, uuid):
         url_job_uuid = self.url_job + str(uuid)
-        response = requests.get(url=url_job_uuid, cookies = self.jwt, timeout = self.timeout)
+        response = self.session.get(url=url_job_uuid, cookies = self.jwt, timeout = self.timeout)
         return response.json()
 
     # Get Pre-defined hosts
     def getPreDefinedHosts(self):
-        response = (requests.get(url=self.url_hosts, cookies = self.jwt, timeout = self.timeout)).json()
+        response = (self.session.get(url=self.url_hosts, cookies = self.jwt, timeout = self.timeout)).json()
         hostNames = []
         for host in response["predefined-hosts"]:
             hostNames.append(host["host-name"])
@@ -105,7 +110,7 @@ class BoostClient:
     # @return The codon usage table for host or None if host is invalid
     #
     def selectCodonTableForHost(self, host):
-        response = (requests.get(url=self.url_hosts, cookies=self.jwt, timeout=self.timeout)).json()
+        response = (self.session.get(url=self.url_hosts, cookies=self.jwt, timeout=self.timeout)).json()
         for i in response["predefined-hosts"]:
             if (i["host-name"] == host):
                 return i["codon-usage-table"]
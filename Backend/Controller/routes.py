@@ -1,13 +1,23 @@
 import traceback
 
 from Pinger.Pinger import *
-from flask import request, json
+from flask import request, json, Response, stream_with_context
 
 from .app import app
 from .configurator import YmlConfigurator as Configurator
 from .service import DefaultComparisonService as Service
 
-service = Service(Configurator("config.yml"))
+configurator = Configurator("config.yml")
+service = Service(configurator)
+
+
+#
+#   Releases the sessions used by a request, so they can be removed again once they are idle.
+#   Streamed responses keep the request and its sessions until the stream is finished.
+#
+@app.teardown_request
+def releaseSessions(error=None):
+    service.releaseSessions()
 
 
 #
@@ -82,8 +92,65 @@ def filterResults():
         return {"error": "Encountered error setting filter\n" + (traceback.format_exc() if __debug__ else "")}
 
 
+#
+#   Starts a search for the uploaded sequences in the background and returns immediately.
+#   The offers found so far can be fetched from /results while the search is running.
+#
+#   response: {"jobId": <id of the search job>}
+#
+@app.route('/search', methods=['POST'])
+def startSearch():
+    try:
+        return service.startSearch()
+    except Exception as error:
+        return {"error": "Encountered error while starting search\n" + (
+            traceback.format_exc() if __debug__ else "")}
+
+
+#
+#   Returns the progress of a search started by /search.
+#
+#   response: {"jobId": <id>, "status": <status>, "vendors": [{"key": <vendor key>, "status": <status>}*]}
+#   Status is one of PENDING, RUNNING, FINISHED and FAILED.
+#
+@app.route('/search/<jobId>', methods=['GET'])
+def getSearchStatus(jobId):
+    try:
+        return service.getSearchStatus(jobId)
+    except Exception as error:
+        return {"error": "Encountered error while fetching search status\n" + (
+            traceback.format_exc() if __debug__ else "")}
+
+
+#
+#   Streams the offers of a search started by /search as server-sent events, instead of polling /results.
+#
+#   events:
+#       offers: Sent for every vendor as soon as it is finished, split into batches of sequences.
+#               {"vendorKey": <key>, "status": <status>, "batch": <index>, "batches": <count>,
+#                "result": [{"sequenceId": <id>, "offers": [<offer>*]}*]}
+#       summary: Last event. The same as /search/<jobId> plus
+#               "vendorMessage": [{"vendorKey": <key>, "messages": [<text>*]}*]
+#   Comments are sent while no vendor finishes, so the stream is kept open. Proxies like nginx are told not to
+#   buffer the events (X-Accel-Buffering).
+#
+@app.route('/search/<jobId>/stream', methods=['GET'])
+def streamSearch(jobId):
+    try:
+        events = service.streamSearch(jobId)
+        if isinstance(events, dict):
+            return events
+        return Response(stream_with_context(events), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    except Exception as error:
+        return {"error": "Encountered error while streaming search results\n" + (
+            traceback.format_exc() if __debug__ else "")}
+
+
 #
 #   call this route to receive the results gathered.
+#   If a search started by /search is running, then the offers found so far are returned
+#   and searchRunning is true. Otherwise vendors not searched yet are searched before returning.
 #
 #   parameters per form data:
 #       size: The number of results to be shown (note that there might be less available
@@ -0,0 +1,222 @@
+#
+#   Classes to run vendor searches in the background
+#
+import threading
+from concurrent import futures
+from secrets import token_urlsafe
+from typing import List
+
+from Pinger.Entities import SequenceInformation, SearchStatus
+from Pinger.Pinger import ManagedPinger
+
+
+#
+#   Desc:   A search for offers of a session's sequences, running in the background.
+#
+#           The job only drives the pinger. It never touches the session, because it
+#           runs outside of a request. Storing the result in the session is up to the
+#           service, when the job is finished (see attribute merged).
+#
+#   @attribute id
+#           Type str. Identifies the job. Returned to the client to ask for the status.
+#
+#   @attribute pinger
+#           Type ManagedPinger. The session's pinger doing the search.
+#
+#   @attribute sequences
+#           Type ArrayOf(SequenceInformation). The sequences to search offers for.
+#
+#   @attribute vendors
+#           Type ArrayOf(int). Keys of the vendors to search at.
+#
+#   @attribute merged
+#           Type Boolean. True if the result of the finished job has been stored in the session.
+#
+#   @attribute listener
+#           Function taking the job. Called from the executor every notifyInterval seconds while the job is running
+#           and once it is finished, e.g. to share the state of the job with other processes (see
+#           session.RedisSessionManager). None if there is no listener.
+#
+#   @attribute version
+#           Type int. Counts the changes of the status of the job (see getStatus), e.g. when a vendor is finished.
+#           Seen by notify() and waited for by waitForChange(...).
+#
+class SearchJob:
+
+    notifyInterval = 0.2
+
+    def __init__(self, pinger: ManagedPinger, sequences: List[SequenceInformation], vendors: List[int]):
+        self.id = token_urlsafe(16)
+        self.pinger = pinger
+        self.sequences = sequences
+        self.vendors = vendors
+        self.merged = False
+        self.future = None
+        self.listener = None
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.version = 0
+        self.lastStatus = None
+
+    #
+    #   Desc:   Starts the search in the background.
+    #
+    #   @param executor
+    #           Type concurrent.futures.Executor. Executor running the job.
+    #
+    def start(self, executor):
+        self.future = executor.submit(self.run)
+        # Called when the job is done, so the listener sees the final state
+        self.future.add_done_callback(lambda future: self.notify())
+
+    #
+    #   Desc:   Does the search. Called inside of the executor.
+    #
+    def run(self):
+        if not self.vendors:
+            return
+        # A job of replaced sequences may still use the pinger
+        self.pinger.waitForCompletion()
+        self.pinger.searchOffers(seqInf=self.sequences, vendors=self.vendors)
+        while not self.pinger.waitForCompletion(timeout=SearchJob.notifyInterval):
+            self.notify()
+
+    #
+    #   Desc:   Sets the listener and calls it with the current state of the job.
+    #
+    def setListener(self, listener):
+        with self.lock:
+            self.listener = listener
+        self.notify()
+
+    #
+    #   Desc:   Wakes up the callers of waitForChange(...), if the status changed, and calls the listener.
+    #           Calls are not interleaved, so the listener never sees an older state after a newer one.
+    #           Errors of the listener do not stop the job.
+    #
+    def notify(self):
+        with self.lock:
+            status = self.getStatus()
+            if status != self.lastStatus:
+                self.lastStatus = status
+                self.version = self.version + 1
+                self.changed.notify_all()
+            if self.listener is None:
+                return
+            try:
+                self.listener(self)
+            except Exception as e:
+                print("SearchJob.notify(): Listener of job", self.id, "failed")
+                print(e)
+
+    #
+    #   Desc:   Returns the number of changes of the status seen so far (see attribute version).
+    #
+    def getVersion(self) -> int:
+        with self.lock:
+            return self.version
+
+    #
+    #   Desc:   Blocks until the status changed after the given version or the timeout expired.
+    #
+    #   @param version
+    #           Type int. Result of getVersion() before the status was read.
+    #
+    #   @param timeout
+    #           Type float. Maximum time to wait in seconds. If None, then waiting until the status changed.
+    #
+    #   @result
+    #           True if the status changed, False if the timeout expired before.
+    #
+    def waitForChange(self, version: int, timeout=None) -> bool:
+        with self.changed:
+            return self.changed.wait_for(lambda: self.version != version, timeout=timeout)
+
+    #
+    #   Desc:   Marks the result of the finished job as stored in the session.
+    #
+    #   @result
+    #           True if the job was not marked before, so the caller has to store the result.
+    #
+    def markMerged(self) -> bool:
+        with self.lock:
+            if self.merged:
+                return False
+            self.merged = True
+            return True
+
+    #
+    #   Desc:   True if the job is not finished.
+    #
+    def isRunning(self) -> bool:
+        return self.future is not None and not self.future.done()
+
+    #
+    #   Desc:   Blocks until the job is finished or the timeout expired.
+    #
+    #   @param timeout
+    #           Type float. Maximum time to wait in seconds. If None, then waiting until the job is finished.
+    #
+    #   @result
+    #           True if the job is finished, False if the timeout expired before.
+    #
+    def wait(self, timeout=None) -> bool:
+        if self.future is not None:
+            futures.wait([self.future], timeout=timeout)
+        return not self.isRunning()
+
+    #
+    #   Desc:   Returns the error that stopped the job or None if there was no error.
+    #           Errors of single vendors do not stop the job. They are part of the vendor messages.
+    #
+    def getError(self):
+        if self.future is None or not self.future.done():
+            return None
+        return self.future.exception()
+
+    #
+    #   Desc:   Returns the vendors searched by the finished job. Vendors skipped because they were not ready
+    #           (see BasePinger.isReady) are not included, so they are searched by the next job.
+    #
+    #   @result
+    #           Type ArrayOf(int). Keys of the searched vendors.
+    #
+    def getSearchedVendors(self) -> List[int]:
+        if self.future is None or not self.vendors:
+            return []
+        vendorStatus = self.pinger.getSearchStatus()
+        return [key for key in self.vendors if vendorStatus.get(key, SearchStatus.PENDING) != SearchStatus.PENDING]
+
+    #
+    #   Desc:   Returns the status of the job and of every vendor searched by it.
+    #
+    #   @result
+    #           Type dict of the form {"jobId": str, "status": str, "vendors": [{"key": int, "status": str}*]}
+    #           Status values are the names of Entities.SearchStatus.
+    #
+    def getStatus(self) -> dict:
+        vendorStatus = {}
+        if self.future is not None and self.vendors:
+            vendorStatus = self.pinger.getSearchStatus()
+
+        vendors = []
+        for key in self.vendors:
+            status = vendorStatus.get(key, SearchStatus.PENDING)
+            vendors.append({"key": key, "status": status.name})
+
+        if self.isRunning():
+            status = SearchStatus.RUNNING
+        elif self.getError() is not None:
+            status = SearchStatus.FAILED
+        else:
+            status = SearchStatus.FINISHED
+
+        return {"jobId": self.id, "status": status.name, "vendors": vendors}
+
+    #
+    #   Desc:   Returns the offers, that are ordered as other offers of the vendor (see ManagedPinger.getOfferAliases).
+    #
+    def getOfferAliases(self) -> dict:
+        if self.isRunning() or not self.vendors:
+            return {}
+        return self.pinger.getOfferAliases()
@@ -2,20 +2,23 @@ from sys import maxsize
 
 import os
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from Pinger.Entities import *
 from Pinger.Entities import VendorInformation, SequenceInformation
 from Pinger.Pinger import *
 from Pinger.Validator import EntityValidator
 from flask import json
-from flask import session as session_cookie
+from flask import session as session_cookie, g
 from secrets import token_urlsafe
 from typing import List
 from werkzeug.datastructures import FileStorage
 from werkzeug.utils import secure_filename
 
 from .parser import parse, BoostClient
-from .session import InMemorySessionManager as SessionManager
-from .transformation import buildSearchResponseJSON, sequenceInfoFromObjects, filterOffers
+from .searchjob import SearchJob
+from .session import SessionManager
+from .transformation import buildSearchResponseJSON, sequenceInfoFromObjects, filterOffers, mergeOffers, \
+    buildVendorOfferEvents, buildServerSentEvent
 
 # This doesn't actually hold state so it can be global
 validator = EntityValidator()
@@ -54,6 +57,24 @@ class ComparisonService:
     def setFilter(self, filter: dict) -> None:
         raise NotImplementedError
 
+    #
+    #   Starts a search for the session's sequences in the background and returns the job's id
+    #
+    def startSearch(self) -> dict:
+        raise NotImplementedError
+
+    #
+    #   Returns the progress of a search started by startSearch
+    #
+    def getSearchStatus(self, jobId: str) -> dict:
+        raise NotImplementedError
+
+    #
+    #   Returns a generator of server-sent events carrying the offers of a search started by startSearch
+    #
+    def streamSearch(self, jobId: str):
+        raise NotImplementedError
+
     #
     #   Returns all search results packed into a JSON response
     #
@@ -80,6 +101,10 @@ class DefaultComparisonService(ComparisonService):
 
     def __init__(self, configurator):
         self.config = configurator
+        # Runs the search jobs of all sessions in the background
+        self.jobExecutor = ThreadPoolExecutor(max_workers=configurator.maxSearchJobs)
+        # Session store chosen by the configuration
+        self.sessionManager = configurator.initializeSessionManager()
 
     #
     # Parses an uploaded sequence file and stores the sequences in the session
@@ -150,6 +175,8 @@ class DefaultComparisonService(ComparisonService):
         session.storeVendorMessages({})
         session.resetSearchedVendors()
         session.storeSelection([])
+        # The result of a running search belongs to the old sequences
+        session.storeSearchJob(None)
 
     #
     # Sets the filter settings
@@ -166,74 +193,131 @@ class DefaultComparisonService(ComparisonService):
         self.getSession().storeSelection(selection)
 
     #
-    #   Returns all search results packed into a JSON response
+    #   Starts a search for the session's sequences in the background.
+    #   Only vendors allowed by the filter that have not been searched yet are contacted.
+    #   If there is a running search already, then no new one is started.
     #
-    def getResults(self, size: int, offset: int):
+    #   @result dictionary of the form {"jobId": str}
+    #
+    def startSearch(self):
         session = self.getSession()
 
         if not session.loadSequences():
             return {'error': 'No sequences available'}
 
-        sequences = session.loadSequences()
-        seqoffers = session.loadResults()
-
-        filter = session.loadFilter()
+        job = session.loadSearchJob()
+        if not job or not job.isRunning():
+            self.mergeSearchJob(session)
+            job = SearchJob(session.loadPinger(), session.loadSequences(), self.getVendorsToSearch(session))
+            job.start(self.jobExecutor)
+            session.storeSearchJob(job)
 
-        # Create a list of vendors to contact in the search process.
-        # Only vendors that are to be searched by the filter settings
-        # and that have not been contacted yet are to be contacted.
-        # This is for saving network overhead on both sides.
-        vendorsToSearch = []
-        if "vendors" in filter:
-            # Only contact vendors that are allowed in the filter
-            for key in filter["vendors"]:
-                if key not in session.loadSearchedVendors():
-                    vendorsToSearch.append(key)
-        else:
-            # If there are no vendor preferences just contact all
-            for vendor in self.config.vendors:
-                if vendor.key not in session.loadSearchedVendors():
-                    vendorsToSearch.append(vendor.key)
+        return {'jobId': job.id}
 
-        # Only do a search if any vendors are to be contacted as everything else would be quite pointless
-        if vendorsToSearch:
-            mainPinger = session.loadPinger()
-            mainPinger.searchOffers(seqInf=sequences, vendors=vendorsToSearch)
-            # Wait for the pinger to finish the search
-            while mainPinger.isRunning():
-                pass
-            newoffers = mainPinger.getOffers()
-            newVendorMessages = mainPinger.getVendorMessages()
-
-            vendorMessages = session.loadVendorMessages()
-            # Replace exactly the messages of vendors to be searched
-            # and don't care what Pingers are doing with theirs in the meantime
-            for key in newVendorMessages.keys():
-                if key in vendorsToSearch:
-                    vendorMessages[key] = newVendorMessages[key]
+    #
+    #   Returns the progress of a search started by startSearch.
+    #
+    #   @param jobId The id returned by startSearch
+    #
+    #   @result dictionary of the form {"jobId": str, "status": str, "vendors": [{"key": int, "status": str}*]}
+    #
+    def getSearchStatus(self, jobId: str):
+        session = self.getSession()
+        job = session.loadSearchJob()
+        if not job or job.id != jobId:
+            return {'error': 'Unknown search job'}
+
+        self.mergeSearchJob(session)
+        return job.getStatus()
+
+    #
+    #   Streams the offers of a search started by startSearch as server-sent events.
+    #   Every vendor's offers are sent once, as soon as the vendor is finished, in batches of sequences.
+    #   The stream ends with a summary event containing the status of the job and the vendor messages.
+    #   While no vendor finishes, a comment is sent every streamKeepAlive seconds.
+    #   The result is not stored in the session by streaming. This is still done by getSearchStatus and getResults.
+    #
+    #   @param jobId The id returned by startSearch
+    #
+    #   @result generator of server-sent events or a dictionary with an error, if the job is unknown
+    #
+    def streamSearch(self, jobId: str):
+        job = self.getSession().loadSearchJob()
+        if not job or job.id != jobId:
+            return {'error': 'Unknown search job'}
+
+        batchSize = self.config.streamBatchSize
+        keepAlive = self.config.streamKeepAlive
+
+        def events():
+            sent = set()
+            while True:
+                # Changes after reading the version wake up the stream below, so none is missed
+                version = job.getVersion()
+                # Check if the job is finished before looking at the vendors, so no vendor is missed
+                finished = not job.isRunning()
+                status = job.getStatus()
+                for vendor in status["vendors"]:
+                    if vendor["key"] in sent or vendor["status"] not in (SearchStatus.FINISHED.name,
+                                                                         SearchStatus.FAILED.name):
+                        continue
+                    sent.add(vendor["key"])
+                    for event in buildVendorOfferEvents(vendor["key"], job.pinger.getVendorOffers(vendor["key"]),
+                                                        vendor["status"], batchSize):
+                        yield event
+                if finished:
+                    break
+                # Wakes up when a vendor or the job is finished
+                if not job.waitForChange(version, timeout=keepAlive):
+                    yield ": keep-alive\n\n"
+
+            vendorMessages = job.pinger.getVendorMessages() if job.vendors else {}
+            status["vendorMessage"] = [{"vendorKey": key, "messages": [message.text for message in
+                                                                       vendorMessages.get(key, [])]}
+                                       for key in job.vendors]
+            yield buildServerSentEvent("summary", status)
+
+        return events()
+
+    #
+    #   Returns all search results packed into a JSON response.
+    #   If a search is running, then the offers found so far are returned.
+    #   Otherwise vendors that have not been searched yet are searched before.
+    #
+    def getResults(self, size: int, offset: int):
+        session = self.getSession()
 
-            session.storeVendorMessages(vendorMessages)
+        if not session.loadSequences():
+            return {'error': 'No sequences available'}
 
-            session.addSearchedVendors(vendorsToSearch)
-            for seqoff in seqoffers:
-                for newseqoff in newoffers:
-                    if seqoff.sequenceInformation.key == newseqoff.sequenceInformation.key:
-                        for vendoff in seqoff.vendorOffers:
-                            if vendoff.vendorInformation.key not in vendorsToSearch:
-                                continue
-                            for newvendoff in newseqoff.vendorOffers:
-                                if vendoff.vendorInformation.key == newvendoff.vendorInformation.key:
-                                    vendoff.offers.extend(newvendoff.offers)
+        filter = session.loadFilter()
 
-            session.storeResults(seqoffers)
+        job = session.loadSearchJob()
+        searchRunning = job is not None and job.isRunning()
+        if searchRunning:
+            # Show the offers found so far without storing them
+            seqoffers = mergeOffers(session.loadResults(), job.pinger.getOffers(), job.vendors)
+            vendorMessages_unfiltered = dict(session.loadVendorMessages())
+            newVendorMessages = job.pinger.getVendorMessages()
+            for key in newVendorMessages.keys():
+                if key in job.vendors:
+                    vendorMessages_unfiltered[key] = newVendorMessages[key]
+        else:
+            self.mergeSearchJob(session)
+            # Only do a search if any vendors are to be contacted as everything else would be quite pointless
+            if self.getVendorsToSearch(session):
+                self.startSearch()
+                session.loadSearchJob().wait()
+                self.mergeSearchJob(session, raiseError=True)
+            seqoffers = session.loadResults()
+            vendorMessages_unfiltered = session.loadVendorMessages()
 
         # These are the vendor messages to be shown in the result.
         # Vendors excluded from the search will not be in here.
-        vendorMessages_unfiltered = session.loadVendorMessages()
         resultVendorMessages = {}
         for vendor in self.config.vendors:
             if not filter or vendor.key in filter["vendors"]:
-                resultVendorMessages[vendor.key] = vendorMessages_unfiltered[vendor.key]
+                resultVendorMessages[vendor.key] = vendorMessages_unfiltered.get(vendor.key, [])
 
         # build response from offers stored in the session
         if not filter or filter["preselectByPrice"] or filter["preselectByDeliveryDays"]:
@@ -250,15 +334,73 @@ class DefaultComparisonService(ComparisonService):
             # Preselection by lambda
             result = buildSearchResponseJSON(filterOffers(filter, seqoffers), self.config.vendors, selector,
                                              session.loadGlobalMessages(), resultVendorMessages,
-                                             offset, size)
+                                             offset, size, searchRunning)
         else:
             # Use selection list
             result = buildSearchResponseJSON(filterOffers(filter, seqoffers), self.config.vendors,
                                              session.loadSelection(), session.loadGlobalMessages(), resultVendorMessages,
-                                             offset, size)
+                                             offset, size, searchRunning)
 
         return result
 
+    #
+    #   Create a list of vendors to contact in the search process.
+    #   Only vendors that are to be searched by the filter settings
+    #   and that have not been contacted yet are to be contacted.
+    #   This is for saving network overhead on both sides.
+    #
+    def getVendorsToSearch(self, session: SessionManager) -> List[int]:
+        filter = session.loadFilter()
+        vendorsToSearch = []
+        if "vendors" in filter:
+            # Only contact vendors that are allowed in the filter
+            for key in filter["vendors"]:
+                if key not in session.loadSearchedVendors():
+                    vendorsToSearch.append(key)
+        else:
+            # If there are no vendor preferences just contact all
+            for vendor in self.config.vendors:
+                if vendor.key not in session.loadSearchedVendors():
+                    vendorsToSearch.append(vendor.key)
+        return vendorsToSearch
+
+    #
+    #   Stores the result of the session's search job in the session, if the job is finished.
+    #   Every job is stored only once.
+    #
+    #   @param raiseError If True the error that stopped the job is raised. Otherwise it is added
+    #                     to the global messages.
+    #
+    def mergeSearchJob(self, session: SessionManager, raiseError=False):
+        job = session.loadSearchJob()
+        # The job may be finished in another process and merged by a request there
+        if not job or job.isRunning() or not session.markSearchJobMerged(job):
+            return
+
+        if job.getError() is not None:
+            if raiseError:
+                raise job.getError()
+            session.addGlobalMessages(["Search failed: " + str(job.getError())])
+            return
+        if not job.vendors:
+            return
+
+        newoffers = job.pinger.getOffers()
+        newVendorMessages = job.pinger.getVendorMessages()
+
+        vendorMessages = session.loadVendorMessages()
+        # Replace exactly the messages of vendors to be searched
+        # and don't care what Pingers are doing with theirs in the meantime
+        for key in newVendorMessages.keys():
+            if key in job.vendors:
+                vendorMessages[key] = newVendorMessages[key]
+
+        session.storeVendorMessages(vendorMessages)
+
+        # Vendors still connecting are searched again by the next job
+        session.addSearchedVendors(job.getSearchedVendors())
+        session.mergeResults(newoffers, job.vendors)
+
     #
     #   Returns the list of available vendors
     #
@@ -290,7 +432,14 @@ class DefaultComparisonService(ComparisonService):
 
         pinger = self.getSession().loadPinger()
 
+        # Offers of a search job finished meanwhile can be ordered as well
+        self.mergeSearchJob(session)
         seqoffers = session.loadResults()
+
+        # The offers may have been found by the pinger of another process (see RedisSessionManager),
+        # so the pinger gets all offers of the session
+        job = session.loadSearchJob()
+        pinger.registerOffers(seqoffers, job.getOfferAliases() if job else {})
         offersPerVendor = [[] for v in self.config.vendors]
 
         for seqoffer in seqoffers:
@@ -320,15 +469,25 @@ class DefaultComparisonService(ComparisonService):
             token = token_urlsafe(64)
             # Session collision prevention
             # (yes it's still random guessing but with that range it should not need many tries)
-            while SessionManager.hasSession(token):
+            while self.sessionManager.hasSession(token):
                 token = token_urlsafe(64)
             session_cookie["sessionKey"] = token
-        session = SessionManager(session_cookie["sessionKey"])
+        session = self.sessionManager(session_cookie["sessionKey"])
+        # The session is kept until the request is finished (see releaseSessions)
+        session.acquire()
+        g.setdefault("sessions", []).append(session)
 
         if not session.loadPinger():  # This indicates that the session is new
             session.storePinger(self.config.initializePinger(session))
         return session
 
+    #
+    #   Releases the sessions used by the current request (see getSession). Called when the request is finished.
+    #
+    def releaseSessions(self):
+        for session in g.pop("sessions", []):
+            session.release()
+
     #
     #   Returns the current session's BOOST client and configures it if nonexistent
     #
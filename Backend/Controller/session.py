@@ -1,11 +1,25 @@
 #
 #   A collection of classes related to session handling
 #
+import random
+import threading
+import time
+from collections import OrderedDict
+from secrets import token_hex
 from typing import List
 
-from Pinger.Entities import SequenceInformation, SequenceVendorOffers, Message
+from Pinger import Serialization
+from Pinger.Entities import SequenceInformation, SequenceVendorOffers, SequenceOffers, Message, Offer, SearchStatus
 from Pinger.Pinger import ManagedPinger
 from Pinger.Validator import EntityValidator
+from Pinger.atomiccounter import AtomicCounter
+from .searchjob import SearchJob
+
+# Redis is only needed for the session store redis
+try:
+    import redis
+except ImportError:
+    redis = None
 
 validator = EntityValidator()
 
@@ -68,6 +82,18 @@ class SessionManager:
     def storeResults(self, results: List[SequenceVendorOffers]) -> None:
         raise NotImplementedError
 
+    #
+    #   Desc: Adds new offers to the stored search results. Offers of vendors not in the list are ignored.
+    #
+    #   @param newResults
+    #           Type ArrayOf(SequenceVendorOffers). New offers, e.g. of a search job.
+    #
+    #   @param vendors
+    #           Type ArrayOf(int). Keys of the vendors whose offers are added.
+    #
+    def mergeResults(self, newResults: List[SequenceVendorOffers], vendors: List[int]) -> None:
+        raise NotImplementedError
+
     #
     #   Desc: Adds a list of vendors that have already been searched
     #
@@ -166,6 +192,40 @@ class SessionManager:
     def loadJugglingStrategy(self) -> str:
         raise NotImplementedError
 
+    #
+    #   Desc: Stores the session's current search job. None if there is none.
+    #
+    def storeSearchJob(self, job):
+        raise NotImplementedError
+
+    #
+    #   Desc: Returns the session's current search job or None
+    #
+    def loadSearchJob(self):
+        raise NotImplementedError
+
+    #
+    #   Desc:   Marks the result of the session's finished search job as stored in the session (see SearchJob.merged).
+    #
+    #   @result
+    #           True if the job was not marked before, e.g. by another request, so the caller has to store the result.
+    #
+    def markSearchJobMerged(self, job) -> bool:
+        raise NotImplementedError
+
+    #
+    #   Desc:   Marks the session as used by a request. Sessions in use are not removed from the session store
+    #           until they are released again.
+    #
+    def acquire(self):
+        raise NotImplementedError
+
+    #
+    #   Desc:   Ends a use of the session started by acquire().
+    #
+    def release(self):
+        raise NotImplementedError
+
     #
     #   Desc:   Free memory by Free all or old sessions. Can
     #           be different for every StoreManager.
@@ -174,6 +234,55 @@ class SessionManager:
         raise NotImplementedError
 
 
+#
+#   Desc:   Search results of a session. New offers are merged through an index of the results by the keys of
+#           sequences and vendors, so the results are not searched for every new offer. The index is created with
+#           the first merge and shares its VendorOffers with the list of results.
+#
+class ResultStore:
+
+    #
+    #   @param results
+    #           Type ArrayOf(SequenceVendorOffers). The results.
+    #
+    def __init__(self, results=None):
+        self.results = results if results is not None else []
+        # key of a sequence -> {key of a vendor: VendorOffers}
+        self.index = None
+
+    #
+    #   Desc:   Returns the results as list of SequenceVendorOffers.
+    #
+    def toList(self) -> List[SequenceVendorOffers]:
+        return self.results
+
+    #
+    #   Desc:   Returns the index of the results and creates it if necessary.
+    #
+    def getIndex(self):
+        if self.index is None:
+            self.index = {}
+            for seqvendoff in self.results:
+                vendorOffers = self.index.setdefault(seqvendoff.sequenceInformation.key, {})
+                for vendoff in seqvendoff.vendorOffers:
+                    vendorOffers.setdefault(vendoff.vendorInformation.key, vendoff)
+        return self.index
+
+    #
+    #   see SessionManager.mergeResults
+    #
+    def merge(self, newResults: List[SequenceVendorOffers], vendors: List[int]) -> None:
+        vendors = set(vendors)
+        index = self.getIndex()
+        for newseqvendoff in newResults:
+            vendorOffers = index.get(newseqvendoff.sequenceInformation.key)
+            if vendorOffers is None:
+                continue
+            for newvendoff in newseqvendoff.vendorOffers:
+                if newvendoff.vendorInformation.key in vendors and newvendoff.vendorInformation.key in vendorOffers:
+                    vendorOffers[newvendoff.vendorInformation.key].offers.extend(newvendoff.offers)
+
+
 #
 #   Representation of a single session.
 #
@@ -183,7 +292,7 @@ class SingleSession(SessionManager):
         self.sequences = []
         self.pinger = None
         self.filter = {}
-        self.results = []
+        self.results = ResultStore()
         self.searchedVendors = []
         self.globalMessages = []
         self.vendorMessages = {}
@@ -191,6 +300,9 @@ class SingleSession(SessionManager):
         self.boostClient = None
         self.hostOrganism = ""
         self.jugglingStrategy = ""
+        self.searchJob = None
+        # Number of requests using the session (see acquire)
+        self.users = 0
 
     #
     #   Desc:   Loades the Pinger out of the session-store
@@ -223,7 +335,7 @@ class SingleSession(SessionManager):
         for seq in sequences:
             if not isinstance(seq, SequenceInformation):
                 raise TypeError
-        if not validator.validate(sequences):
+        if not validator.validateInternal(sequences):
             raise TypeError
         self.sequences = sequences
 
@@ -249,7 +361,7 @@ class SingleSession(SessionManager):
     #   Desc: Loads search results from the session
     #
     def loadResults(self) -> List[SequenceVendorOffers]:
-        return self.results
+        return self.results.toList()
 
     #
     #   Desc: Stores a list of search results for later use
@@ -260,9 +372,22 @@ class SingleSession(SessionManager):
         for res in results:
             if not isinstance(res, SequenceVendorOffers):
                 raise TypeError
-        if not validator.validate(results):
+        if not validator.validateInternal(results):
+            raise TypeError
+        self.results = ResultStore(results)
+
+    #
+    #   see SessionManager.mergeResults
+    #
+    #   @raises TypeError if one the objects to merge is of the wrong type
+    #
+    def mergeResults(self, newResults: List[SequenceVendorOffers], vendors: List[int]) -> None:
+        for res in newResults:
+            if not isinstance(res, SequenceVendorOffers):
+                raise TypeError
+        if not validator.validateInternal(newResults):
             raise TypeError
-        self.results = results
+        self.results.merge(newResults, vendors)
 
     #
     #   Desc: Adds a list of vendors that have already been searched
@@ -370,26 +495,182 @@ class SingleSession(SessionManager):
     def loadJugglingStrategy(self) -> str:
         return self.jugglingStrategy
 
+    #
+    #   Desc: Stores the session's current search job. None if there is none.
+    #
+    def storeSearchJob(self, job):
+        self.searchJob = job
+
+    #
+    #   Desc: Returns the session's current search job or None
+    #
+    def loadSearchJob(self):
+        return self.searchJob
+
+    def markSearchJobMerged(self, job) -> bool:
+        return job.markMerged()
+
     def free(self):
         self.sequences = []
         self.pinger = None
         self.filter = {}
-        self.results = []
+        self.results = ResultStore()
+        self.boostClient = None
+        self.searchJob = None
 
+    #
+    #   Desc: True if a search job of the session is running. Running sessions are not evicted.
+    #
+    def isSearching(self) -> bool:
+        return self.searchJob is not None and self.searchJob.isRunning()
+
+    def acquire(self):
+        self.users = self.users + 1
+
+    def release(self):
+        self.users = max(self.users - 1, 0)
+
+    #
+    #   Desc: True if the session is used by a request or a running search. Sessions in use are not evicted.
+    #
+    def isInUse(self) -> bool:
+        return self.users > 0 or self.isSearching()
 
+
+#
+#   Desc:   Keeps all sessions in the memory of the process.
+#
+#           Sessions are stored in a dictionary ordered by their last access. Sessions not accessed for
+#           idleTimeout seconds are removed by a background sweeper. If there are more than maxSessions
+#           sessions, then the least recently used ones are removed. Sessions used by a request (see acquire) or
+#           with a running search are kept. Removed sessions are freed, so their pingers and BOOST clients are
+#           released.
+#
 class InMemorySessionManager(SessionManager):
-    sessions = []
+    # session id -> SingleSession, ordered from least to most recently used
+    sessions = OrderedDict()
+    # session id -> time of the last access
+    lastAccess = {}
+    lock = threading.RLock()
+
+    idleTimeout = 3600
+    maxSessions = 1000
+    sweeper = None
 
     def __init__(self, sessionId):
-        self.session = None
+        self.sessionId = sessionId
+        with InMemorySessionManager.lock:
+            self.session = InMemorySessionManager.sessions.get(sessionId)
+
+            if (self.session == None):
+                self.session = SingleSession()
+                InMemorySessionManager.sessions[sessionId] = self.session
+
+            InMemorySessionManager.sessions.move_to_end(sessionId)
+            InMemorySessionManager.lastAccess[sessionId] = time.monotonic()
+            InMemorySessionManager.evict()
+
+    #
+    #   Desc: Sets the limits of the session store and starts the background sweeper.
+    #
+    #   @param idleTimeout
+    #       Seconds after the last access, after which a session is removed
+    #
+    #   @param maxSessions
+    #       Maximum number of sessions
+    #
+    #   @param sweepInterval
+    #       Seconds between two runs of the sweeper. If None, no sweeper is started.
+    #
+    @staticmethod
+    def configure(idleTimeout=3600, maxSessions=1000, sweepInterval=60):
+        with InMemorySessionManager.lock:
+            InMemorySessionManager.idleTimeout = idleTimeout
+            InMemorySessionManager.maxSessions = maxSessions
+            if sweepInterval is not None and InMemorySessionManager.sweeper is None:
+                InMemorySessionManager.sweeper = threading.Thread(target=InMemorySessionManager.runSweeper,
+                                                                  args=(sweepInterval,), daemon=True)
+                InMemorySessionManager.sweeper.start()
+
+    #
+    #   Desc: Removes sessions periodically. Runs in the sweeper thread.
+    #
+    @staticmethod
+    def runSweeper(sweepInterval):
+        while True:
+            time.sleep(sweepInterval)
+            try:
+                InMemorySessionManager.sweep()
+            except Exception as e:
+                print("InMemorySessionManager.runSweeper(...): Sweeping sessions failed")
+                print(e)
+
+    #
+    #   Desc: Removes all sessions, that have not been accessed for idleTimeout seconds.
+    #
+    @staticmethod
+    def sweep():
+        with InMemorySessionManager.lock:
+            expired = time.monotonic() - InMemorySessionManager.idleTimeout
+            for sid in list(InMemorySessionManager.sessions.keys()):
+                if InMemorySessionManager.lastAccess[sid] > expired:
+                    # Sessions are ordered by their last access, so all following are newer
+                    break
+                if not InMemorySessionManager.sessions[sid].isInUse():
+                    InMemorySessionManager.removeSession(sid)
 
-        for (sid, sm) in InMemorySessionManager.sessions:
-            if (sid == sessionId):
-                self.session = sm
+    #
+    #   Desc: Removes the least recently used sessions, if there are more than maxSessions.
+    #         Called by every request, so only the sessions up to the last removed one are looked at.
+    #
+    @staticmethod
+    def evict():
+        with InMemorySessionManager.lock:
+            excess = len(InMemorySessionManager.sessions) - InMemorySessionManager.maxSessions
+            if excess <= 0:
+                return
+            # Sessions are ordered by their last access, so the least recently used come first
+            victims = []
+            for sid, session in InMemorySessionManager.sessions.items():
+                if not session.isInUse():
+                    victims.append(sid)
+                    if len(victims) == excess:
+                        break
+            for sid in victims:
+                InMemorySessionManager.removeSession(sid)
+
+    #
+    #   Desc: Removes a session and releases its resources
+    #
+    @staticmethod
+    def removeSession(id):
+        with InMemorySessionManager.lock:
+            session = InMemorySessionManager.sessions.pop(id, None)
+            InMemorySessionManager.lastAccess.pop(id, None)
+            # Freed under the lock, so a request acquiring the session meanwhile gets it freed (see acquire)
+            if session is not None:
+                session.free()
+
+    #
+    #   see SessionManager.acquire
+    #
+    def acquire(self):
+        with InMemorySessionManager.lock:
+            # The session may have been removed since it was looked up. Then it is used again.
+            session = InMemorySessionManager.sessions.get(self.sessionId)
+            if session is None:
+                InMemorySessionManager.sessions[self.sessionId] = self.session
+                InMemorySessionManager.lastAccess[self.sessionId] = time.monotonic()
+            else:
+                self.session = session
+            self.session.acquire()
 
-        if (self.session == None):
-            self.session = SingleSession()
-            InMemorySessionManager.sessions.append((sessionId, self.session))
+    #
+    #   see SessionManager.release
+    #
+    def release(self):
+        with InMemorySessionManager.lock:
+            self.session.release()
 
     #
     #   Desc: Returns whether a session ID is already present
@@ -402,10 +683,7 @@ class InMemorySessionManager(SessionManager):
     #
     @staticmethod
     def hasSession(id):
-        for (sid, sm) in InMemorySessionManager.sessions:
-            if sid == id:
-                return True
-        return False
+        return id in InMemorySessionManager.sessions
 
     #
     #   Desc:   Loades the Pinger out of the session-store
@@ -461,6 +739,12 @@ class InMemorySessionManager(SessionManager):
     def storeResults(self, results: List[SequenceVendorOffers]) -> None:
         self.session.storeResults(results)
 
+    #
+    #   Desc: Adds new offers to the stored search results
+    #
+    def mergeResults(self, newResults: List[SequenceVendorOffers], vendors: List[int]) -> None:
+        self.session.mergeResults(newResults, vendors)
+
     #
     #   Desc: Adds a list of vendors that have already been searched
     #
@@ -559,11 +843,601 @@ class InMemorySessionManager(SessionManager):
     def loadJugglingStrategy(self) -> str:
         return self.session.loadJugglingStrategy()
 
+    #
+    #   Desc: Stores the session's current search job. None if there is none.
+    #
+    def storeSearchJob(self, job):
+        self.session.storeSearchJob(job)
+
+    #
+    #   Desc: Returns the session's current search job or None
+    #
+    def loadSearchJob(self):
+        return self.session.loadSearchJob()
+
+    #
+    #   see SessionManager.markSearchJobMerged
+    #
+    def markSearchJobMerged(self, job) -> bool:
+        return self.session.markSearchJobMerged(job)
+
+
+    #
+    #   Desc: Frees all sessions
+    #
+    def free(self):
+        with InMemorySessionManager.lock:
+            for sm in InMemorySessionManager.sessions.values():
+                sm.free()
+            InMemorySessionManager.sessions.clear()
+            InMemorySessionManager.lastAccess.clear()
+
+
+#
+#   Desc:   Stores the state of sessions in Redis, so every worker process and every replica of the backend
+#           can serve every session.
+#
+#           Sequences, filter, results, selection and messages are stored in a Redis hash per session in a compact
+#           serialization (see Pinger.Serialization). The hash expires idleTimeout seconds after the last access.
+#
+#           Pinger and BOOST client cannot be shared between processes. They are kept in an InMemorySessionManager
+#           of the process and created again with the shared vendor clients of the process, if the session is served
+#           by another process (see DefaultComparisonService.getSession). Orders hand the offers of the results to
+#           the pinger first, so they can be ordered by any process (see ManagedPinger.registerOffers).
+#
+#           A search job runs in the process that started it. Its state, offers and vendor messages are published to
+#           the hash whenever the state of a vendor changes (see SearchJob.listener). Other processes see the job as
+#           RedisSearchJob. A job is considered interrupted, if its process stopped sending heartbeats.
+#
+#           nginx routes the requests of a client to the same worker (see nginx.conf), so usually no state has to
+#           be rebuilt.
+#
+class RedisSessionManager(SessionManager):
+    # Redis client shared by all sessions of the process
+    client = None
+    prefix = "dnascanner:session:"
+    idleTimeout = 3600
+    # Identifies the process in the state of search jobs. The process refreshes its key every heartbeatInterval
+    # seconds, while it is running.
+    workerId = token_hex(8)
+    workerPrefix = "dnascanner:worker:"
+    heartbeatInterval = 10
+    heartbeat = None
+
+    def __init__(self, sessionId):
+        if RedisSessionManager.client is None:
+            raise RuntimeError("RedisSessionManager is not configured")
+        self.key = RedisSessionManager.prefix + str(sessionId)
+        # Objects that only exist in this process
+        self.local = InMemorySessionManager(sessionId)
+        RedisSessionManager.client.expire(self.key, RedisSessionManager.idleTimeout)
+
+    #
+    #   Desc: Connects to Redis and sets the limits of the session store.
+    #
+    #   @param url
+    #       URL of the Redis server, e.g. redis://localhost:6379/0
+    #
+    #   @param idleTimeout
+    #       Seconds after the last access, after which a session is removed
+    #
+    #   @param maxSessions
+    #       Maximum number of sessions with local objects (pinger, BOOST client and search job) in this process
+    #
+    #   @param sweepInterval
+    #       Seconds between two runs of the sweeper of the local objects. If None, no sweeper is started.
+    #
+    #   @param client
+    #       Redis client to use instead of connecting to url. Can be used for tests.
+    #
+    @staticmethod
+    def configure(url="redis://localhost:6379/0", idleTimeout=3600, maxSessions=1000, sweepInterval=60, client=None):
+        if client is None:
+            if redis is None:
+                raise RuntimeError("The package redis is required for the session store redis")
+            client = redis.Redis.from_url(url)
+        RedisSessionManager.client = client
+        RedisSessionManager.idleTimeout = idleTimeout
+        InMemorySessionManager.configure(idleTimeout=idleTimeout, maxSessions=maxSessions, sweepInterval=sweepInterval)
+
+        # Keys of offers and sequences must be unique across all processes serving a session.
+        # Every process counts in its own range. Keys stay below 2^53, so they are exact in the frontend.
+        offset = random.randrange(1 << 20) << 32
+        Offer.idcounter = AtomicCounter(offset)
+        SequenceInformation.idcounter = AtomicCounter(offset)
+
+        RedisSessionManager.beat()
+        if RedisSessionManager.heartbeat is None:
+            RedisSessionManager.heartbeat = threading.Thread(target=RedisSessionManager.runHeartbeat, daemon=True)
+            RedisSessionManager.heartbeat.start()
+
+    #
+    #   Desc: Marks the process as running, so other processes know its search jobs are still running.
+    #
+    @staticmethod
+    def beat():
+        RedisSessionManager.client.set(RedisSessionManager.workerPrefix + RedisSessionManager.workerId, 1,
+                                       ex=3 * RedisSessionManager.heartbeatInterval)
+
+    #
+    #   Desc: Sends heartbeats periodically. Runs in the heartbeat thread.
+    #
+    @staticmethod
+    def runHeartbeat():
+        while True:
+            time.sleep(RedisSessionManager.heartbeatInterval)
+            try:
+                RedisSessionManager.beat()
+            except Exception as e:
+                print("RedisSessionManager.runHeartbeat(): Sending heartbeat failed")
+                print(e)
+
+    #
+    #   Desc: Returns whether the process with the given id is running
+    #
+    @staticmethod
+    def isWorkerAlive(workerId):
+        return RedisSessionManager.client.exists(RedisSessionManager.workerPrefix + workerId) > 0
+
+    #
+    #   Desc: Returns whether a session ID is already present
+    #
+    @staticmethod
+    def hasSession(id):
+        return InMemorySessionManager.hasSession(id) or \
+               RedisSessionManager.client.exists(RedisSessionManager.prefix + str(id)) > 0
+
+    #
+    #   Desc: Reads and deserializes a field of the session
+    #
+    #   @param field Name of the field
+    #   @param default Value returned if the field is not set
+    #   @param convert Function to convert the JSON value
+    #
+    def load(self, field, default, convert=None):
+        value = RedisSessionManager.client.hget(self.key, field)
+        if value is None:
+            return default
+        value = Serialization.loads(value)
+        return convert(value) if convert else value
+
+    #
+    #   Desc: Serializes and writes fields of the session
+    #
+    #   @param fields Further fields and values to write at once
+    #
+    def store(self, field, value, **fields):
+        pipeline = RedisSessionManager.client.pipeline()
+        pipeline.hset(self.key, field, Serialization.dumps(value))
+        for name, fieldValue in fields.items():
+            pipeline.hset(self.key, name, Serialization.dumps(fieldValue))
+        pipeline.expire(self.key, RedisSessionManager.idleTimeout)
+        pipeline.execute()
+
+    #
+    #   see SessionManager.loadPinger
+    #
+    def loadPinger(self) -> ManagedPinger:
+        return self.local.loadPinger()
+
+    #
+    #   see SessionManager.storePinger
+    #
+    def storePinger(self, pinger: ManagedPinger) -> None:
+        self.local.storePinger(pinger)
+
+    #
+    #   see SessionManager.loadSequences
+    #
+    def loadSequences(self) -> List[SequenceInformation]:
+        return self.load("sequences", [], lambda value: [Serialization.sequenceFromList(seq) for seq in value])
+
+    #
+    #   see SessionManager.storeSequences
+    #
+    #   @raises TypeError if there is a malformed sequence in the list
+    #
+    def storeSequences(self, sequences: List[SequenceInformation]) -> None:
+        for seq in sequences:
+            if not isinstance(seq, SequenceInformation):
+                raise TypeError
+        if not validator.validateInternal(sequences):
+            raise TypeError
+        self.store("sequences", [Serialization.sequenceToList(seq) for seq in sequences])
+
+    #
+    #   see SessionManager.loadFilter
+    #
+    def loadFilter(self) -> dict:
+        return self.load("filter", {})
+
+    #
+    #   see SessionManager.storeFilter
+    #
+    def storeFilter(self, filter: dict) -> None:
+        self.store("filter", filter)
+
+    #
+    #   see SessionManager.loadResults
+    #
+    def loadResults(self) -> List[SequenceVendorOffers]:
+        return self.load("results", [], Serialization.sequenceVendorOffersFromList)
+
+    #
+    #   see SessionManager.storeResults
+    #
+    #   @raises TypeError if one the objects to store is of the wrong type
+    #
+    def storeResults(self, results: List[SequenceVendorOffers]) -> None:
+        for res in results:
+            if not isinstance(res, SequenceVendorOffers):
+                raise TypeError
+        if not validator.validateInternal(results):
+            raise TypeError
+        self.store("results", Serialization.sequenceVendorOffersToList(results))
+
+    #
+    #   see SessionManager.mergeResults
+    #
+    def mergeResults(self, newResults: List[SequenceVendorOffers], vendors: List[int]) -> None:
+        store = ResultStore(self.loadResults())
+        store.merge(newResults, vendors)
+        self.storeResults(store.toList())
+
+    #
+    #   see SessionManager.addSearchedVendors
+    #
+    #   @raises TypeError if one of the vendor IDs is not int
+    #
+    def addSearchedVendors(self, vendors: List[int]):
+        for vendor in vendors:
+            if not isinstance(vendor, int):
+                raise TypeError
+        self.store("searchedVendors", self.loadSearchedVendors() + list(vendors))
+
+    #
+    #   see SessionManager.loadSearchedVendors
+    #
+    def loadSearchedVendors(self) -> List[int]:
+        return self.load("searchedVendors", [])
+
+    #
+    #   see SessionManager.resetSearchedVendors
+    #
+    def resetSearchedVendors(self):
+        self.store("searchedVendors", [])
+
+    #
+    #   see SessionManager.addGlobalMessages
+    #
+    def addGlobalMessages(self, messages: List[Message]):
+        # Add messages unless they are already present
+        globalMessages = self.load("globalMessages", [])
+        for message in Serialization.messagesToList(messages):
+            if message not in globalMessages:
+                globalMessages.append(message)
+        self.store("globalMessages", globalMessages)
+
+    #
+    #   see SessionManager.loadGlobalMessages
+    #
+    def loadGlobalMessages(self) -> List[Message]:
+        return self.load("globalMessages", [], Serialization.messagesFromList)
+
+    #
+    #   see SessionManager.clearGlobalMessages
+    #
+    def clearGlobalMessages(self):
+        self.store("globalMessages", [])
+
+    #
+    #   see SessionManager.loadVendorMessages
+    #
+    def loadVendorMessages(self):
+        return self.load("vendorMessages", {}, Serialization.vendorMessagesFromDict)
+
+    #
+    #   see SessionManager.storeVendorMessages
+    #
+    def storeVendorMessages(self, vendorMessages):
+        self.store("vendorMessages", Serialization.vendorMessagesToDict(vendorMessages))
+
+    #
+    #   see SessionManager.storeSelection
+    #
+    def storeSelection(self, selection):
+        self.store("selection", selection)
+
+    #
+    #   see SessionManager.loadSelection
+    #
+    def loadSelection(self):
+        return self.load("selection", [])
+
+    #
+    #   see SessionManager.storeBoostClient
+    #
+    def storeBoostClient(self, boostClient):
+        self.local.storeBoostClient(boostClient)
+
+    #
+    #   see SessionManager.loadBoostClient
+    #
+    def loadBoostClient(self):
+        return self.local.loadBoostClient()
+
+    #
+    #   see SessionManager.storeHostOrganism
+    #
+    def storeHostOrganism(self, host: str):
+        self.store("hostOrganism", host)
+
+    #
+    #   see SessionManager.loadHostOrganism
+    #
+    def loadHostOrganism(self) -> str:
+        return self.load("hostOrganism", "")
+
+    #
+    #   see SessionManager.storeJugglingStrategy
+    #
+    def storeJugglingStrategy(self, strategy: str):
+        self.store("jugglingStrategy", strategy)
+
+    #
+    #   see SessionManager.loadJugglingStrategy
+    #
+    def loadJugglingStrategy(self) -> str:
+        return self.load("jugglingStrategy", "")
+
+    #
+    #   see SessionManager.storeSearchJob
+    #
+    #   The state of the job is published to the other processes, while it is running (see publishSearchJob).
+    #
+    def storeSearchJob(self, job):
+        self.local.storeSearchJob(job)
+        if job is None:
+            RedisSessionManager.client.hdel(self.key, "searchJob", "searchJobOffers", "searchJobMessages")
+            return
+
+        # Offers are only published again, if the state of a vendor changed
+        published = {}
+
+        def publish(job):
+            status = job.getStatus()
+            if status == published.get("status"):
+                return
+            published["status"] = status
+            self.publishSearchJob(job, status)
+
+        job.setListener(publish)
+
+    #
+    #   Desc: Writes the state, offers and vendor messages of a search job of this process to the session
+    #
+    #   @param job Type SearchJob
+    #   @param status Result of job.getStatus()
+    #
+    def publishSearchJob(self, job, status):
+        error = job.getError()
+        state = {"id": job.id, "vendors": job.vendors, "status": status, "worker": RedisSessionManager.workerId,
+                 "error": None if error is None else str(error), "aliases": job.getOfferAliases()}
+        offers = job.pinger.getOffers() if job.vendors else []
+        messages = job.pinger.getVendorMessages() if job.vendors else {}
+        self.store("searchJob", state,
+                   searchJobOffers=[job.id, Serialization.sequenceVendorOffersToList(offers)],
+                   searchJobMessages=[job.id, Serialization.vendorMessagesToDict(messages)])
+
+    #
+    #   see SessionManager.loadSearchJob
+    #
+    #   @result
+    #       The SearchJob, if it runs in this process, otherwise a RedisSearchJob
+    #
+    def loadSearchJob(self):
+        job = self.local.loadSearchJob()
+        state = self.load("searchJob", None)
+        if state is None or (job is not None and job.id == state["id"]):
+            return job
+        return RedisSearchJob(self, state)
+
+    #
+    #   see SessionManager.markSearchJobMerged
+    #
+    #   Jobs are marked in Redis, so a job is only merged by one process.
+    #
+    def markSearchJobMerged(self, job) -> bool:
+        pipeline = RedisSessionManager.client.pipeline()
+        pipeline.getset(self.key + ":merged", job.id)
+        pipeline.expire(self.key + ":merged", RedisSessionManager.idleTimeout)
+        previous = pipeline.execute()[0]
+        job.markMerged()
+        return previous != job.id.encode("utf-8")
+
+    #
+    #   see SessionManager.acquire
+    #
+    def acquire(self):
+        self.local.acquire()
+
+    #
+    #   see SessionManager.release
+    #
+    def release(self):
+        self.local.release()
 
     #
     #   Desc: Frees all sessions
     #
     def free(self):
-        for (sid, sm) in InMemorySessionManager.sessions:
-            sm.free()
-        InMemorySessionManager.sessions = []
+        keys = list(RedisSessionManager.client.scan_iter(match=RedisSessionManager.prefix + "*"))
+        if keys:
+            RedisSessionManager.client.delete(*keys)
+        self.local.free()
+
+
+#
+#   Desc:   Search job of a Redis session running in another process (see RedisSessionManager.storeSearchJob).
+#           Offers the same methods as SearchJob, but reads the state published by the other process.
+#
+#   @attribute state
+#           Type dict. The state published by RedisSessionManager.publishSearchJob.
+#
+class RedisSearchJob:
+
+    def __init__(self, session: RedisSessionManager, state: dict):
+        self.session = session
+        self.state = state
+        self.id = state["id"]
+        self.vendors = state["vendors"]
+        self.pinger = RedisJobPinger(self)
+        self.merged = False
+
+    #
+    #   Desc: Reads the state of the job again. The state of a job replaced meanwhile is not read anymore.
+    #
+    def refresh(self):
+        state = self.session.load("searchJob", None)
+        if state is not None and state["id"] == self.id:
+            self.state = state
+
+    #
+    #   Desc: True if the process running the job stopped, before the job was finished
+    #
+    def isInterrupted(self) -> bool:
+        return self.state["status"]["status"] == SearchStatus.RUNNING.name and \
+               not RedisSessionManager.isWorkerAlive(self.state["worker"])
+
+    #
+    #   see SearchJob.isRunning
+    #
+    def isRunning(self) -> bool:
+        self.refresh()
+        return self.state["status"]["status"] == SearchStatus.RUNNING.name and not self.isInterrupted()
+
+    #
+    #   see SearchJob.wait
+    #
+    def wait(self, timeout=None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.isRunning():
+            interval = SearchJob.notifyInterval
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                interval = min(interval, remaining)
+            time.sleep(interval)
+        return True
+
+    #
+    #   see SearchJob.getVersion
+    #
+    #   The published status is used as version.
+    #
+    def getVersion(self) -> dict:
+        return self.getStatus()
+
+    #
+    #   see SearchJob.waitForChange
+    #
+    #   The job of another process can not wake up the caller, so the published status is read every
+    #   SearchJob.notifyInterval seconds.
+    #
+    def waitForChange(self, version: dict, timeout=None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.getStatus() == version:
+            interval = SearchJob.notifyInterval
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                interval = min(interval, remaining)
+            time.sleep(interval)
+        return True
+
+    #
+    #   see SearchJob.getError
+    #
+    def getError(self):
+        if self.isRunning():
+            return None
+        if self.isInterrupted():
+            return RuntimeError("The search was interrupted")
+        if self.state["error"] is not None:
+            return RuntimeError(self.state["error"])
+        return None
+
+    #
+    #   see SearchJob.getSearchedVendors
+    #
+    def getSearchedVendors(self) -> List[int]:
+        return [vendor["key"] for vendor in self.getStatus()["vendors"] if vendor["status"] != SearchStatus.PENDING.name]
+
+    #
+    #   see SearchJob.getStatus
+    #
+    def getStatus(self) -> dict:
+        self.refresh()
+        status = dict(self.state["status"])
+        if self.isInterrupted():
+            status["status"] = SearchStatus.FAILED.name
+        return status
+
+    #
+    #   see SearchJob.getOfferAliases
+    #
+    def getOfferAliases(self) -> dict:
+        return {int(vendor): {int(key): alias for key, alias in aliases.items()}
+                for vendor, aliases in self.state["aliases"].items()}
+
+    #
+    #   see SearchJob.markMerged
+    #
+    def markMerged(self) -> bool:
+        merged = self.merged
+        self.merged = True
+        return not merged
+
+
+#
+#   Desc:   Read-only pinger of a RedisSearchJob. Returns the offers and vendor messages published by the process
+#           running the job. Searching and ordering is not possible.
+#
+class RedisJobPinger(ManagedPinger):
+
+    def __init__(self, job: RedisSearchJob):
+        self.job = job
+
+    #
+    #   Desc: Reads a value published with the job. Values of other jobs are ignored.
+    #
+    def loadPublished(self, field, default, convert):
+        value = self.job.session.load(field, None)
+        if value is None or value[0] != self.job.id:
+            return default
+        return convert(value[1])
+
+    def isRunning(self):
+        return self.job.isRunning()
+
+    def waitForCompletion(self, timeout=None):
+        return self.job.wait(timeout)
+
+    def getOffers(self):
+        return self.loadPublished("searchJobOffers", [], Serialization.sequenceVendorOffersFromList)
+
+    def getSearchStatus(self):
+        return {vendor["key"]: SearchStatus[vendor["status"]] for vendor in self.job.getStatus()["vendors"]}
+
+    def getVendorOffers(self, vendor):
+        return [SequenceOffers(seqvendoff.sequenceInformation, vendoff.offers)
+                for seqvendoff in self.getOffers()
+                for vendoff in seqvendoff.vendorOffers if vendoff.vendorInformation.key == vendor]
+
+    def getVendorMessages(self):
+        return self.loadPublished("searchJobMessages", {}, Serialization.vendorMessagesFromDict)
+
+    def getOfferAliases(self):
+        return self.job.getOfferAliases()
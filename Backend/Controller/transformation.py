@@ -22,10 +22,15 @@ from flask import json
 #
 # @param size
 #       How many results to show per page
-def buildSearchResponseJSON(seqvendoffers, vendors, selector=[], globalMessages=[], vendorMessages = {}, offset=0, size=10):
+#
+# @param searchRunning
+#       True if the result is partial, because a search is still running
+def buildSearchResponseJSON(seqvendoffers, vendors, selector=[], globalMessages=[], vendorMessages = {}, offset=0, size=10,
+                            searchRunning=False):
     resp = SearchResponse()
     resp.data["result"] = []
     resp.data["globalMessage"] = globalMessages
+    resp.data["searchRunning"] = searchRunning
     resp.data["count"] = len(seqvendoffers)
     # Set the size to the size requested or as high as it goes
     resp.data["size"] = min(size, len(seqvendoffers) - offset)
@@ -53,22 +58,8 @@ def buildSearchResponseJSON(seqvendoffers, vendors, selector=[], globalMessages=
             resultOffers = []
             offerIndex = 0
             for offer in vendoff.offers:
-                messages = []
-
-                for message in offer.messages:
-                    # Only output messages that are actually errors
-                    if message.messageType.value in range(1000, 3999):
-                        messages.append({"text": message.text, "messageType": message.messageType.value})
-
-                resultOffers.append({
-                    #TODO Use a user defined currency
-                    "price": offer.price.getAmount(offer.price.currency),
-                    "currency": offer.price.currency.symbol(),
-                    "turnoverTime": offer.turnovertime,
-                    "key": offer.key,
-                    "offerMessage": messages,
-                    "selected": (not selectByLambda) and
-                                offer.key in selector})  # If not selected by lambda use selection list
+                # If not selected by lambda use selection list
+                resultOffers.append(offerToDict(offer, (not selectByLambda) and offer.key in selector))
 
             # If there is a selection lambda use it to sort offers and select the best one
             # TODO: If offers are selected by list there should be some kind of sorting as well
@@ -105,6 +96,73 @@ def buildSearchResponseJSON(seqvendoffers, vendors, selector=[], globalMessages=
     return json.jsonify(resp.data)
 
 
+# Converts an offer into the JSON serializable form used in responses
+#
+# @param offer
+#       The Offer to convert
+#
+# @param selected
+#       True if the offer is marked as selected
+def offerToDict(offer, selected=False):
+    messages = []
+    for message in offer.messages:
+        # Only output messages that are actually errors
+        if message.messageType.value in range(1000, 3999):
+            messages.append({"text": message.text, "messageType": message.messageType.value})
+
+    return {
+        #TODO Use a user defined currency
+        "price": offer.price.getAmount(offer.price.currency),
+        "currency": offer.price.currency.symbol(),
+        "turnoverTime": offer.turnovertime,
+        "key": offer.key,
+        "offerMessage": messages,
+        "selected": selected}
+
+
+# Builds a single server-sent event
+#
+# @param event
+#       Name of the event
+#
+# @param data
+#       JSON serializable payload of the event
+def buildServerSentEvent(event, data):
+    return "event: " + event + "\ndata: " + json.dumps(data) + "\n\n"
+
+
+# Builds the events carrying the offers of a single vendor. The offers are split into batches
+# of sequences, so a client can show them before the whole payload arrived.
+#
+# @param vendorKey
+#       Key of the vendor the offers belong to
+#
+# @param seqoffers
+#       List of SequenceOffers as obtained from ManagedPinger.getVendorOffers
+#
+# @param status
+#       Name of the vendor's SearchStatus
+#
+# @param batchSize
+#       Maximum number of sequences per event
+#
+# @result list of server-sent events of the form
+#       {"vendorKey": int, "status": str, "batch": int, "batches": int,
+#        "result": [{"sequenceId": str, "offers": [offer*]}*]}
+def buildVendorOfferEvents(vendorKey, seqoffers, status, batchSize=96):
+    batchSize = max(1, batchSize)
+    batches = max(1, (len(seqoffers) + batchSize - 1) // batchSize)
+    events = []
+    for batch in range(batches):
+        result = []
+        for seqoff in seqoffers[batch * batchSize: (batch + 1) * batchSize]:
+            result.append({"sequenceId": seqoff.sequenceInformation.key,
+                           "offers": [offerToDict(offer) for offer in seqoff.offers]})
+        events.append(buildServerSentEvent("offers", {"vendorKey": vendorKey, "status": status,
+                                                      "batch": batch, "batches": batches, "result": result}))
+    return events
+
+
 # Converts a List[SequenceObject] to a List[SequenceInformation]
 def sequenceInfoFromObjects(objSequences):
     sequences = []
@@ -143,3 +201,34 @@ def filterOffers(filter, seqvendoffers):
                 filteredSeqVendOff.vendorOffers.append(filteredVendOff)
         filteredOffers.append(filteredSeqVendOff)
     return filteredOffers
+
+
+#
+#   Merges offers of a search into stored offers without changing the stored ones.
+#   Used to show partial results of a running search.
+#
+#   @param seqvendoffers the stored offers
+#   @param newseqvendoffers the offers found by the search
+#   @param vendors keys of the vendors searched by the search. Offers of other vendors are ignored.
+#   @result list of SequenceVendorOffers containing the offers of both
+#
+def mergeOffers(seqvendoffers, newseqvendoffers, vendors):
+    vendors = set(vendors)
+    # (sequence key, vendor key) -> [offer*]
+    newOffers = {}
+    for newseqvendoff in newseqvendoffers:
+        for newvendoff in newseqvendoff.vendorOffers:
+            if newvendoff.vendorInformation.key in vendors:
+                newOffers.setdefault((newseqvendoff.sequenceInformation.key, newvendoff.vendorInformation.key),
+                                     []).extend(newvendoff.offers)
+
+    mergedOffers = []
+    for seqvendoff in seqvendoffers:
+        mergedSeqVendOff = SequenceVendorOffers(seqvendoff.sequenceInformation, [])
+        for vendoff in seqvendoff.vendorOffers:
+            mergedVendOff = VendorOffers(vendoff.vendorInformation, list(vendoff.offers))
+            mergedVendOff.offers.extend(newOffers.get((seqvendoff.sequenceInformation.key,
+                                                       vendoff.vendorInformation.key), []))
+            mergedSeqVendOff.vendorOffers.append(mergedVendOff)
+        mergedOffers.append(mergedSeqVendOff)
+    return mergedOffers
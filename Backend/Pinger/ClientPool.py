@@ -0,0 +1,412 @@
+#########################################################
+#                                                       #
+#   This file contains a pool of authenticated vendor   #
+#   clients, that is shared by the pingers of all       #
+#   sessions. Authenticating is done once per vendor    #
+#   instead of once per session.                        #
+#                                                       #
+#   Clients can be created in the background, while     #
+#   vendor pingers waiting for them are skipped.        #
+#                                                       #
+#########################################################
+
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .Entities import *
+from .Pinger import BasePinger
+
+
+#
+#   Desc:   Creates a connection pool for HTTP requests. Connections are kept alive and reused, so not every
+#           request opens a new TCP and TLS connection. The pool is threadsafe.
+#
+#   @param poolSize
+#           Type int. Maximum number of connections kept alive per host. Requests running concurrently beyond this
+#           number open additional connections, that are closed afterwards.
+#
+#   @result
+#           Type requests.adapters.HTTPAdapter.
+#
+def createHttpAdapter(poolSize=10):
+    return HTTPAdapter(pool_connections=poolSize, pool_maxsize=poolSize)
+
+#
+#   Desc:   Creates a HTTP session using a connection pool.
+#
+#   @param poolSize
+#           Type int. Size of the new connection pool, if no adapter is given.
+#
+#   @param adapter
+#           Type requests.adapters.HTTPAdapter. Optional. Connection pool shared with other sessions, e.g. by clients
+#           of different users, that must not share cookies.
+#
+#   @result
+#           Type requests.Session.
+#
+def createHttpSession(poolSize=10, adapter=None):
+    if adapter is None:
+        adapter = createHttpAdapter(poolSize)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+#
+#   Desc:   Checks if the vendor rejected the client. Vendor pingers report errors as UnavailableError caused by
+#           the original error, so the causes are checked as well.
+#
+#   @param error
+#           Type Exception. Error raised by a vendor pinger.
+#
+#   @result
+#           True if the error or one of its causes is an AuthenticationError.
+#
+def isRejection(error):
+    while error is not None:
+        if isinstance(error, AuthenticationError):
+            return True
+        error = error.__cause__
+    return False
+
+
+#
+#   Desc:   Process-wide pool of vendor clients (e.g. TwistClient, IDTClient, GeneArtClient).
+#
+#           A client is created by its factory the first time it is needed. Creating a client authenticates at the
+#           vendor. Clients older than their maximum age are created again, so expiring tokens are refreshed before
+#           they are rejected. If creating a client fails, the error is raised and the next call tries again.
+#
+#           Clients only hold the connection to the vendor. Offers and messages stay in the pingers of the sessions.
+#
+class VendorClientPool:
+
+    def __init__(self):
+        # key -> (client, creation time, maximum age)
+        self.clients = {}
+        # key -> lock, so a client is only created once at a time
+        self.locks = {}
+        # keys of clients created in the background right now
+        self.warming = set()
+        # key -> error of the last failed creation
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    #
+    #   Desc:   Returns the client of a vendor and creates it if necessary.
+    #
+    #   @param key
+    #           Type str. Identifies the client, e.g. the pinger identifier of the vendor.
+    #
+    #   @param factory
+    #           Function without parameters creating an authenticated client.
+    #
+    #   @param maxAge
+    #           Type float. Seconds after which the client is created again. If None, the client is kept.
+    #
+    #   @result
+    #           The client.
+    #
+    #   @throws
+    #           every error raised by the factory.
+    #
+    def get(self, key, factory, maxAge=None):
+        with self._lock:
+            lock = self.locks.setdefault(key, threading.Lock())
+
+        with lock:
+            entry = self.clients.get(key)
+            if entry is not None:
+                client, created, entryMaxAge = entry
+                if entryMaxAge is None or time.monotonic() - created < entryMaxAge:
+                    return client
+
+            try:
+                client = factory()
+            except Exception as e:
+                self.errors[key] = e
+                raise
+            self.clients[key] = (client, time.monotonic(), maxAge)
+            self.errors.pop(key, None)
+            return client
+
+    #
+    #   Desc:   Creates the client of a vendor in the background, so nobody has to wait for the authentication.
+    #           Nothing is done if the client is valid or already created in the background.
+    #
+    #   @param key
+    #           Type str. Identifies the client.
+    #
+    #   @param factory
+    #           Function without parameters creating an authenticated client.
+    #
+    #   @param maxAge
+    #           Type float. Seconds after which the client is created again. If None, the client is kept.
+    #
+    def warmUp(self, key, factory, maxAge=None):
+        with self._lock:
+            if key in self.warming or self.contains(key):
+                return
+            self.warming.add(key)
+        thread = threading.Thread(target=self.runWarmUp, args=(key, factory, maxAge), daemon=True)
+        thread.start()
+
+    #
+    #   Desc:   Creates a client. Called inside of the thread started by warmUp(...).
+    #
+    def runWarmUp(self, key, factory, maxAge):
+        try:
+            self.get(key, factory, maxAge)
+        except Exception as e:
+            print("VendorClientPool.warmUp(...): Client", key, "could not be created")
+            print(e)
+        finally:
+            with self._lock:
+                self.warming.discard(key)
+
+    #
+    #   Desc:   Returns the client of a vendor without creating it. Clients older than their maximum age are returned
+    #           as well, so they can be used while their replacement is created (see warmUp).
+    #
+    #   @result
+    #           The client or None, if there is none.
+    #
+    def peek(self, key):
+        entry = self.clients.get(key)
+        if entry is None:
+            return None
+        return entry[0]
+
+    #
+    #   Desc:   True if the client is created in the background right now.
+    #
+    def isWarming(self, key):
+        return key in self.warming
+
+    #
+    #   Desc:   Returns the error of the last failed creation of a client or None, if the last creation succeeded.
+    #
+    def getError(self, key):
+        return self.errors.get(key)
+
+    #
+    #   Desc:   Removes a client, e.g. because its credentials were rejected. The next get(...) creates it again.
+    #
+    #   @param key
+    #           Type str. Identifies the client.
+    #
+    def invalidate(self, key):
+        with self._lock:
+            self.clients.pop(key, None)
+
+    #
+    #   Desc:   True if the pool contains a valid client for the key.
+    #
+    def contains(self, key):
+        entry = self.clients.get(key)
+        if entry is None:
+            return False
+        client, created, maxAge = entry
+        return maxAge is None or time.monotonic() - created < maxAge
+
+
+#
+#   Desc:   Vendor pinger, that is ready as soon as the client of its vendor is in the pool. Until then searches
+#           are skipped (see BasePinger.isReady), so a session never waits for the authentication at a vendor.
+#           The actual vendor pinger is created with the pooled client, when it is needed the first time.
+#
+#           The client is looked up in the pool for every search and order, so clients replaced after their maximum
+#           age or invalidated reach sessions already using the vendor. The vendor pinger is created again for a new
+#           client. Only the vendor pinger is kept, never the client.
+#
+#   @attribute pool
+#           Type VendorClientPool. The pool holding the client.
+#
+#   @attribute key
+#           Type str. Identifies the client in the pool.
+#
+#   @attribute factory
+#           Function without parameters creating an authenticated client.
+#
+#   @attribute createPinger
+#           Function creating the vendor pinger out of a client.
+#
+#   @attribute maxAge
+#           Type float. Seconds after which the client is created again. If None, the client is kept.
+#
+#   @attribute sharedOffers
+#           Type Boolean. sharedOffers of the vendor pinger (see BasePinger.sharedOffers).
+#
+#   @attribute offers
+#           Type ArrayOf(Entities.SequenceOffers). Offers handed to a new vendor pinger (see registerOffers and
+#           bind).
+#
+class LazyPinger(BasePinger):
+
+    def __init__(self, pool, key, factory, createPinger, maxAge=None, sharedOffers=True):
+        self.pool = pool
+        self.key = key
+        self.factory = factory
+        self.createPinger = createPinger
+        self.maxAge = maxAge
+        self.sharedOffers = sharedOffers
+        self.pinger = None
+        # Client of self.pinger
+        self.client = None
+        self.vendorMessages = []
+        self.offers = []
+
+    #
+    #   Desc:   Returns the vendor pinger for the current client of the pool. A new vendor pinger is created, if the
+    #           pool holds another client than the one of the vendor pinger and the vendor pinger is not running.
+    #
+    #   @result
+    #           Type BasePinger or None, if the pool has no client.
+    #
+    def resolve(self):
+        # Outdated clients are replaced in the background and can be used until then.
+        # After a failure the creation is started again by searchOffers(...) (see retry).
+        if not self.pool.contains(self.key) and self.pool.getError(self.key) is None:
+            self.pool.warmUp(self.key, self.factory, self.maxAge)
+
+        client = self.pool.peek(self.key)
+        if client is None:
+            return None
+        if client is not self.client and (self.pinger is None or not self.pinger.isRunning()):
+            self.bind(client)
+        return self.pinger
+
+    #
+    #   Desc:   Creates the vendor pinger for a client. Offers and messages of the previous vendor pinger are handed
+    #           over, so offers found before can still be ordered.
+    #
+    def bind(self, client):
+        previous = self.pinger
+        self.pinger = self.createPinger(client)
+        self.client = client
+        if previous is not None:
+            self.offers = previous.getOffers()
+            for message in previous.getVendorMessages():
+                self.pinger.addVendorMessage(message)
+        if self.offers:
+            self.pinger.registerOffers(self.offers)
+
+    #
+    #   see BasePinger.isReady
+    #
+    def isReady(self):
+        if self.resolve() is not None:
+            return True
+        # Failed vendors are ready to report their error
+        return not self.pool.isWarming(self.key) and self.pool.getError(self.key) is not None
+
+    #
+    #   Desc:   Creates the client again in the background, if the last creation failed. An outdated client may
+    #           still be used until then. The vendor pinger is created again with the new client (see resolve).
+    #
+    def retry(self):
+        if self.pool.getError(self.key) is not None:
+            self.pool.warmUp(self.key, self.factory, self.maxAge)
+
+    #
+    #   Desc:   Removes the client of the vendor pinger from the pool, because the vendor rejected it, and creates
+    #           it again. A client replaced meanwhile is kept.
+    #
+    def reject(self):
+        if self.client is not None and self.pool.peek(self.key) is self.client:
+            self.pool.invalidate(self.key)
+            self.pool.warmUp(self.key, self.factory, self.maxAge)
+
+    #
+    #   see BasePinger.searchOffers
+    #
+    def searchOffers(self, seqInf):
+        pinger = self.resolve()
+        if pinger is None:
+            error = self.pool.getError(self.key)
+            if self.pool.isWarming(self.key) or error is None:
+                raise UnavailableError("Vendor is not available yet")
+            # Try again with the next search
+            self.retry()
+            raise UnavailableError("Vendor is not available: " + str(error))
+        self.retry()
+        try:
+            pinger.searchOffers(seqInf)
+        except Exception as err:
+            if isRejection(err):
+                self.reject()
+            raise
+
+    #
+    #   see BasePinger.isRunning
+    #
+    def isRunning(self):
+        return self.pinger is not None and self.pinger.isRunning()
+
+    #
+    #   see BasePinger.waitForCompletion
+    #
+    def waitForCompletion(self, timeout=None):
+        if self.pinger is None:
+            return True
+        return self.pinger.waitForCompletion(timeout)
+
+    #
+    #   see BasePinger.getOffers
+    #
+    def getOffers(self):
+        if self.pinger is None:
+            return []
+        return self.pinger.getOffers()
+
+    #
+    #   see BasePinger.clear
+    #
+    def clear(self):
+        self.vendorMessages = []
+        self.offers = []
+        if self.pinger is not None:
+            self.pinger.clear()
+
+    #
+    #   see BasePinger.getVendorMessages
+    #
+    def getVendorMessages(self):
+        if self.pinger is None:
+            return self.vendorMessages
+        return self.pinger.getVendorMessages()
+
+    #
+    #   see BasePinger.addVendorMessage
+    #
+    def addVendorMessage(self, message):
+        if self.pinger is None:
+            self.vendorMessages.append(message)
+        else:
+            self.pinger.addVendorMessage(message)
+
+    #
+    #   see BasePinger.registerOffers
+    #
+    def registerOffers(self, offers):
+        self.offers = offers
+        if self.pinger is not None:
+            self.pinger.registerOffers(offers)
+
+    #
+    #   see BasePinger.order
+    #
+    def order(self, offerIds):
+        # Offers may be registered without searching at the vendor (e.g. all found in the cache)
+        pinger = self.resolve()
+        if pinger is None:
+            raise UnavailableError("Vendor is not available yet")
+        try:
+            return pinger.order(offerIds)
+        except Exception as err:
+            if isRejection(err):
+                self.reject()
+            raise
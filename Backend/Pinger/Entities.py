@@ -93,10 +93,28 @@ class Currency(Enum):
     def symbol(self):
         return {"EUR": "€", "USD": "$", "UNKNOWN": "?"}[self.name]
 
+#
+#   Desc:   State of the search at a specific vendor
+#
+class SearchStatus(Enum):
+    # Search is not started yet
+    PENDING = 0
+    # Vendor is searching
+    RUNNING = 1
+    # Search is finished
+    FINISHED = 2
+    # Search failed. The reason can be found in the vendor messages.
+    FAILED = 3
+
 #########################################################
 #                                                       #
 #   Data-Classes                                        #
 #                                                       #
+#   Sequences, offers and their parts are created for   #
+#   every sequence and vendor and kept in the sessions. #
+#   They use __slots__, so they need no dict per        #
+#   object and only have the attributes listed there.   #
+#                                                       #
 #########################################################
 
 
@@ -114,6 +132,8 @@ class Currency(Enum):
 #
 class SequenceInformation:
 
+    __slots__ = ("key", "name", "sequence")
+
     # Define counter for IDs
     # Atomic Counter is a threadsafe counter
     idcounter = AtomicCounter()
@@ -177,6 +197,8 @@ class VendorInformation:
 #
 class Price:
 
+    __slots__ = ("currency", "amount", "customerSpecific")
+
     def __init__(self, amount=-1, currency=Currency.EUR, customerSpecific=False):
 
         # the currency of the price
@@ -211,6 +233,8 @@ class Price:
 #
 class SequenceVendorOffers:
 
+    __slots__ = ("sequenceInformation", "vendorOffers")
+
     def __init__(self, sequenceInformation, vendorOffers = []):
 
         # Sequence information
@@ -229,6 +253,10 @@ class SequenceVendorOffers:
 #       Type ArrayOf(Offer). Represents the offers for the sequence specified by attribute sequenceInformation.
 #
 class SequenceOffers:
+
+    # Weak references are used by the validator (see Validator.EntityValidator)
+    __slots__ = ("sequenceInformation", "offers", "__weakref__")
+
     def __init__(self, sequenceInformation, offers = []):
         self.sequenceInformation = sequenceInformation
         self.offers = offers
@@ -247,6 +275,9 @@ class SequenceOffers:
 #
 class VendorOffers:
 
+    # Weak references are used by the validator (see Validator.EntityValidator)
+    __slots__ = ("vendorInformation", "offers", "__weakref__")
+
     def __init__(self, vendorInformation, offers = []):
         self.vendorInformation = vendorInformation
         self.offers = offers
@@ -271,12 +302,22 @@ class VendorOffers:
 #           Type ArrayOf(Message). Offer specific messages. Can be used to return debug information
 #           or to output errors from the vendor-APIs.
 #
+#   Offers with additional attributes (e.g. isHq of GeneArt) are created by a subclass (see withAttributes).
+#
 class Offer:
 
+    __slots__ = ("key", "price", "turnovertime", "messages")
+
     # Define counter for IDs
     # Atomic Counter is a threadsafe counter
     idcounter = AtomicCounter()
 
+    # Names of the additional attributes of the class
+    attributes = ()
+
+    # Names of additional attributes -> subclass of Offer (see withAttributes)
+    attributeTypes = {}
+
     def __init__(self, price=Price(), turnovertime=-1, messages = []):
 
         # Unique id of the offer
@@ -297,6 +338,41 @@ class Offer:
     def generateId():
         return Offer.idcounter.increment()
 
+    #
+    #   Desc:   Returns the subclass of Offer having the given additional attributes. Classes are created once,
+    #           so all offers with the same attributes share their class.
+    #
+    #   @param names
+    #           Type ArrayOf(str). Names of the additional attributes.
+    #
+    #   @result
+    #           Type class. Subclass of Offer. Offer itself if names is empty.
+    #
+    @staticmethod
+    def withAttributes(names):
+        names = tuple(sorted(names))
+        if not names:
+            return Offer
+        offerType = Offer.attributeTypes.get(names)
+        if offerType is None:
+            name = "Offer" + "".join(attribute[:1].upper() + attribute[1:] for attribute in names)
+            offerType = Offer.attributeTypes.setdefault(names, type(name, (Offer,), {"__slots__": names,
+                                                                                     "attributes": names}))
+        return offerType
+
+    #
+    #   Desc:   Returns the additional attributes, that are set.
+    #
+    #   @result
+    #           Type dict {name: value}.
+    #
+    def getAttributes(self):
+        attributes = {}
+        for name in self.attributes:
+            if hasattr(self, name):
+                attributes[name] = getattr(self, name)
+        return attributes
+
 #
 #   Desc:   Messages with specific type and text.
 #
@@ -307,10 +383,36 @@ class Offer:
 #
 class Message:
 
+    __slots__ = ("messageType", "text")
+
+    # (messageType, text) -> shared message (see intern)
+    internedMessages = {}
+
+    # Maximum number of shared messages
+    maxInterned = 10000
+
     def __init__(self, messageType = MessageType.DEBUG, text = ""):
         self.messageType = messageType
         self.text = text
 
+    #
+    #   Desc:   Returns a message shared by everyone asking for the same type and text. Used for messages
+    #           repeated for many offers (e.g. "dnaStrings_accepted"). Shared messages must not be changed.
+    #           After maxInterned messages, new messages are not shared anymore.
+    #
+    #   @result
+    #           Type Message.
+    #
+    @staticmethod
+    def intern(messageType = MessageType.DEBUG, text = ""):
+        key = (messageType, text)
+        message = Message.internedMessages.get(key)
+        if message is None:
+            message = Message(messageType, text)
+            if len(Message.internedMessages) < Message.maxInterned:
+                message = Message.internedMessages.setdefault(key, message)
+        return message
+
 
 #####################################################
 #                                                   #
@@ -1,16 +1,19 @@
 import json
 import re
+from concurrent import futures
 from datetime import datetime
 import requests
 from .Pinger import *
 from .Validator import *
+from .ClientPool import createHttpSession
 
 class GeneArtClient: 
     # Constructur for a GeneArtClient ()
     # Takes as input the configuration's parameters 
     # dnaStrings and hqDnaStrings have per defualt the value True
+    # poolSize is the number of connections kept alive for concurrent requests
 
-    def __init__(self, server, validate, status, addToCart, upload, username, token, dnaStrings = True, hqDnaStrings = True, timeout = 60): 
+    def __init__(self, server, validate, status, addToCart, upload, username, token, dnaStrings = True, hqDnaStrings = True, timeout = 60, poolSize = 10): 
         self.server = server
         self.validate = validate
         self.status = status
@@ -21,6 +24,7 @@ class GeneArtClient:
         self.dnaStrings = dnaStrings 
         self.hqDnaStrings = hqDnaStrings
         self.timeout = timeout
+        self.session = createHttpSession(poolSize)
         self.validAcc = self.authenticate()
         if(self.validAcc == False):
             raise AuthenticationError('User Credentials are wrong')
@@ -61,7 +65,7 @@ class GeneArtClient:
     def statusReview(self, projectId):
         request = self.getAuthPart(projectId)
         dest = self.destination("status")
-        resp = requests.post(dest, json = request, timeout = self.timeout)
+        resp = self.session.post(dest, json = request, timeout = self.timeout)
         result = resp.json()
         return result
 
@@ -69,7 +73,7 @@ class GeneArtClient:
     def toCart(self, projectId):
         request = self.getAuthPart(projectId)
         dest = self.destination("addToCart")
-        resp = requests.post(dest, json = request, timeout = self.timeout)
+        resp = self.session.post(dest, json = request, timeout = self.timeout)
         result = resp.json()
         return result
     
@@ -98,7 +102,7 @@ class GeneArtClient:
                 "constructs": constructsList
             }
         }
-        resp = requests.post(dest, json = request, timeout = self.timeout)
+        resp = self.session.post(dest, json = request, timeout = self.timeout)
         result = resp.json()
         return result
 
@@ -140,7 +144,7 @@ class GeneArtClient:
         }
 
         # Create Request
-        resp = requests.post(dest, json = request, timeout = self.timeout)
+        resp = self.session.post(dest, json = request, timeout = self.timeout)
 
         # Return result
         result = resp.json()
@@ -171,7 +175,7 @@ class GeneArtClient:
                 "constructs": constructsList
             }
         }
-        resp = requests.post(dest, json = request, timeout = self.timeout)
+        resp = self.session.post(dest, json = request, timeout = self.timeout)
         result = resp.json()
         return result
     
@@ -188,6 +192,11 @@ class GeneArtClient:
         return clean_consName
 
 
+#
+#   Offers of GeneArt. isHq is True for offers of the product hqDnaStrings.
+#
+GeneArtOffer = Offer.withAttributes(["isHq"])
+
 #
 #   The GeneArt Pinger
 #
@@ -204,13 +213,19 @@ class GeneArt(BasePinger):
     hqDnaStrings_default = True
     timeout_default = 60
     cartBaseUrl_default = "https://www.thermofisher.com/order/catalog/en/US/direct/lt?cmd=ViewCart&ShoppingCartKey="
+    batchSize_default = 50
+    parallelism_default = 4
     currencies = {"EUR":Currency.EUR, "USD":Currency.USD}
     #
     # Constructur for a GeneArt-Pinger
     # Takes as input the log-in parameters.
+    # If a client is given, it is used instead of creating and authenticating a new one (see ClientPool).
+    # Sequences are validated in requests of at most batchSize sequences. Up to parallelism requests are sent at the same time.
     #
-    def __init__(self, username, token, server = server_default, validate = validate_default, status = status_default, addToCart = addToCart_default, upload = upload_default, dnaStrings = dnaStrings_default, hqDnaStrings = hqDnaStrings_default, timeout = timeout_default, cartBaseUrl = cartBaseUrl_default):
+    def __init__(self, username, token, server = server_default, validate = validate_default, status = status_default, addToCart = addToCart_default, upload = upload_default, dnaStrings = dnaStrings_default, hqDnaStrings = hqDnaStrings_default, timeout = timeout_default, cartBaseUrl = cartBaseUrl_default, client = None, batchSize = batchSize_default, parallelism = parallelism_default):
         self.running = False
+        self.batchSize = batchSize
+        self.parallelism = parallelism
 
         self.server = server
         self.validate = validate
@@ -224,14 +239,16 @@ class GeneArt(BasePinger):
         self.timeout = timeout
         self.cartBaseUrl = cartBaseUrl
        
-        try:
-            self.client = GeneArtClient(self.server, 
-                      self.validate, self.status, self.addToCart,
-                      self.upload, 
-                      self.username, self.token, 
-                      self.dnaStrings, self.hqDnaStrings, self.timeout)
-        except requests.exceptions.RequestException as err:
-            raise UnavailableError("Request got timeout") from err
+        self.client = client
+        if self.client is None:
+            try:
+                self.client = GeneArtClient(self.server, 
+                          self.validate, self.status, self.addToCart,
+                          self.upload, 
+                          self.username, self.token, 
+                          self.dnaStrings, self.hqDnaStrings, self.timeout)
+            except requests.exceptions.RequestException as err:
+                raise UnavailableError("Request got timeout") from err
 
 
         self.offers = []
@@ -245,7 +262,7 @@ class GeneArt(BasePinger):
     #
     def encode_sequence(self, seqInf):
         if isinstance(seqInf, SequenceInformation):
-            if self.validator.validate(seqInf):
+            if self.validator.validateInternal(seqInf):
                 return { "idN": seqInf.key, "name": seqInf.name, "sequence": seqInf.sequence}
         else:
             type_name = seqInf.__class__.__name__
@@ -284,63 +301,21 @@ class GeneArt(BasePinger):
         try: 
             self.running = True
             offers = [] # Empty Offers List
-            for product in "dnaStrings", "hqDnaStrings": # Two possible Product Types. 
-                try:
-                    response = self.projectValidate(seqInf, product)
-                except requests.exceptions.RequestException as err:  # If request timeout             
-                    self.running = False
-                    raise UnavailableError from err
-    
-                count = 0 # Count the sequences
-                for seq in seqInf:
-                    accepted = response["constructs"][count]["accepted"] # See if the API accepted the sequence
-                    # If the sequence was accepted                    
-                    if accepted == True:
-                        messageText = product + "_" + "accepted"
-                        message = Message(MessageType.INFO, messageText)
-                        turnOverTime = response["constructs"][count]["eComInfo"]["productionDaysEstimated"]
-                        currencycode = response["constructs"][count]["eComInfo"]["currencyIsoCode"]
-                        cost = response["constructs"][count]["eComInfo"]["lineItems"][0]["customerSpecificPrice"]
-                        # If the currencycode is known.
-                        if(currencycode in list(self.currencies.keys())):
-                            price = Price(amount = cost, currency = self.currencies[currencycode], customerSpecific = True)
-                        # If the currencycode is unknown.
-                        else:
-                            price = Price(amount = cost, currency = UNKNOWN, customerSpecific = True)
-                    # If the sequence was rejected
-                    else:
-                        turnOverTime = -1
-                        price = Price()
-                        # If there was only one reason why it got rejected. Identify the reason and costumize the message text.
-                        if(len(response["constructs"][count]["reasons"]) == 1):
-                            reason = response["constructs"][count]["reasons"][0]
-                            messageText = product + "_" + "rejected_" + str(reason) + "."
-                            if (reason == "length"):
-                                message = Message(MessageType.INVALID_LENGTH, messageText)
-                            elif (reason == "homology"):
-                                message = Message(MessageType.HOMOLOGY, messageText)
-                            elif (reason == "problems"):
-                                message = Message(MessageType.INVALID_LENGTH, messageText)
-                            else:
-                                message = Message(MessageType.SYNTHESIS_ERROR, messageText)
-                        # If there was were several reasons why it got rejected. Costumize the message text.
-                        else:
-                            messageText = product + "_" + "rejected_"
-                            for reason in response["constructs"][count]["reasons"]:
-                                messageText = messageText + str(reason) + "."
-                            message = Message(MessageType.SYNTHESIS_ERROR, messageText)
-    
-                    currentOffer = Offer(price = price, turnovertime = turnOverTime, messages = [message])
-                    currentOffer.isHq = product == "hqDnaStrings"
-                    seqOffer = SequenceOffers(seq, [currentOffer])
-                    offers.append(seqOffer)
-                    count = count + 1
+            products = self.getProducts()
+            if len(products) == 0:
+                offers = [SequenceOffers(seq, []) for seq in seqInf]
+            else:
+                # The products are validated at the same time
+                with futures.ThreadPoolExecutor(max_workers=len(products)) as executor:
+                    for productOffers in executor.map(lambda product: self.searchProduct(seqInf, product), products):
+                        offers.extend(productOffers)
             self.offers = offers
             self.running = False
         except InvalidInputError as err:
             self.running = False
             raise InvalidInputError from err
         except requests.exceptions.RequestException as err:
+            self.running = False
             raise UnavailableError("Request got a error") from err
         except UnavailableError as err:
             self.running = False
@@ -350,6 +325,94 @@ class GeneArt(BasePinger):
             raise UnavailableError from err    
         
     
+    #
+    #   Returns the enabled products. Products are enabled by the values True or 'enabled'.
+    #       (The products can only have the values: 'dnaStrings' or 'hqDnaStrings')
+    #
+    def getProducts(self):
+        products = []
+        for product, enabled in ("dnaStrings", self.dnaStrings), ("hqDnaStrings", self.hqDnaStrings):
+            if enabled is True or str(enabled).lower() in ("enabled", "true"):
+                products.append(product)
+        return products
+
+    #
+    #   Validates the sequences of searchOffers(seqInf) for a product.
+    #       Large uploads are validated in several requests. A failed request only fails its own sequences.
+    #       Returns a SequenceOffer for every sequence
+    #
+    def searchProduct(self, seqInf, product):
+        chunkResults = searchInChunks(seqInf, lambda chunk: self.searchChunk(chunk, product), self.batchSize, self.parallelism)
+        return mergeChunks(chunkResults, lambda chunk, error: self.chunkErrorOffers(chunk, error, product))
+
+    #
+    #   Validates a chunk of the sequences of searchOffers(seqInf) for a product.
+    #       Returns a SequenceOffer for every sequence of the chunk
+    #
+    def searchChunk(self, seqInf, product):
+        offers = [] # Empty Offers List
+        try:
+            response = self.projectValidate(seqInf, product)
+        except requests.exceptions.RequestException as err:  # If request timeout             
+            raise UnavailableError from err
+    
+        count = 0 # Count the sequences
+        for seq in seqInf:
+            accepted = response["constructs"][count]["accepted"] # See if the API accepted the sequence
+            # If the sequence was accepted                    
+            if accepted == True:
+                messageText = product + "_" + "accepted"
+                message = Message.intern(MessageType.INFO, messageText)
+                turnOverTime = response["constructs"][count]["eComInfo"]["productionDaysEstimated"]
+                currencycode = response["constructs"][count]["eComInfo"]["currencyIsoCode"]
+                cost = response["constructs"][count]["eComInfo"]["lineItems"][0]["customerSpecificPrice"]
+                # If the currencycode is known.
+                if(currencycode in list(self.currencies.keys())):
+                    price = Price(amount = cost, currency = self.currencies[currencycode], customerSpecific = True)
+                # If the currencycode is unknown.
+                else:
+                    price = Price(amount = cost, currency = UNKNOWN, customerSpecific = True)
+            # If the sequence was rejected
+            else:
+                turnOverTime = -1
+                price = Price()
+                # If there was only one reason why it got rejected. Identify the reason and costumize the message text.
+                if(len(response["constructs"][count]["reasons"]) == 1):
+                    reason = response["constructs"][count]["reasons"][0]
+                    messageText = product + "_" + "rejected_" + str(reason) + "."
+                    if (reason == "length"):
+                        message = Message.intern(MessageType.INVALID_LENGTH, messageText)
+                    elif (reason == "homology"):
+                        message = Message.intern(MessageType.HOMOLOGY, messageText)
+                    elif (reason == "problems"):
+                        message = Message.intern(MessageType.INVALID_LENGTH, messageText)
+                    else:
+                        message = Message.intern(MessageType.SYNTHESIS_ERROR, messageText)
+                # If there was were several reasons why it got rejected. Costumize the message text.
+                else:
+                    messageText = product + "_" + "rejected_"
+                    for reason in response["constructs"][count]["reasons"]:
+                        messageText = messageText + str(reason) + "."
+                    message = Message.intern(MessageType.SYNTHESIS_ERROR, messageText)
+    
+            currentOffer = GeneArtOffer(price = price, turnovertime = turnOverTime, messages = [message])
+            currentOffer.isHq = product == "hqDnaStrings"
+            seqOffer = SequenceOffers(seq, [currentOffer])
+            offers.append(seqOffer)
+            count = count + 1
+        return offers
+
+    #
+    #   Creates offers with the error of a failed chunk for a product (see Pinger.mergeChunks).
+    #
+    def chunkErrorOffers(self, seqInf, error, product):
+        offers = []
+        for seq in seqInf:
+            currentOffer = chunkErrorOffer(error, GeneArtOffer)
+            currentOffer.isHq = product == "hqDnaStrings"
+            offers.append(SequenceOffers(seq, [currentOffer]))
+        return offers
+
     # 
     #   Upload Project with constructs
     #       Takes as input a list of 'SequenceInformation' objects and the desired product type 
@@ -562,6 +625,7 @@ class GeneArt(BasePinger):
             self.running = False
             raise InvalidInputError from err
         except requests.exceptions.RequestException as err:
+            self.running = False
             raise UnavailableError("Request got a error") from err
         except UnavailableError as err:
             self.running = False
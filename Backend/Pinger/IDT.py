@@ -1,6 +1,7 @@
 import requests
 from .Pinger import *
 from .Validator import *
+from .ClientPool import createHttpSession
 import json
 import uuid
 from datetime import datetime, timezone
@@ -9,7 +10,8 @@ import xml.etree.ElementTree as ET
 class IDTClient: 
     # Constructor for a IDTClient ()
     # Takes as input the configuration's parameters 
-    def __init__(self, token_server, screening_server, idt_username, idt_password, client_id, client_secret, shared_secret, scope, token = "YOUR_TOKEN", timeout = 60):
+    # poolSize is the number of connections kept alive for concurrent requests
+    def __init__(self, token_server, screening_server, idt_username, idt_password, client_id, client_secret, shared_secret, scope, token = "YOUR_TOKEN", timeout = 60, poolSize = 10):
         self.token_server = token_server
         self.screening_server = screening_server
         self.idt_username = idt_username
@@ -20,6 +22,7 @@ class IDTClient:
         self.token = token
         self.scope = scope
         self.timeout = timeout
+        self.session = createHttpSession(poolSize)
         if(self.token == "YOUR_TOKEN"):
             self.token = self.getToken()
         else:
@@ -30,7 +33,7 @@ class IDTClient:
     # The token expires in one hour.
     def checkToken(self):
         exampleList = [{"Name": "ExampleSeq", "Sequence": "ATCG"}]
-        response = requests.post(self.screening_server,
+        response = self.session.post(self.screening_server,
                   headers={'Authorization': 'Bearer {}'.format(self.token), 
                   'Content-Type': 'application/json; charset=utf-8'}, 
                   json=exampleList, 
@@ -44,13 +47,14 @@ class IDTClient:
     # The token expires in one hour.
     def getToken(self):
         data = {'grant_type': 'password', 'username': self.idt_username, 'password': self.idt_password, 'scope': self.scope}
-        r = requests.post(self.token_server, data, auth=requests.auth.HTTPBasicAuth(self.client_id, self.client_secret), timeout = self.timeout)
+        r = self.session.post(self.token_server, data, auth=requests.auth.HTTPBasicAuth(self.client_id, self.client_secret), timeout = self.timeout)
         if(not('access_token' in r.json())):
             raise AuthenticationError("Access token could not be generated. Check your credentials.")
         access_token = r.json()['access_token']
         return access_token
         
     # This method takes as input a listOfSequences and it is used to send a HTTP-Request to the API endpoint to test its complexity. 
+    # If the token expired, a new token is generated and the request is sent again.
     def screening(self, listOfSequences):
         constructsList = []
         for construct in listOfSequences:
@@ -59,7 +63,15 @@ class IDTClient:
                 "Sequence": construct["sequence"],
               }
             constructsList.append(sequence)
-        resp = requests.post(self.screening_server,
+        result = self.postScreening(constructsList)
+        if(type(result) != list and result.get("Message") == "Authorization has been denied for this request."):
+            self.token = self.getToken()
+            result = self.postScreening(constructsList)
+        return result
+
+    # Sends the screening request with the current token.
+    def postScreening(self, constructsList):
+        resp = self.session.post(self.screening_server,
                   headers={'Authorization': 'Bearer {}'.format(self.token), 
                   'Content-Type': 'application/json; charset=utf-8'}, 
                   json=constructsList, 
@@ -179,7 +191,7 @@ class IDTClient:
         headers = {"Content-Type": "text/xml; charset=UTF-8",
            "SOAPAction": "http://www.idtdna.com/PostPurchaseOrder"}
 
-        resp = requests.post(url="http://stage.idtdna.com/orderintegration/cxml/service.asmx",
+        resp = self.session.post(url="http://stage.idtdna.com/orderintegration/cxml/service.asmx",
                      headers = headers,
                      data = encoded_request,
                      verify=False)
@@ -198,12 +210,18 @@ class IDT(BasePinger):
     token_default = "YOUR_TOKEN"
     scope_default = "test"
     timeout_default = 60
+    batchSize_default = 100
+    parallelism_default = 4
     #
     # Constructur for an IDT-Pinger
     # Takes as input the log-in parameters.
+    # If a client is given, it is used instead of creating and authenticating a new one (see ClientPool).
+    # Sequences are screened in requests of at most batchSize sequences. Up to parallelism requests are sent at the same time.
     #
-    def __init__(self, idt_username, idt_password, client_id, client_secret, shared_secret, token_server = token_server_default, screening_server = screening_server_default, token = token_default, scope = scope_default, timeout = timeout_default):
+    def __init__(self, idt_username, idt_password, client_id, client_secret, shared_secret, token_server = token_server_default, screening_server = screening_server_default, token = token_default, scope = scope_default, timeout = timeout_default, client = None, batchSize = batchSize_default, parallelism = parallelism_default):
         self.running = False
+        self.batchSize = batchSize
+        self.parallelism = parallelism
         self.token_server = token_server
         self.screening_server = screening_server
         self.idt_username = idt_username
@@ -214,11 +232,13 @@ class IDT(BasePinger):
         self.scope = scope
         self.timeout = timeout
         self.token = token # Set the token (Token may or may not be valid)
-        self.client = IDTClient(self.token_server, 
-                      self.screening_server, self.idt_username, self.idt_password,
-                      self.client_id, 
-                      self.client_secret, self.shared_secret, self.scope, 
-                      self.token, self.timeout)
+        self.client = client
+        if self.client is None:
+            self.client = IDTClient(self.token_server, 
+                          self.screening_server, self.idt_username, self.idt_password,
+                          self.client_id, 
+                          self.client_secret, self.shared_secret, self.scope, 
+                          self.token, self.timeout)
         self.token = self.client.token # Set the token (Token is now valid because it was generated using the client)
         self.offers = []
         self.vendorMessages = []
@@ -230,7 +250,7 @@ class IDT(BasePinger):
     #
     def encode_sequence(self, seqInf):
         if isinstance(seqInf, SequenceInformation):
-            if self.validator.validate(seqInf):
+            if self.validator.validateInternal(seqInf):
                 return { "idN": seqInf.key, "name": seqInf.name, "sequence": seqInf.sequence}
         else:
             type_name = seqInf.__class__.__name__
@@ -274,27 +294,15 @@ class IDT(BasePinger):
 
         try:
             self.running = True
-            offers = [] # Empty Offers List
-            response = self.screening(seqInf)
-            for i in range(len(seqInf)):
-                if len(response[i]) == 0: # Empty List, means there are no problems found
-                    messageText = seqInf[i].name + "_" + "accepted"
-                    message = Message(MessageType.INFO, messageText)
-                if len(response[i]) != 0: # Not an empty List, means there are some problems
-                    messageText = seqInf[i].name + "_" + "rejected_"
-                    for j in range(len(response[i])):
-                        messageText = messageText + response[i][j]["Name"] + "."
-                    message = Message(MessageType.SYNTHESIS_ERROR, messageText)
-                self.validator.validate(message)           
-                seqOffer = SequenceOffers(seqInf[i], [Offer(messages = [message])])
-                self.validator.validate(seqOffer)
-                offers.append(seqOffer)
-            self.offers = offers
+            # Large uploads are screened in several requests. A failed request only fails its own sequences.
+            chunkResults = searchInChunks(seqInf, self.searchChunk, self.batchSize, self.parallelism)
+            self.offers = mergeChunks(chunkResults)
             self.running = False
         except InvalidInputError as err:
             self.running = False
             raise InvalidInputError from err
         except requests.exceptions.RequestException as err:
+            self.running = False
             raise UnavailableError("Request got a error") from err
         except UnavailableError as err:
             self.running = False
@@ -304,6 +312,31 @@ class IDT(BasePinger):
             raise UnavailableError from err
 
 
+    #
+    #   Screens a chunk of the sequences of searchOffers(seqInf).
+    #       Returns a SequenceOffer for every sequence of the chunk
+    #
+    def searchChunk(self, seqInf):
+        offers = [] # Empty Offers List
+        try:
+            response = self.screening(seqInf)
+        except requests.exceptions.RequestException as err:  # If request timeout
+            raise UnavailableError from err
+        for i in range(len(seqInf)):
+            if len(response[i]) == 0: # Empty List, means there are no problems found
+                messageText = seqInf[i].name + "_" + "accepted"
+                message = Message(MessageType.INFO, messageText)
+            if len(response[i]) != 0: # Not an empty List, means there are some problems
+                messageText = seqInf[i].name + "_" + "rejected_"
+                for j in range(len(response[i])):
+                    messageText = messageText + response[i][j]["Name"] + "."
+                message = Message(MessageType.SYNTHESIS_ERROR, messageText)
+            self.validator.validateInternal(message)           
+            seqOffer = SequenceOffers(seqInf[i], [Offer(messages = [message])])
+            self.validator.validateInternal(seqOffer)
+            offers.append(seqOffer)
+        return offers
+
     #
     #   Desc:   Returns this vendor's messages
     #
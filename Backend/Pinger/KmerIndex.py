@@ -0,0 +1,175 @@
+#########################################################
+#                                                       #
+#   This file contains an index of the k-mers           #
+#   (segments of k bases) of a batch of sequences.      #
+#   It finds segments repeated inside of a sequence     #
+#   and pairs of sequences sharing most of their        #
+#   segments (homology).                                #
+#                                                       #
+#   k-mers are hashed with NumPy and sorted once, so    #
+#   the work grows with the number of bases instead     #
+#   of the number of sequence pairs.                    #
+#                                                       #
+#########################################################
+
+import numpy as np
+
+from .Scanner import encodeSequences, normalizeSequence, OTHER
+
+# Multiplier of the polynomial hash. Arithmetic is done modulo 2^64.
+hashMultiplier = 0x100000001b3
+
+
+#
+#   Desc:   Hashes every k-mer of the concatenated sequences. The hash of a k-mer is the polynomial
+#           sum((code + 1) * hashMultiplier^(k - 1 - j)) modulo 2^64. It is built by doubling the length of the
+#           hashed segments, so only log2(k) passes over the bases are needed.
+#
+#   @param codes
+#           Type numpy array of uint8. Base codes (see Scanner.encodeSequences).
+#
+#   @param k
+#           Type int. Length of the k-mers.
+#
+#   @result
+#           Type numpy array of uint64. hashes[i] is the hash of codes[i:i + k]. Empty if there are less than k codes.
+#
+def hashKmers(codes, k):
+    count = len(codes) - k + 1
+    if count <= 0:
+        return np.zeros(0, dtype=np.uint64)
+
+    with np.errstate(over="ignore"):
+        # Hashes of the segments of blockLength bases starting at every position
+        block = codes.astype(np.uint64) + np.uint64(1)
+        blockLength = 1
+        # Hashes of the first hashedLength bases of every k-mer
+        hashes = np.zeros(count, dtype=np.uint64)
+        hashedLength = 0
+        remaining = k
+        while True:
+            if remaining & 1:
+                factor = np.uint64(pow(hashMultiplier, blockLength, 2 ** 64))
+                hashes = hashes * factor + block[hashedLength:hashedLength + count]
+                hashedLength = hashedLength + blockLength
+            remaining = remaining >> 1
+            if remaining == 0:
+                return hashes
+            factor = np.uint64(pow(hashMultiplier, blockLength, 2 ** 64))
+            block = block[:-blockLength] * factor + block[blockLength:]
+            blockLength = 2 * blockLength
+
+
+#
+#   Desc:   Index of the k-mers of a batch of sequences. k-mers containing other characters than A, C, G and T
+#           are left out.
+#
+#   @attribute sequences
+#           Type ArrayOf(str). The normalized sequences.
+#
+#   @attribute k
+#           Type int. Length of the k-mers.
+#
+#   @attribute maxOccurrences
+#           Type int. k-mers found in more sequences (e.g. common promoters) are not used to compare sequences,
+#           so the number of compared pairs stays small.
+#
+#   @attribute repeats
+#           Type numpy array of int. Number of k-mers of every sequence, that appeared before in the same sequence.
+#
+#   @attribute repeatPositions
+#           Type numpy array of int. Position of the first repeated k-mer in every sequence. -1 if there is none.
+#
+#   @attribute kmers
+#           Type numpy array of int. Number of different k-mers of every sequence.
+#
+class KmerIndex:
+
+    def __init__(self, sequences, k=20, maxOccurrences=16):
+        self.sequences = [normalizeSequence(sequence) for sequence in sequences]
+        self.k = k
+        self.maxOccurrences = maxOccurrences
+
+        codes, offsets = encodeSequences(self.sequences)
+        lengths = np.diff(offsets)
+        hashes = hashKmers(codes, k)
+
+        # A k-mer is valid if it ends in the same sequence and contains no other characters
+        owners = np.repeat(np.arange(len(self.sequences), dtype=np.int32), lengths)
+        others = np.zeros(len(codes) + 1, dtype=np.int64)
+        np.cumsum(codes == OTHER, out=others[1:])
+        positions = np.flatnonzero((owners[:len(hashes)] == owners[k - 1:]) &
+                                   (others[k:] == others[:len(hashes)]))
+
+        # Sorted by hash. k-mers sharing their hash are sorted by position afterwards, so equal k-mers of a
+        # sequence are next to each other. Sorting all k-mers by hash and position at once is much slower.
+        hashes = hashes[positions]
+        order = np.argsort(hashes)
+        self.hashes = hashes[order]
+        equal = self.hashes[1:] == self.hashes[:-1]
+        shared = np.flatnonzero(np.concatenate((equal, [False])) | np.concatenate(([False], equal)))
+        order[shared] = order[shared][np.lexsort((order[shared], self.hashes[shared]))]
+        self.positions = positions[order]
+        self.owners = owners[self.positions]
+
+        # k-mers with the same hash and sequence as their predecessor are repeats
+        repeated = np.zeros(len(self.hashes), dtype=bool)
+        repeated[1:] = (self.hashes[1:] == self.hashes[:-1]) & (self.owners[1:] == self.owners[:-1])
+        self.repeats = np.bincount(self.owners[repeated], minlength=len(self.sequences))
+        self.kmers = np.bincount(self.owners[~repeated], minlength=len(self.sequences))
+
+        # Position of the first repeat inside of its sequence
+        repeatOwners = self.owners[repeated]
+        self.repeatPositions = np.full(len(self.sequences), len(codes), dtype=np.int64)
+        np.minimum.at(self.repeatPositions, repeatOwners, self.positions[repeated] - offsets[repeatOwners])
+        self.repeatPositions[self.repeats == 0] = -1
+
+        # Different k-mers of every sequence for comparing sequences
+        self.uniqueHashes = self.hashes[~repeated]
+        self.uniqueOwners = self.owners[~repeated]
+
+    #
+    #   Desc:   Returns the first repeated segment of a sequence.
+    #
+    #   @param index
+    #           Type int. Index of the sequence.
+    #
+    #   @result
+    #           Type str. The segment or None, if the sequence has no repeats.
+    #
+    def getRepeat(self, index):
+        position = self.repeatPositions[index]
+        if position < 0:
+            return None
+        return self.sequences[index][position:position + self.k]
+
+    #
+    #   Desc:   Finds pairs of sequences sharing most of their k-mers.
+    #
+    #   @param minSimilarity
+    #           Type float. Minimum share of the k-mers of the smaller sequence, that must be found in the other one.
+    #
+    #   @result
+    #           Type ArrayOf(tuple (int, int, float)). Indices of both sequences, the first one smaller, and their
+    #           similarity between 0 and 1.
+    #
+    def getSimilarPairs(self, minSimilarity=0.8):
+        groupStarts = np.flatnonzero(np.concatenate(([True], self.uniqueHashes[1:] != self.uniqueHashes[:-1])))
+        groupSizes = np.diff(np.append(groupStarts, len(self.uniqueHashes)))
+
+        # Every pair of sequences sharing a k-mer. Groups of the same size are handled at once.
+        count = len(self.sequences)
+        pairs = [np.zeros(0, dtype=np.int64)]
+        for size in np.unique(groupSizes[(groupSizes > 1) & (groupSizes <= self.maxOccurrences)]):
+            starts = groupStarts[groupSizes == size]
+            members = self.uniqueOwners[starts[:, None] + np.arange(size)].astype(np.int64)
+            first, second = np.triu_indices(size, 1)
+            pairs.append((members[:, first] * count + members[:, second]).ravel())
+
+        pairs, shared = np.unique(np.concatenate(pairs), return_counts=True)
+        first = pairs // count
+        second = pairs % count
+        similarities = shared / np.maximum(np.minimum(self.kmers[first], self.kmers[second]), 1)
+
+        similar = np.flatnonzero(similarities >= minSimilarity)
+        return [(int(first[i]), int(second[i]), float(similarities[i])) for i in similar]
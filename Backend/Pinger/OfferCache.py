@@ -0,0 +1,402 @@
+#########################################################
+#                                                       #
+#   This file contains a cache for offers, that can     #
+#   be shared by all sessions. It sits between the      #
+#   ManagedPinger and the vendor pingers, so sequences  #
+#   searched before are not sent to the vendor again.   #
+#                                                       #
+#########################################################
+
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from .Entities import *
+from .Pinger import BasePinger, copyOffers
+from .Serialization import messageToList, messageFromList
+
+
+#
+#   Desc:   Interface of a cache for the offers of single sequences.
+#
+class OfferCache:
+
+    def __init__(self):
+        raise NotImplementedError
+
+    #
+    #   Desc:   Returns the cached offers.
+    #
+    #   @param key
+    #           Type tuple. Key created by CachingPinger.cacheKey(...).
+    #
+    #   @result
+    #           Type ArrayOf(Entities.Offer). The cached offers or None, if the key is unknown or expired.
+    #           The offers are shared with the cache and must not be changed.
+    #
+    def get(self, key):
+        raise NotImplementedError
+
+    #
+    #   Desc:   Stores offers in the cache.
+    #
+    #   @param key
+    #           Type tuple. Key created by CachingPinger.cacheKey(...).
+    #
+    #   @param offers
+    #           Type ArrayOf(Entities.Offer). The offers to store. They must not be changed afterwards.
+    #
+    def put(self, key, offers):
+        raise NotImplementedError
+
+    #
+    #   Desc:   Removes all entries.
+    #
+    def clear(self):
+        raise NotImplementedError
+
+
+#
+#   Desc:   Offer cache inside of the process memory. Entries expire after a time to live.
+#           If the cache is full, then the least recently used entry is removed.
+#           The cache is threadsafe.
+#
+#   @attribute ttl
+#           Type float. Seconds an entry is valid after it was stored.
+#
+#   @attribute maxEntries
+#           Type int. Maximum number of entries.
+#
+class InMemoryOfferCache(OfferCache):
+
+    def __init__(self, ttl=3600, maxEntries=10000):
+        self.ttl = ttl
+        self.maxEntries = maxEntries
+        # key -> (expiration time, offers), ordered from least to most recently used
+        self.entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    #
+    #   see OfferCache.get
+    #
+    def get(self, key):
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, offers = entry
+            if expires <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return offers
+
+    #
+    #   see OfferCache.put
+    #
+    def put(self, key, offers):
+        with self._lock:
+            self.entries[key] = (time.monotonic() + self.ttl, offers)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxEntries:
+                self.entries.popitem(last=False)
+
+    #
+    #   see OfferCache.clear
+    #
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+
+#
+#   Desc:   Offer cache stored in a SQLite database, so it survives restarts of the backend.
+#           The database runs in WAL mode, so reading is not blocked by writing.
+#           Every offer is stored as a row with its price, currency, turnover time and messages. Entries expire
+#           after a time to live and are deleted from time to time.
+#
+#   @attribute path
+#           Type str. Path of the database file. Missing directories are created.
+#
+#   @attribute ttl
+#           Type float. Seconds an entry is valid after it was stored.
+#
+class SqliteOfferCache(OfferCache):
+
+    # Number of put(...) calls between deletions of expired entries
+    purgeInterval = 100
+
+    def __init__(self, path, ttl=86400):
+        self.path = path
+        self.ttl = ttl
+        self.puts = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # The connection is shared by all threads, access is serialized by self._lock
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        with self._lock:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS offers ("
+                "vendor TEXT NOT NULL, digest TEXT NOT NULL, options TEXT NOT NULL, position INTEGER NOT NULL, "
+                "created REAL NOT NULL, price REAL NOT NULL, currency TEXT NOT NULL, customerSpecific INTEGER NOT NULL, "
+                "turnovertime INTEGER NOT NULL, messages TEXT NOT NULL, attributes TEXT NOT NULL, "
+                "PRIMARY KEY (vendor, digest, options, position))")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS offers_created ON offers (created)")
+        self.purge()
+
+    #
+    #   see OfferCache.get
+    #
+    def get(self, key):
+        vendor, digest, options = key
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT price, currency, customerSpecific, turnovertime, messages, attributes FROM offers "
+                "WHERE vendor = ? AND digest = ? AND options = ? AND created > ? ORDER BY position",
+                (str(vendor), digest, options, time.time() - self.ttl)).fetchall()
+        if not rows:
+            return None
+        return [self.rowToOffer(row) for row in rows]
+
+    #
+    #   see OfferCache.put
+    #
+    def put(self, key, offers):
+        vendor, digest, options = key
+        created = time.time()
+        rows = [(str(vendor), digest, options, position, created) + self.offerToRow(offer)
+                for position, offer in enumerate(offers)]
+        with self._lock:
+            self.connection.execute("BEGIN")
+            try:
+                self.connection.execute("DELETE FROM offers WHERE vendor = ? AND digest = ? AND options = ?",
+                                        (str(vendor), digest, options))
+                self.connection.executemany("INSERT INTO offers VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                self.connection.execute("COMMIT")
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                raise
+            self.puts = self.puts + 1
+            purge = self.puts % self.purgeInterval == 0
+        if purge:
+            self.purge()
+
+    #
+    #   see OfferCache.clear
+    #
+    def clear(self):
+        with self._lock:
+            self.connection.execute("DELETE FROM offers")
+
+    #
+    #   Desc:   Deletes expired entries.
+    #
+    def purge(self):
+        with self._lock:
+            self.connection.execute("DELETE FROM offers WHERE created <= ?", (time.time() - self.ttl,))
+
+    #
+    #   Desc:   Converts an offer to the values of the columns price, currency, customerSpecific, turnovertime,
+    #           messages and attributes. Attributes specific to a vendor (e.g. isHq of GeneArt) are stored as JSON.
+    #
+    def offerToRow(self, offer):
+        messages = [messageToList(message) for message in offer.messages]
+        attributes = offer.getAttributes()
+        return (offer.price.amount, offer.price.currency.name, int(offer.price.customerSpecific), offer.turnovertime,
+                json.dumps(messages), json.dumps(attributes))
+
+    #
+    #   Desc:   Converts a row created by offerToRow(...) back to an offer with a new key.
+    #
+    def rowToOffer(self, row):
+        amount, currency, customerSpecific, turnovertime, messages, attributes = row
+        attributes = json.loads(attributes)
+        offerType = Offer.withAttributes(attributes.keys())
+        offer = offerType(price=Price(amount=amount, currency=Currency[currency], customerSpecific=bool(customerSpecific)),
+                          turnovertime=turnovertime,
+                          messages=[messageFromList(message) for message in json.loads(messages)])
+        for name, value in attributes.items():
+            setattr(offer, name, value)
+        return offer
+
+
+#
+#   Desc:   Vendor pinger wrapping another vendor pinger. Offers of sequences found in the cache are
+#           returned without contacting the vendor. Only the other sequences are searched by the wrapped pinger.
+#
+#           Cached offers get new keys (see Entities.Offer.generateId), so offers of different searches never
+#           share a key. The combined offers are handed back to the wrapped pinger (see BasePinger.registerOffers),
+#           so its order(...) finds them. Offers of vendors, that can not be copied (see BasePinger.sharedOffers),
+#           must not be cached.
+#
+#   @attribute pinger
+#           Type BasePinger. The wrapped vendor pinger.
+#
+#   @attribute cache
+#           Type OfferCache. The cache, usually shared by the pingers of all sessions.
+#
+#   @attribute vendor
+#           Type str. Identifies the vendor in the cache keys.
+#
+#   @attribute options
+#           Type str. Settings of the vendor pinger changing the offers (e.g. products). Part of the cache keys.
+#
+class CachingPinger(BasePinger):
+
+    # Stands for the name of the sequence in cached messages (see copyOffers)
+    sequenceName = "{sequence}"
+    # Version of the cached offers. Entries of older versions are not used anymore and expire.
+    version = "2"
+
+    def __init__(self, pinger, cache, vendor, options=""):
+        self.pinger = pinger
+        self.cache = cache
+        self.vendor = vendor
+        self.options = options
+        self.running = False
+        self.offers = []
+
+    #
+    #   Desc:   Creates the cache key of a sequence. Sequences are compared case insensitive and without whitespace.
+    #
+    #   @param seqInf
+    #           Type Entities.SequenceInformation.
+    #
+    #   @result
+    #           Type tuple (vendor, sequence hash, options and version).
+    #
+    def cacheKey(self, seqInf):
+        sequence = "".join(seqInf.sequence.split()).upper()
+        return (self.vendor, hashlib.sha256(sequence.encode("utf-8")).hexdigest(),
+                self.options + "#" + CachingPinger.version)
+
+    #
+    #   Desc:   Offers with vendor or internal errors (see MessageType 2xxx and 3xxx) are not cached,
+    #           because they do not depend on the sequence.
+    #
+    #   @param offers
+    #           Type ArrayOf(Entities.Offer).
+    #
+    #   @result
+    #           Type Boolean. True if the offers can be cached.
+    #
+    def isCacheable(self, offers):
+        for offer in offers:
+            for message in offer.messages:
+                if 2000 <= message.messageType.value < 4000:
+                    return False
+        return True
+
+    #
+    #   see BasePinger.searchOffers
+    #
+    def searchOffers(self, seqInf):
+        # Check pinger is not running
+        if(self.isRunning()):
+            raise IsRunningError("Pinger is currently running and can not perform a other action")
+
+        self.running = True
+        try:
+            cachedOffers = {}
+            missingSequences = []
+            for seq in seqInf:
+                offers = self.cache.get(self.cacheKey(seq))
+                if offers is None:
+                    missingSequences.append(seq)
+                else:
+                    cachedOffers[seq.key] = copyOffers(offers, CachingPinger.sequenceName, seq.name)
+
+            # Only sequences not found in the cache are sent to the vendor
+            foundOffers = {}
+            if missingSequences:
+                self.pinger.searchOffers(missingSequences)
+                self.pinger.waitForCompletion()
+                for seqOffers in self.pinger.getOffers():
+                    foundOffers.setdefault(seqOffers.sequenceInformation.key, []).extend(seqOffers.offers)
+
+                for seq in missingSequences:
+                    offers = foundOffers.get(seq.key, [])
+                    if offers and self.isCacheable(offers):
+                        # Messages naming the sequence must not show up in other sessions
+                        self.cache.put(self.cacheKey(seq), copyOffers(offers, seq.name, CachingPinger.sequenceName))
+
+            offers = []
+            for seq in seqInf:
+                if seq.key in cachedOffers:
+                    offers.append(SequenceOffers(seq, cachedOffers[seq.key]))
+                else:
+                    offers.append(SequenceOffers(seq, foundOffers.get(seq.key, [])))
+
+            # Vendor pingers look up the offers to order in their own offers
+            self.registerOffers(offers)
+        finally:
+            self.running = False
+
+    #
+    #   see BasePinger.isRunning
+    #
+    def isRunning(self):
+        return self.running or self.pinger.isRunning()
+
+    #
+    #   see BasePinger.isReady
+    #
+    def isReady(self):
+        return self.pinger.isReady()
+
+    #
+    #   see BasePinger.getOffers
+    #
+    def getOffers(self):
+        return self.offers
+
+    #
+    #   see BasePinger.clear
+    #
+    def clear(self):
+        self.pinger.clear()
+        self.offers = []
+        self.running = False
+
+    #
+    #   see BasePinger.getVendorMessages
+    #
+    def getVendorMessages(self):
+        return self.pinger.getVendorMessages()
+
+    #
+    #   see BasePinger.addVendorMessage
+    #
+    def addVendorMessage(self, message):
+        self.pinger.addVendorMessage(message)
+
+    #
+    #   see BasePinger.order
+    #
+    def order(self, offerIds):
+        return self.pinger.order(offerIds)
+
+    #
+    #   see BasePinger.registerOffers
+    #
+    def registerOffers(self, offers):
+        self.offers = offers
+        self.pinger.registerOffers(offers)
+
+    #
+    #   see BasePinger.sharedOffers
+    #
+    @property
+    def sharedOffers(self):
+        return self.pinger.sharedOffers
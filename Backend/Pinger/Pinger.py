@@ -1,3 +1,8 @@
+import copy
+import threading
+import time
+from concurrent import futures
+
 from .Entities import *
 from .Validator import entityValidatorThrowing as Validator
 
@@ -21,6 +26,93 @@ class VendorHandler:
         self.vendor = vendorInformation
         self.handler = vendorPinger
 
+#
+#   Desc:   Splits sequences into chunks and calls a function for every chunk. Used by vendor pingers to send
+#           large numbers of sequences in several requests. An error only fails its own chunk.
+#
+#   @param seqInf
+#           Type ArrayOf(Entities.SequenceInformation). The sequences to split.
+#
+#   @param function
+#           Function taking a chunk (ArrayOf(Entities.SequenceInformation)) and returning its result.
+#
+#   @param batchSize
+#           Type int. Maximum number of sequences per chunk. If None or smaller than 1, there is only one chunk.
+#
+#   @param parallelism
+#           Type int. Maximum number of chunks processed at the same time.
+#
+#   @result
+#           Type ArrayOf((chunk, result, error)) in the order of the sequences. If the function raised an error,
+#           then result is None and error is the raised error. Otherwise error is None.
+#
+def searchInChunks(seqInf, function, batchSize=None, parallelism=1):
+    if batchSize is None or batchSize < 1:
+        batchSize = max(len(seqInf), 1)
+    chunks = [seqInf[start:start + batchSize] for start in range(0, len(seqInf), batchSize)]
+
+    def run(chunk):
+        try:
+            return (chunk, function(chunk), None)
+        except Exception as e:
+            return (chunk, None, e)
+
+    if len(chunks) <= 1 or parallelism is None or parallelism <= 1:
+        return [run(chunk) for chunk in chunks]
+    with futures.ThreadPoolExecutor(max_workers=min(parallelism, len(chunks))) as executor:
+        return list(executor.map(run, chunks))
+
+#
+#   Desc:   Joins the offers of chunks processed by searchInChunks(...). The sequences of failed chunks get an offer
+#           with an error message instead, so they can be told apart from sequences the vendor can not produce.
+#
+#   @param chunkResults
+#           Type ArrayOf((chunk, ArrayOf(Entities.SequenceOffers), error)). Result of searchInChunks(...).
+#
+#   @param errorOffers
+#           Function taking a failed chunk and its error and returning ArrayOf(Entities.SequenceOffers).
+#           By default every sequence gets a single offer with the error message.
+#
+#   @result
+#           Type ArrayOf(Entities.SequenceOffers) in the order of the sequences.
+#
+#   @throws
+#           the error of the first chunk, if all chunks failed.
+#
+def mergeChunks(chunkResults, errorOffers=None):
+    if errorOffers is None:
+        errorOffers = chunkErrorOffers
+    errors = [error for chunk, result, error in chunkResults if error is not None]
+    if chunkResults and len(errors) == len(chunkResults):
+        raise errors[0]
+
+    offers = []
+    for chunk, result, error in chunkResults:
+        if error is None:
+            offers.extend(result)
+        else:
+            offers.extend(errorOffers(chunk, error))
+    return offers
+
+#
+#   Desc:   Creates an offer with an error message for every sequence of a failed chunk (see mergeChunks).
+#
+def chunkErrorOffers(chunk, error):
+    return [SequenceOffers(seq, [chunkErrorOffer(error)]) for seq in chunk]
+
+#
+#   Desc:   Creates an offer with the error message of a failed chunk.
+#
+#   @param offerType
+#           Class of the offer (see Entities.Offer.withAttributes).
+#
+def chunkErrorOffer(error, offerType=Offer):
+    if isinstance(error, InvalidInputError):
+        messageType = MessageType.INTERNAL_ERROR
+    else:
+        messageType = MessageType.API_CURRENTLY_UNAVAILABLE
+    return offerType(messages=[Message(messageType, "Sequence could not be searched: " + str(error))])
+
 #########################################################
 #                                                       #
 #   Pinger                                              #
@@ -34,11 +126,59 @@ class VendorHandler:
 #                                                       #
 #########################################################
 
+#
+#   Desc:   Copies the offers of a sequence for another sequence. The copies get new keys (see
+#           Entities.Offer.generateId) or the keys given by getKey. Attributes specific to a vendor (e.g. isHq of
+#           GeneArt) are kept.
+#           Messages starting with the name of the sequence (e.g. "<name>_accepted" of IDT) are created again
+#           with the name of the other sequence.
+#
+#   @param offers
+#           Type ArrayOf(Entities.Offer).
+#
+#   @param name
+#           Type str. Name of the sequence the offers were found for.
+#
+#   @param newName
+#           Type str. Name of the sequence the copies are for.
+#
+#   @param getKey
+#           Function taking an offer and returning the key of its copy. Optional. By default every copy gets a
+#           new key.
+#
+#   @result
+#           Type ArrayOf(Entities.Offer). The copies.
+#
+def copyOffers(offers, name, newName, getKey=None):
+    copies = []
+    for offer in offers:
+        offerCopy = copy.copy(offer)
+        offerCopy.key = Offer.generateId() if getKey is None else getKey(offer)
+        offerCopy.messages = [renameMessage(message, name, newName) for message in offer.messages]
+        copies.append(offerCopy)
+    return copies
+
+#
+#   Desc:   Returns the message with the name of a sequence replaced (see copyOffers). Messages not starting with
+#           the name are returned unchanged, they may be shared (see Entities.Message.intern).
+#
+def renameMessage(message, name, newName):
+    if not name or name == newName or not message.text.startswith(name):
+        return message
+    return Message(message.messageType, newName + message.text[len(name):])
+
 #
 #   Desc:   Interface representing a Vendor-API with unified methods.
 #
+#   @attribute sharedOffers
+#           Type Boolean. True if offers of the vendor can be copied for other sequences with the same content,
+#           e.g. to other sessions by OfferCache.CachingPinger or to equal sequences by
+#           CompositePinger.deduplicate. False if offers hold state needed to order them (e.g. the constructs and
+#           quotes of Twist), so they can only be ordered for the sequence they were found for.
+#
 class BasePinger:
 
+    sharedOffers = True
 
     #
     #   Desc:   Contructor.
@@ -92,6 +232,41 @@ class BasePinger:
     def isRunning(self):
         raise NotImplementedError
 
+    #
+    #   Desc:   True if the pinger can search offers. Pingers that are still connecting to their vendor
+    #           return False. They are skipped by searches and stay pending, so nobody waits for them.
+    #           The default implementation is always ready.
+    #
+    #   @result
+    #           Boolean. True if ready, else false.
+    #
+    def isReady(self):
+        return True
+
+    #
+    #   Desc:   Blocks until the pinger is not running anymore or the timeout expired.
+    #           The default implementation checks isRunning() in growing intervals, so waiting does not keep a
+    #           CPU busy. Pingers that know when they are finished can override it.
+    #
+    #   @param timeout
+    #           Type float. Maximum time to wait in seconds. If None, then waiting until the pinger is finished.
+    #
+    #   @result
+    #           Boolean. True if the pinger is finished, False if the timeout expired before.
+    #
+    def waitForCompletion(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        interval = 0.01
+        while self.isRunning():
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                interval = min(interval, remaining)
+            time.sleep(interval)
+            interval = min(interval * 2, 0.5)
+        return True
+
     #
     #   Desc:   Returns the current offers. If isRunning() is True, then searching is not finished and maybe you can
     #           get a partial result. After searching is finished isRunning() is False and the result will be complete.
@@ -165,6 +340,18 @@ class BasePinger:
     def order(self, offerIds):
         return Order()
 
+    #
+    #   Desc:   Sets the offers orders are looked up in, if they were not found by the pinger itself. Used by
+    #           pingers wrapping a vendor pinger (e.g. OfferCache.CachingPinger) and for ordering offers found by
+    #           another pinger (see ManagedPinger.registerOffers).
+    #           The default implementation replaces the offers returned by getOffers().
+    #
+    #   @param offers
+    #           Type ArrayOf(Entities.SequenceOffers).
+    #
+    def registerOffers(self, offers):
+        self.offers = offers
+
 
 
 #
@@ -184,7 +371,7 @@ class ManagedPinger:
     #
     #   @param seqInf
     #           Type ArrayOf(Entities.SequenceInformation). Representation of the sequences you want offers for.
-    #           Sequence-Keys must be unique.
+    #           Sequence-Keys must be unique. Equal sequences with different keys get offers with different keys.
     #
     #   @param vendors
     #           Type ArrayOf(int). Search will be started only for vendors, which VendorInformation.key exists in given list. If 
@@ -210,6 +397,19 @@ class ManagedPinger:
     def isRunning(self):
         raise NotImplementedError
 
+    #
+    #   Desc:   Blocks until the search started by searchOffers(...) is finished or the timeout expired.
+    #           Use it instead of polling isRunning().
+    #
+    #   @param timeout
+    #           Type float. Maximum time to wait in seconds. If None, then waiting until the search is finished.
+    #
+    #   @result
+    #           Type Boolean. True if the search is finished, False if the timeout expired before.
+    #
+    def waitForCompletion(self, timeout=None):
+        raise NotImplementedError
+
     #
     #   Desc:   Returns the current offers. If isRunning() is True, then searching is not finished and maybe you can
     #           get a partial result. After searching is finished isRunning() is False and the result will be complete.
@@ -224,6 +424,34 @@ class ManagedPinger:
     def getOffers(self):
         raise NotImplementedError
 
+    #
+    #   Desc:   Returns the progress of the last search per vendor.
+    #           Vendors that were not ready (see BasePinger.isReady) stay PENDING after the search is finished.
+    #
+    #   @result
+    #           Type dict {(vendorkey: Entities.SearchStatus)*}. Contains every vendor included in the last
+    #           searchOffers(...) call. Empty if it was not searching before.
+    #
+    def getSearchStatus(self):
+        raise NotImplementedError
+
+    #
+    #   Desc:   Returns the offers found by a single vendor in the last search. Use it to process the result of a
+    #           vendor as soon as getSearchStatus() reports it as finished, without rebuilding the result of all vendors.
+    #
+    #   @param vendor
+    #           Type int. The key (VendorInformation.key) of the vendor.
+    #
+    #   @result
+    #           Type ArrayOf(Entities.SequenceOffers). The offers of the vendor. Empty if the vendor failed or returned
+    #           invalid offers.
+    #
+    #   @throws InvalidInputError
+    #           if parameter vendor does not match any key of a registered vendor.
+    #
+    def getVendorOffers(self, vendor):
+        raise NotImplementedError
+
     #
     #   Desc: Returns the collected vendor messages for all registered vendors.
     #         The format is {(vendorkey: [message*])*}
@@ -281,17 +509,66 @@ class ManagedPinger:
     def order(self, offerIds, vendor):
         raise NotImplementedError
 
+    #
+    #   Desc:   Hands offers to the vendor pingers, so they can be ordered by order(...), even if they were found by
+    #           another pinger, e.g. by the pinger of another worker process serving the same session.
+    #
+    #   @param offers
+    #           Type ArrayOf(Entities.SequenceVendorOffers). The offers, e.g. the search results of a session.
+    #
+    #   @param offerAliases
+    #           Type dict {vendorkey: {offer key: offer key}}. Copies of offers and the offers of the vendor they
+    #           stand for (see getOfferAliases). Optional.
+    #
+    #   @throws IsRunningError
+    #           if the Pinger is already running. You have to wait until it is finished.
+    #
+    def registerOffers(self, offers, offerAliases=None):
+        raise NotImplementedError
+
+    #
+    #   Desc:   Returns the keys of offers, that are ordered as another offer of the same vendor.
+    #
+    #   @result
+    #           Type dict {vendorkey: {offer key: key of the offer at the vendor}}. Empty if there are none.
+    #
+    def getOfferAliases(self):
+        return {}
+
 
 #
 #   Desc: A simple Implementation of a ManagedPinger
 #
 class CompositePinger(ManagedPinger):
 
-    def __init__(self):
+    #
+    #   Desc:   Constructor.
+    #
+    #   @param executor
+    #           Type concurrent.futures.Executor. Optional. If given, the vendors are searched concurrently on
+    #           this executor and searchOffers(...) returns immediately. The executor should be a bounded thread
+    #           pool, because the vendor pingers block until their HTTP requests are done.
+    #           If None, the vendors are searched one after another.
+    #
+    def __init__(self, executor=None):
         self.vendorHandler = []
         self.sequenceVendorOffers = []
         self.vendorMessages = {}
         self.curVendors = []
+        self.executor = executor
+        self.searchFutures = []
+        self.searchStatus = {}
+        self.offersLock = threading.Lock()
+        # key of a sequence -> key of the equal sequence sent to the vendors instead
+        self.duplicates = {}
+        # vendor key -> {(sequence key, offer key): key of the copy of the offer for this sequence}
+        self.fanOutKeys = {}
+        # vendor key -> {key of a copy: key of the offer of the vendor}
+        self.offerAliases = {}
+        # key of a sequence -> its SequenceVendorOffers in self.sequenceVendorOffers
+        self.sequenceIndex = {}
+        # vendor key -> (offers of the vendor pinger, {key of a sequence: [VendorOffers*]}, number of offers)
+        self.vendorContributions = {}
 
     #
     #   see ManagedPinger.registerVendor
@@ -303,7 +580,7 @@ class CompositePinger(ManagedPinger):
 
         # Check Input with validator
         if(isinstance(vendorInformation, VendorInformation)):
-            Validator.validate(vendorInformation)
+            Validator.validateInternal(vendorInformation)
         else:
             raise InvalidInputError("Invalid Input: vendorInformation has not type VendorInformation")
 
@@ -341,7 +618,7 @@ class CompositePinger(ManagedPinger):
 
         # check input: seqInf
         if(isinstance(seqInf, list)):
-            Validator.validate(seqInf)
+            Validator.validateInternal(seqInf)
 
         for seq in seqInf:
             if (not isinstance(seq, SequenceInformation)):
@@ -358,31 +635,159 @@ class CompositePinger(ManagedPinger):
 
         # initialize empty sequenceOffers
         self.sequenceVendorOffers = []
+        self.sequenceIndex = {}
+        self.vendorContributions = {}
         for s in seqInf:
             self.sequenceVendorOffers.append(SequenceVendorOffers(s))
+            self.sequenceIndex[s.key] = self.sequenceVendorOffers[-1]
+
+        # Equal sequences are only sent once to the vendors
+        uniqueSeqInf = self.deduplicate(seqInf)
+
+        self.searchFutures = []
+        self.searchStatus = {}
+        for vh in self.vendorHandler:
+            if(len(vendors) == 0 or vh.vendor.key in vendors):
+                self.searchStatus[vh.vendor.key] = SearchStatus.PENDING
+                self.fanOutKeys[vh.vendor.key] = {}
+                self.offerAliases[vh.vendor.key] = {}
 
         for vh in self.vendorHandler:
             # Start searching if vendor is accepted by the filter
             if(len(vendors) == 0 or vh.vendor.key in vendors):
-                try:
-                    vh.handler.searchOffers(seqInf)
-                except InvalidInputError as e:
-                    # store Message and return when calling getOffers()
-                    vh.handler.addVendorMessage(Message(messageType = MessageType.INTERNAL_ERROR, text = str(e)))
-                except UnavailableError as e:
-                    vh.handler.addVendorMessage(Message(messageType = MessageType.API_CURRENTLY_UNAVAILABLE, text = str(e)))
-                except IsRunningError as e:
-                    vh.handler.addVendorMessage(Message(messageType = MessageType.INTERNAL_ERROR, text = str(e)))
+                # Vendors still connecting are skipped and stay pending
+                if not vh.handler.isReady():
+                    vh.handler.clear()
+                    vh.handler.addVendorMessage(Message(messageType = MessageType.VENDOR_INFO, text = "Connecting to the vendor. Offers will be searched with the next search."))
+                    continue
+                # Offers holding state for ordering them can not be copied, so these vendors get every sequence
+                vendorSeqInf = uniqueSeqInf if vh.handler.sharedOffers else seqInf
+                if self.executor is None:
+                    self.searchVendor(vh, vendorSeqInf)
+                else:
+                    self.searchFutures.append(self.executor.submit(self.searchVendorConcurrently, vh, vendorSeqInf))
 
             # Clear vendor, if not accepted by the filter
             else:
                 vh.handler.clear()
 
+    #
+    #   Desc:   Finds sequences, that are equal to a sequence before them. Sequences are compared case insensitive
+    #           and without whitespace. The result is stored in self.duplicates.
+    #
+    #   @param seqInf
+    #           Type ArrayOf(Entities.SequenceInformation).
+    #
+    #   @result
+    #           Type ArrayOf(Entities.SequenceInformation). The first sequence of every group of equal sequences.
+    #
+    def deduplicate(self, seqInf):
+        self.duplicates = {}
+        firstSequences = {}
+        uniqueSeqInf = []
+        for seq in seqInf:
+            sequence = "".join(seq.sequence.split()).upper()
+            if sequence in firstSequences:
+                self.duplicates[seq.key] = firstSequences[sequence].key
+            else:
+                firstSequences[sequence] = seq
+                uniqueSeqInf.append(seq)
+        return uniqueSeqInf
+
+    #
+    #   Desc:   Adds the offers of sequences, that were not sent to the vendor because they are equal to another
+    #           one (see deduplicate). They get copies of the offers of the other sequence, with its name replaced
+    #           in the messages (see copyOffers). The copies keep their keys as long as the offers of the vendor
+    #           do, so they can be selected and ordered. Sequences the vendor returned offers for are kept as they
+    #           are (see BasePinger.sharedOffers).
+    #
+    #   @param vendor
+    #           Type int. Key of the vendor.
+    #
+    #   @param seqOffers
+    #           Type ArrayOf(Entities.SequenceOffers). Offers of the vendor.
+    #
+    #   @result
+    #           Type ArrayOf(Entities.SequenceOffers). Offers of all sequences.
+    #
+    def fanOutOffers(self, vendor, seqOffers):
+        if not self.duplicates:
+            return seqOffers
+
+        offersPerSequence = {}
+        for seqOffer in seqOffers:
+            offersPerSequence[seqOffer.sequenceInformation.key] = seqOffer
+        fanOutKeys = self.fanOutKeys.setdefault(vendor, {})
+        offerAliases = self.offerAliases.setdefault(vendor, {})
+
+        result = list(seqOffers)
+        for svo in self.sequenceVendorOffers:
+            seq = svo.sequenceInformation
+            if seq.key in offersPerSequence or self.duplicates.get(seq.key) not in offersPerSequence:
+                continue
+            original = offersPerSequence[self.duplicates[seq.key]]
+
+            def getKey(offer, seq=seq):
+                key = fanOutKeys.get((seq.key, offer.key))
+                if key is None:
+                    key = Offer.generateId()
+                    fanOutKeys[(seq.key, offer.key)] = key
+                    offerAliases[key] = offer.key
+                return key
+
+            copies = copyOffers(original.offers, original.sequenceInformation.name, seq.name, getKey)
+            result.append(SequenceOffers(seq, copies))
+        return result
+
+    #
+    #   Desc:   Searches offers at a single vendor. Errors of the vendor pinger are stored as vendor message
+    #           and returned when calling getOffers().
+    #
+    #   @param vh
+    #           Type VendorHandler. The vendor to search at.
+    #
+    #   @param seqInf
+    #           Type ArrayOf(Entities.SequenceInformation). The sequences to search offers for.
+    #
+    def searchVendor(self, vh, seqInf):
+        self.searchStatus[vh.vendor.key] = SearchStatus.RUNNING
+        try:
+            vh.handler.searchOffers(seqInf)
+            self.searchStatus[vh.vendor.key] = SearchStatus.FINISHED
+        except InvalidInputError as e:
+            # store Message and return when calling getOffers()
+            vh.handler.addVendorMessage(Message(messageType = MessageType.INTERNAL_ERROR, text = str(e)))
+            self.searchStatus[vh.vendor.key] = SearchStatus.FAILED
+        except UnavailableError as e:
+            vh.handler.addVendorMessage(Message(messageType = MessageType.API_CURRENTLY_UNAVAILABLE, text = str(e)))
+            self.searchStatus[vh.vendor.key] = SearchStatus.FAILED
+        except IsRunningError as e:
+            vh.handler.addVendorMessage(Message(messageType = MessageType.INTERNAL_ERROR, text = str(e)))
+            self.searchStatus[vh.vendor.key] = SearchStatus.FAILED
+
+    #
+    #   Desc:   Same as searchVendor(...), but used inside of the executor. There is nobody to catch unexpected
+    #           errors, so they are stored as vendor message as well.
+    #
+    def searchVendorConcurrently(self, vh, seqInf):
+        try:
+            self.searchVendor(vh, seqInf)
+        except Exception as e:
+            print("CompositePinger.searchOffers(...): Vendor", vh.vendor.name, "raises an error calling searchOffers()")
+            print(e)
+            vh.handler.addVendorMessage(Message(messageType = MessageType.INTERNAL_ERROR, text = str(e)))
+            self.searchStatus[vh.vendor.key] = SearchStatus.FAILED
+
     #
     #   see ManagedPinger.isRunning
     #
     def isRunning(self):
 
+        # If a vendor search has not finished in the executor, then CompositePinger is running
+        for future in self.searchFutures:
+            if not future.done():
+                return True
+
         # If one or more vendors are running, then CompositePinger is running
         for vh in self.vendorHandler:
             if vh.handler.isRunning():
@@ -392,61 +797,152 @@ class CompositePinger(ManagedPinger):
         return False
 
     #
-    #   see ManagedPinger.getOffers
+    #   see ManagedPinger.waitForCompletion
     #
-    def getOffers(self):
+    def waitForCompletion(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
 
-        # Clear offers
-        for s in self.sequenceVendorOffers:
-            s.vendorOffers = []
+        # Vendor searches in the executor signal their completion through their futures
+        if self.searchFutures:
+            done, notDone = futures.wait(self.searchFutures, timeout=timeout)
+            if notDone:
+                return False
 
-        # Load offers from Vendor-Pingers
+        # Vendors may still be running after searchOffers(...) returned, so wait for them as well
         for vh in self.vendorHandler:
-            vendorMessage = []
-            seqOffers = []
+            remaining = None if deadline is None else max(0, deadline - time.monotonic())
+            if not vh.handler.waitForCompletion(remaining):
+                return False
 
-            # Check if vendor-message is available. Vendor messages can be available if a error occured calling searchOffers(...) 
-            # at the specific vendor-pinger.
-            if vh.vendor.key in self.vendorMessages.keys():
-                vendorMessage = self.vendorMessages[vh.vendor.key]
-
-            try:
-                seqOffers = vh.handler.getOffers()
-            except Exception as e:
-                # If it has a message, then a error occured at calling searchOffers()
-                if len(vendorMessage) == 0:
-                    print("CompositePinger.getOffers(...): Vendor", vh.vendor.name, "raises an error calling getOffers()")
-                    print(e)
-                    vendorMessage.append(Message(messageType = MessageType.INTERNAL_ERROR, text = "Cannot get Offers of " + vh.vendor.name + " " + str(e)))
-                seqOffers = []
-
-            # If output if the VendorPinger is invalid, then ignore and continue
-            if (not isinstance(seqOffers, list)):
-                print("CompositePinger.getOffers(...): Vendor", vh.vendor.name, "returns", type(seqOffers), "instead of list")
-                continue
+        return True
 
-            # Check the output of the vendor pinger to make sure to return valid output
-            try:
-                Validator.validate(seqOffers)
+    #
+    #   see ManagedPinger.getOffers
+    #
+    def getOffers(self):
+        # getOffers can be called from multiple requests while a search is running.
+        # Rebuilding the result must not be interleaved.
+        with self.offersLock:
+            return self.collectOffers()
 
-                for newSO in seqOffers:
+    #
+    #   Desc:   Updates self.sequenceVendorOffers with the offers of the vendor pingers. The offers of a vendor are
+    #           only merged again, if the vendor returns other offers than before (see collectVendorOffers).
+    #
+    def collectOffers(self):
+        changed = False
+        for vh in self.vendorHandler:
+            if self.collectVendorOffers(vh):
+                changed = True
 
-                    for curSO in self.sequenceVendorOffers:
-                        if newSO.sequenceInformation.key == curSO.sequenceInformation.key:
-                            curSO.vendorOffers.append(VendorOffers(vendorInformation=vh.vendor, offers=newSO.offers))
-            except InvalidInputError:
-                # If Invalid values was found ignore this vendor and coninue with the next one
-                print("CompositePinger.getOffers(...): Vendor", vh.vendor.name, "returns invalid offers")
-                continue
-            
-            # If vendor has no sequence offers and filter allows the current selected vendor
-            # then create the VendorOffer and save it
-            if(len(seqOffers) == 0 and (len(self.curVendors) == 0 or vh.vendor.key in self.curVendors)):
-                for curSO in self.sequenceVendorOffers:
-                    curSO.vendorOffers.append(VendorOffers(vh.vendor, offers=seqOffers))
+        # Vendor offers are added in the order of the registered vendors
+        if changed:
+            for svo in self.sequenceVendorOffers:
+                svo.vendorOffers = []
+            for vh in self.vendorHandler:
+                for key, vendorOffers in self.vendorContributions[vh.vendor.key][1].items():
+                    self.sequenceIndex[key].vendorOffers.extend(vendorOffers)
 
         return self.sequenceVendorOffers
 
+    #
+    #   Desc:   Sorts the offers of a vendor pinger by sequence. The result is kept in self.vendorContributions,
+    #           until the pinger returns another list of offers or a list of another length. Pingers still
+    #           running may change their offers in place, so their offers are sorted again every time.
+    #
+    #   @param vh
+    #           Type VendorHandler. The vendor.
+    #
+    #   @result
+    #           Type Boolean. True if the offers of the vendor changed.
+    #
+    def collectVendorOffers(self, vh):
+        vendorMessage = []
+        seqOffers = []
+
+        # Check if vendor-message is available. Vendor messages can be available if a error occured calling searchOffers(...)
+        # at the specific vendor-pinger.
+        if vh.vendor.key in self.vendorMessages.keys():
+            vendorMessage = self.vendorMessages[vh.vendor.key]
+
+        try:
+            seqOffers = vh.handler.getOffers()
+        except Exception as e:
+            # If it has a message, then a error occured at calling searchOffers()
+            if len(vendorMessage) == 0:
+                print("CompositePinger.getOffers(...): Vendor", vh.vendor.name, "raises an error calling getOffers()")
+                print(e)
+                vendorMessage.append(Message(messageType = MessageType.INTERNAL_ERROR, text = "Cannot get Offers of " + vh.vendor.name + " " + str(e)))
+            seqOffers = []
+
+        running = vh.handler.isRunning() or self.searchStatus.get(vh.vendor.key) == SearchStatus.RUNNING
+        contribution = self.vendorContributions.get(vh.vendor.key)
+        if (not running and contribution is not None and contribution[0] is seqOffers and
+                contribution[2] == len(seqOffers)):
+            return False
+
+        # key of a sequence -> [VendorOffers*]
+        vendorOffers = {}
+        self.vendorContributions[vh.vendor.key] = (seqOffers, vendorOffers, len(seqOffers) if isinstance(seqOffers, list) else 0)
+
+        # If output if the VendorPinger is invalid, then ignore and continue
+        if (not isinstance(seqOffers, list)):
+            print("CompositePinger.getOffers(...): Vendor", vh.vendor.name, "returns", type(seqOffers), "instead of list")
+            return True
+
+        # Check the output of the vendor pinger to make sure to return valid output
+        try:
+            Validator.validate(seqOffers)
+
+            for newSO in self.fanOutOffers(vh.vendor.key, seqOffers):
+                key = newSO.sequenceInformation.key
+                if key in self.sequenceIndex:
+                    vendorOffers.setdefault(key, []).append(VendorOffers(vendorInformation=vh.vendor, offers=newSO.offers))
+        except InvalidInputError:
+            # If Invalid values was found ignore this vendor and coninue with the next one
+            print("CompositePinger.getOffers(...): Vendor", vh.vendor.name, "returns invalid offers")
+            vendorOffers.clear()
+            return True
+
+        # If vendor has no sequence offers and filter allows the current selected vendor
+        # then create the VendorOffer and save it
+        if(len(seqOffers) == 0 and (len(self.curVendors) == 0 or vh.vendor.key in self.curVendors)):
+            for curSO in self.sequenceVendorOffers:
+                vendorOffers[curSO.sequenceInformation.key] = [VendorOffers(vh.vendor, offers=seqOffers)]
+
+        return True
+
+    #
+    #   see ManagedPinger.getSearchStatus
+    #
+    def getSearchStatus(self):
+        searchStatus = dict(self.searchStatus)
+        # Vendor pingers may still be running after their searchOffers(...) returned
+        for vh in self.vendorHandler:
+            if searchStatus.get(vh.vendor.key) == SearchStatus.FINISHED and vh.handler.isRunning():
+                searchStatus[vh.vendor.key] = SearchStatus.RUNNING
+        return searchStatus
+
+    #
+    #   see ManagedPinger.getVendorOffers
+    #
+    def getVendorOffers(self, vendor):
+        for vh in self.vendorHandler:
+            if vh.vendor.key == vendor:
+                # Vendor pingers are not expected to be called from multiple threads at once
+                with self.offersLock:
+                    try:
+                        seqOffers = vh.handler.getOffers()
+                        Validator.validate(seqOffers)
+                        seqOffers = self.fanOutOffers(vh.vendor.key, seqOffers)
+                    except Exception as e:
+                        print("CompositePinger.getVendorOffers(...): Vendor", vh.vendor.name, "returns no valid offers")
+                        print(e)
+                        return []
+                return seqOffers
+
+        raise InvalidInputError("Parameter vendor does not match any key of a registered vendor")
+
     #
     #   Desc: Returns the collected vendor messages for all registered vendors.
     #         The format is {(vendorkey: [message*])*}
@@ -478,11 +974,49 @@ class CompositePinger(ManagedPinger):
         if(not isinstance(vendor, int)):
                 raise InvalidInputError("parameter vendor should be a integer")
 
+        # Copies of offers are ordered as the offer of the vendor. Equal sequences are ordered once.
+        offerAliases = self.offerAliases.get(vendor, {})
+        vendorOfferIds = []
+        for offerId in offerIds:
+            vendorOfferId = offerAliases.get(offerId, offerId)
+            if vendorOfferId not in vendorOfferIds:
+                vendorOfferIds.append(vendorOfferId)
+
         # find VendorPinger and call order
         for vh in self.vendorHandler:
             # Start searching if vendor is accepted by the filter
             if(vh.vendor.key == vendor):
-                return vh.handler.order(offerIds)
+                return vh.handler.order(vendorOfferIds)
 
         raise InvalidInputError("Parameter vendor does not match any key of a registered vendor")
 
+    #
+    #   see ManagedPinger.registerOffers
+    #
+    def registerOffers(self, offers, offerAliases=None):
+        # Check pinger is not running
+        if(self.isRunning()):
+            raise IsRunningError("Pinger is currently running and can not perform a other action")
+
+        for vendor, aliases in (offerAliases or {}).items():
+            self.offerAliases.setdefault(vendor, {}).update(aliases)
+
+        for vh in self.vendorHandler:
+            # Copies are ordered as the offer they stand for, so the vendor only gets the original
+            aliases = self.offerAliases.get(vh.vendor.key, {})
+            seqOffers = []
+            for svo in offers:
+                for vendoff in svo.vendorOffers:
+                    if vendoff.vendorInformation.key != vh.vendor.key:
+                        continue
+                    vendorOffers = [offer for offer in vendoff.offers if offer.key not in aliases]
+                    if vendorOffers:
+                        seqOffers.append(SequenceOffers(svo.sequenceInformation, vendorOffers))
+            vh.handler.registerOffers(seqOffers)
+
+    #
+    #   see ManagedPinger.getOfferAliases
+    #
+    def getOfferAliases(self):
+        return {vendor: dict(aliases) for vendor, aliases in self.offerAliases.items() if aliases}
+
@@ -0,0 +1,175 @@
+#########################################################
+#                                                       #
+#   This file contains a scanner measuring batches of   #
+#   sequences with NumPy: GC content in sliding         #
+#   windows, at the ends of the sequences and the       #
+#   longest homopolymer runs.                           #
+#                                                       #
+#   All sequences of a batch are concatenated into one  #
+#   array, so the work is done by a few vectorized      #
+#   operations instead of loops over every base.        #
+#                                                       #
+#########################################################
+
+import numpy as np
+
+# Codes of the bases. Every other character is OTHER.
+A, C, G, T, OTHER = 0, 1, 2, 3, 4
+bases = "ACGTN"
+
+# Maps ASCII characters to the codes above
+codeTable = np.full(256, OTHER, dtype=np.uint8)
+for base, code in (("A", A), ("C", C), ("G", G), ("T", T)):
+    codeTable[ord(base)] = code
+    codeTable[ord(base.lower())] = code
+
+
+#
+#   Desc:   Removes whitespace and converts the sequence to upper case.
+#
+def normalizeSequence(sequence):
+    return "".join(sequence.split()).upper()
+
+#
+#   Desc:   Converts sequences into one array of base codes (see A, C, G, T, OTHER).
+#
+#   @param sequences
+#           Type ArrayOf(str). Normalized sequences (see normalizeSequence).
+#
+#   @result
+#           Type tuple (codes, offsets). codes is a uint8 array of all sequences one after another. The bases of
+#           sequence i are codes[offsets[i]:offsets[i + 1]].
+#
+def encodeSequences(sequences):
+    joined = "".join(sequences).encode("ascii", errors="replace")
+    codes = codeTable[np.frombuffer(joined, dtype=np.uint8)]
+    lengths = np.array([len(sequence) for sequence in sequences], dtype=np.int64)
+    offsets = np.zeros(len(sequences) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return (codes, offsets)
+
+#
+#   Desc:   Minimum and maximum of the values belonging to each group.
+#
+#   @param values
+#           Type numpy array. Values of all groups one after another.
+#
+#   @param counts
+#           Type numpy array. Number of values of each group.
+#
+#   @result
+#           Type tuple (numpy array, numpy array). Minimum and maximum per group. 0 for empty groups.
+#
+def groupRange(values, counts):
+    lowest = np.zeros(len(counts), dtype=values.dtype)
+    highest = np.zeros(len(counts), dtype=values.dtype)
+    filled = counts > 0
+    if np.any(filled):
+        starts = (np.cumsum(counts) - counts)[filled]
+        lowest[filled] = np.minimum.reduceat(values, starts)
+        highest[filled] = np.maximum.reduceat(values, starts)
+    return (lowest, highest)
+
+
+#
+#   Desc:   Measurements of a batch of sequences. Every attribute is an array with one entry per sequence.
+#           GC contents are percentages between 0 and 100. Sequences shorter than a window are measured as a whole.
+#
+#   @attribute lengths
+#           Type numpy array of int. Number of bases.
+#
+#   @attribute gc
+#           Type numpy array of float. GC content of the whole sequence.
+#
+#   @attribute windowGc
+#           Type dict {window: (lowest, highest)}. Lowest and highest GC content of all windows of this length in bp.
+#
+#   @attribute startGc, endGc
+#           Type numpy array of float. GC content of the first and the last terminalWindow bases.
+#
+#   @attribute homopolymers
+#           Type numpy array of int. Length of the longest run of the same base.
+#
+#   @attribute homopolymerBases
+#           Type ArrayOf(str). Base of the longest run (the last one in ACGTN, if there are multiple). "" for empty
+#           sequences.
+#
+class SequenceScan:
+
+    def __init__(self, lengths, gc, windowGc, startGc, endGc, homopolymers, homopolymerBases):
+        self.lengths = lengths
+        self.gc = gc
+        self.windowGc = windowGc
+        self.startGc = startGc
+        self.endGc = endGc
+        self.homopolymers = homopolymers
+        self.homopolymerBases = homopolymerBases
+
+
+#
+#   Desc:   Measures a batch of sequences.
+#
+#   @param sequences
+#           Type ArrayOf(str). The sequences. They are normalized (see normalizeSequence).
+#
+#   @param windows
+#           Type ArrayOf(int). Lengths in bp of the sliding windows to measure the GC content in.
+#
+#   @param terminalWindow
+#           Type int. Number of bases at each end to measure the GC content of.
+#
+#   @result
+#           Type SequenceScan.
+#
+def scanSequences(sequences, windows=(20, 50, 100), terminalWindow=20):
+    codes, offsets = encodeSequences([normalizeSequence(sequence) for sequence in sequences])
+    starts = offsets[:-1]
+    ends = offsets[1:]
+    lengths = ends - starts
+    # Avoids divisions by zero, empty sequences are 0 anyway
+    divisors = np.maximum(lengths, 1)
+
+    # gcCount[i] is the number of G and C in codes[:i]
+    gcCount = np.zeros(len(codes) + 1, dtype=np.int64)
+    np.cumsum((codes == C) | (codes == G), out=gcCount[1:])
+
+    gc = 100.0 * (gcCount[ends] - gcCount[starts]) / divisors
+
+    windowGc = {}
+    for window in windows:
+        # Sequences shorter than the window are one window
+        lowest = gc.copy()
+        highest = gc.copy()
+        long = np.flatnonzero(lengths > window)
+        if len(codes) > window and len(long) > 0:
+            # Number of G and C in every window of the concatenated sequences, plus one element so the last
+            # window of the last sequence can be used as boundary below
+            counts = np.empty(len(codes) - window + 2, dtype=np.int64)
+            np.subtract(gcCount[window:], gcCount[:-window], out=counts[:-1])
+            counts[-1] = 0
+            # Windows of sequence i start at starts[i] up to ends[i] - window. Reducing the boundaries one after
+            # another yields every sequence at even positions and the windows between sequences at odd ones.
+            boundaries = np.empty(2 * len(long), dtype=np.int64)
+            boundaries[0::2] = starts[long]
+            boundaries[1::2] = ends[long] - window + 1
+            lowest[long] = 100.0 * np.minimum.reduceat(counts, boundaries)[0::2] / window
+            highest[long] = 100.0 * np.maximum.reduceat(counts, boundaries)[0::2] / window
+        windowGc[window] = (lowest, highest)
+
+    widths = np.minimum(terminalWindow, lengths)
+    startGc = 100.0 * (gcCount[starts + widths] - gcCount[starts]) / np.maximum(widths, 1)
+    endGc = 100.0 * (gcCount[ends] - gcCount[ends - widths]) / np.maximum(widths, 1)
+
+    # Runs start where the base changes or a sequence starts
+    runStarts = np.ones(len(codes), dtype=bool)
+    runStarts[1:] = codes[1:] != codes[:-1]
+    runStarts[starts[lengths > 0]] = True
+    runStarts = np.flatnonzero(runStarts)
+    runLengths = np.diff(np.append(runStarts, len(codes)))
+    runCounts = np.diff(np.searchsorted(runStarts, offsets))
+    # The maximum of length and base in one value is the longest run and its base
+    runs = groupRange(runLengths * 8 + codes[runStarts], runCounts)[1]
+    homopolymers = runs // 8
+    homopolymerBases = [bases[base] if length > 0 else "" for length, base in zip(homopolymers, runs % 8)]
+
+    return SequenceScan(lengths, gc, windowGc, startGc, endGc, homopolymers, homopolymerBases)
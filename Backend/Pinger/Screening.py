@@ -0,0 +1,334 @@
+#########################################################
+#                                                       #
+#   This file contains a local pre-screening of         #
+#   sequences. Sequences, that a vendor is sure to      #
+#   reject (e.g. too long, extreme GC content, long     #
+#   homopolymers or repeats), get offers with the       #
+#   reasons without contacting the vendor.              #
+#   Similar sequences of a search only get a warning,   #
+#   unless the vendor rejects them.                     #
+#                                                       #
+#########################################################
+
+import copy
+
+from .Entities import *
+from .Pinger import BasePinger
+from .KmerIndex import KmerIndex
+from .Scanner import normalizeSequence, scanSequences
+
+
+#
+#   Desc:   Rules of a vendor, that sequences must meet to be produced. Rules set to None are not checked.
+#           The limits should be the ones the vendor is sure to reject, because sequences failing them are
+#           never sent to the vendor.
+#
+#   @attribute minLength, maxLength
+#           Type int. Allowed length of a sequence in bp.
+#
+#   @attribute minGc, maxGc
+#           Type float. Allowed GC content of the whole sequence in percent.
+#
+#   @attribute gcWindow
+#           Type int or ArrayOf(int). Lengths of the windows in bp, whose GC content must be between minWindowGc and
+#           maxWindowGc.
+#
+#   @attribute minWindowGc, maxWindowGc
+#           Type float. Allowed GC content of every window in percent.
+#
+#   @attribute terminalWindow
+#           Type int. Number of bases at each end, whose GC content must be between minTerminalGc and maxTerminalGc.
+#
+#   @attribute minTerminalGc, maxTerminalGc
+#           Type float. Allowed GC content at both ends in percent.
+#
+#   @attribute maxHomopolymer
+#           Type int. Maximum length of a run of the same base.
+#
+#   @attribute repeatLength
+#           Type int. Segments of this length must not appear twice in a sequence.
+#
+#   @attribute homologyLength
+#           Type int. Length of the segments sequences of the same search are compared by.
+#
+#   @attribute maxSimilarity
+#           Type float. Maximum share of the segments of a sequence, that may be found in another sequence of the
+#           same search (between 0 and 1).
+#
+#   @attribute rejectHomologs
+#           Type bool. If True, similar sequences are rejected. Otherwise they are still sent to the vendor and
+#           their offers get a warning, because most vendors produce them anyway.
+#
+class ScreeningProfile:
+
+    def __init__(self, minLength=None, maxLength=None, minGc=None, maxGc=None, gcWindow=None, minWindowGc=None,
+                 maxWindowGc=None, terminalWindow=None, minTerminalGc=None, maxTerminalGc=None, maxHomopolymer=None,
+                 repeatLength=None, homologyLength=None, maxSimilarity=None, rejectHomologs=False):
+        self.minLength = minLength
+        self.maxLength = maxLength
+        self.minGc = minGc
+        self.maxGc = maxGc
+        self.gcWindow = gcWindow
+        self.minWindowGc = minWindowGc
+        self.maxWindowGc = maxWindowGc
+        self.terminalWindow = terminalWindow
+        self.minTerminalGc = minTerminalGc
+        self.maxTerminalGc = maxTerminalGc
+        self.maxHomopolymer = maxHomopolymer
+        self.repeatLength = repeatLength
+        self.homologyLength = homologyLength
+        self.maxSimilarity = maxSimilarity
+        self.rejectHomologs = rejectHomologs
+
+    #
+    #   Desc:   Checks if a message of screen(...) rejects the sequence. Otherwise it is a warning.
+    #
+    def isRejection(self, message):
+        return message.messageType != MessageType.HOMOLOGY or self.rejectHomologs
+
+    #
+    #   Desc:   Lengths of the windows to measure the GC content in.
+    #
+    def getWindows(self):
+        if self.gcWindow is None:
+            return []
+        if isinstance(self.gcWindow, int):
+            return [self.gcWindow]
+        return list(self.gcWindow)
+
+    #
+    #   Desc:   Checks sequences against the rules. All sequences are measured at once (see Scanner.scanSequences)
+    #           and their segments are indexed once (see KmerIndex).
+    #
+    #   @param seqInf
+    #           Type ArrayOf(Entities.SequenceInformation).
+    #
+    #   @result
+    #           Type ArrayOf(ArrayOf(Entities.Message)). For every sequence a message for every broken rule.
+    #           Empty if the sequence passes. Messages about similar sequences may be warnings (see isRejection).
+    #
+    def screen(self, seqInf):
+        sequences = [normalizeSequence(seq.sequence) for seq in seqInf]
+        windows = self.getWindows()
+        terminalWindow = self.terminalWindow if self.terminalWindow is not None else 20
+        scan = scanSequences(sequences, windows=windows, terminalWindow=terminalWindow)
+        repeatIndex = None
+        if self.repeatLength is not None:
+            repeatIndex = KmerIndex(sequences, self.repeatLength)
+        homologs = self.findHomologs(seqInf, sequences, repeatIndex)
+
+        result = []
+        for index in range(len(sequences)):
+            messages = []
+            length = int(scan.lengths[index])
+            if self.minLength is not None and length < self.minLength:
+                messages.append(Message(MessageType.SEQUENCE_TOO_SHORT, "Sequence has " + str(length) +
+                                        " bp, but at least " + str(self.minLength) + " bp are required."))
+            if self.maxLength is not None and length > self.maxLength:
+                messages.append(Message(MessageType.SEQUENCE_TOO_LONG, "Sequence has " + str(length) +
+                                        " bp, but at most " + str(self.maxLength) + " bp are allowed."))
+
+            self.checkGc(messages, "GC content", scan.gc[index], self.minGc, self.maxGc)
+            for window in windows:
+                lowest, highest = scan.windowGc[window]
+                self.checkGc(messages, "GC content in a window of " + str(window) + " bp", lowest[index],
+                             self.minWindowGc, None)
+                self.checkGc(messages, "GC content in a window of " + str(window) + " bp", highest[index],
+                             None, self.maxWindowGc)
+            if self.terminalWindow is not None:
+                for end, content in (("first", scan.startGc[index]), ("last", scan.endGc[index])):
+                    self.checkGc(messages, "GC content of the " + end + " " + str(self.terminalWindow) + " bp",
+                                 content, self.minTerminalGc, self.maxTerminalGc)
+
+            if self.maxHomopolymer is not None and scan.homopolymers[index] > self.maxHomopolymer:
+                messages.append(Message(MessageType.TOO_MANY_REPEATS, "Sequence contains a run of " +
+                                        str(scan.homopolymers[index]) + " " + scan.homopolymerBases[index] +
+                                        ", but at most " + str(self.maxHomopolymer) + " are allowed."))
+
+            if repeatIndex is not None and repeatIndex.repeats[index] > 0:
+                messages.append(Message(MessageType.TOO_MANY_REPEATS, "Sequence contains " +
+                                        str(repeatIndex.repeats[index]) + " segments of " + str(self.repeatLength) +
+                                        " bp more than once, e.g. " + repeatIndex.getRepeat(index) + "."))
+
+            messages.extend(homologs[index])
+            result.append(messages)
+        return result
+
+    #
+    #   Desc:   Compares the sequences of a search with each other.
+    #
+    #   @param seqInf
+    #           Type ArrayOf(Entities.SequenceInformation).
+    #
+    #   @param sequences
+    #           Type ArrayOf(str). The normalized sequences.
+    #
+    #   @param index
+    #           Type KmerIndex. Index of the repeats. Used if its segments have the length homologyLength.
+    #
+    #   @result
+    #           Type ArrayOf(ArrayOf(Entities.Message)). For every sequence a HOMOLOGY message for every similar one.
+    #
+    def findHomologs(self, seqInf, sequences, index):
+        homologs = [[] for _ in sequences]
+        if self.homologyLength is None or self.maxSimilarity is None:
+            return homologs
+        if index is None or index.k != self.homologyLength:
+            index = KmerIndex(sequences, self.homologyLength)
+
+        prefix = "" if self.rejectHomologs else "Warning: "
+        for first, second, similarity in index.getSimilarPairs(self.maxSimilarity):
+            if similarity == self.maxSimilarity:
+                continue
+            for sequence, other in ((first, second), (second, first)):
+                homologs[sequence].append(Message(MessageType.HOMOLOGY, prefix + "Sequence is similar to sequence " +
+                                                  seqInf[other].name + ". " + str(round(100 * similarity)) +
+                                                  " % of the segments of " + str(self.homologyLength) +
+                                                  " bp of the shorter one are found in the other one."))
+        return homologs
+
+    #
+    #   Desc:   Adds a GC_PROBLEM message, if the GC content is out of the limits.
+    #
+    def checkGc(self, messages, description, content, minGc, maxGc):
+        if minGc is not None and content < minGc:
+            messages.append(Message(MessageType.GC_PROBLEM, description + " is " + str(round(float(content), 1)) +
+                                    " %, but at least " + str(minGc) + " % are required."))
+        if maxGc is not None and content > maxGc:
+            messages.append(Message(MessageType.GC_PROBLEM, description + " is " + str(round(float(content), 1)) +
+                                    " %, but at most " + str(maxGc) + " % are allowed."))
+
+
+#
+#   Desc:   Adds messages to an offer. The offer of the vendor is copied and keeps its key, so it can still be ordered.
+#
+def addMessages(offer, messages):
+    if not messages:
+        return offer
+    offer = copy.copy(offer)
+    offer.messages = list(offer.messages) + list(messages)
+    return offer
+
+
+#
+#   Desc:   Vendor pinger wrapping another vendor pinger. Sequences are screened with the profile of the vendor
+#           first. Sequences breaking a rule get an offer without price, that contains the reasons. Only the
+#           other sequences are searched by the wrapped pinger. Warnings of the screening are added to their offers.
+#
+#           Offers of screened sequences are unknown to the wrapped pinger and can not be ordered.
+#
+#   @attribute pinger
+#           Type BasePinger. The wrapped vendor pinger.
+#
+#   @attribute profile
+#           Type ScreeningProfile. Rules of the vendor.
+#
+class ScreeningPinger(BasePinger):
+
+    def __init__(self, pinger, profile):
+        self.pinger = pinger
+        self.profile = profile
+        self.running = False
+        self.offers = []
+
+    #
+    #   see BasePinger.searchOffers
+    #
+    def searchOffers(self, seqInf):
+        # Check pinger is not running
+        if(self.isRunning()):
+            raise IsRunningError("Pinger is currently running and can not perform a other action")
+
+        self.running = True
+        try:
+            rejectedOffers = {}
+            warnings = {}
+            acceptedSequences = []
+            for seq, messages in zip(seqInf, self.profile.screen(seqInf)):
+                if any(self.profile.isRejection(message) for message in messages):
+                    rejectedOffers[seq.key] = [Offer(messages=messages)]
+                else:
+                    acceptedSequences.append(seq)
+                    if messages:
+                        warnings[seq.key] = messages
+
+            # Only sequences passing the screening are sent to the vendor
+            foundOffers = {}
+            if acceptedSequences:
+                self.pinger.searchOffers(acceptedSequences)
+                self.pinger.waitForCompletion()
+                for seqOffers in self.pinger.getOffers():
+                    key = seqOffers.sequenceInformation.key
+                    foundOffers.setdefault(key, []).extend(addMessages(offer, warnings.get(key, []))
+                                                           for offer in seqOffers.offers)
+            else:
+                self.pinger.clear()
+
+            offers = []
+            for seq in seqInf:
+                if seq.key in rejectedOffers:
+                    offers.append(SequenceOffers(seq, rejectedOffers[seq.key]))
+                else:
+                    offers.append(SequenceOffers(seq, foundOffers.get(seq.key, [])))
+            self.offers = offers
+        finally:
+            self.running = False
+
+    #
+    #   see BasePinger.isRunning
+    #
+    def isRunning(self):
+        return self.running or self.pinger.isRunning()
+
+    #
+    #   see BasePinger.isReady
+    #
+    def isReady(self):
+        return self.pinger.isReady()
+
+    #
+    #   see BasePinger.getOffers
+    #
+    def getOffers(self):
+        return self.offers
+
+    #
+    #   see BasePinger.clear
+    #
+    def clear(self):
+        self.pinger.clear()
+        self.offers = []
+        self.running = False
+
+    #
+    #   see BasePinger.getVendorMessages
+    #
+    def getVendorMessages(self):
+        return self.pinger.getVendorMessages()
+
+    #
+    #   see BasePinger.addVendorMessage
+    #
+    def addVendorMessage(self, message):
+        self.pinger.addVendorMessage(message)
+
+    #
+    #   see BasePinger.order
+    #
+    def order(self, offerIds):
+        return self.pinger.order(offerIds)
+
+    #
+    #   see BasePinger.registerOffers
+    #
+    def registerOffers(self, offers):
+        self.offers = offers
+        self.pinger.registerOffers(offers)
+
+    #
+    #   see BasePinger.sharedOffers
+    #
+    @property
+    def sharedOffers(self):
+        return self.pinger.sharedOffers
+
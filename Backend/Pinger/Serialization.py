@@ -0,0 +1,121 @@
+#########################################################
+#                                                       #
+#   This file contains functions to convert Entities    #
+#   of the Pinger-package into compact JSON compatible  #
+#   values and back.                                    #
+#                                                       #
+#   Used to store entities outside of the process,      #
+#   e.g. in a shared session store.                     #
+#                                                       #
+#########################################################
+
+import json
+
+from .Entities import *
+
+
+#
+#   Desc:   Converts a message into the form [messageType, text]
+#           Restored messages are shared (see Entities.Message.intern).
+#
+def messageToList(message):
+    return [message.messageType.value, message.text]
+
+def messageFromList(value):
+    return Message.intern(MessageType(value[0]), value[1])
+
+#
+#   Desc:   Converts a sequence into the form [key, name, sequence]
+#
+def sequenceToList(seqInf):
+    return [seqInf.key, seqInf.name, seqInf.sequence]
+
+def sequenceFromList(value):
+    return SequenceInformation(value[2], value[1], value[0])
+
+#
+#   Desc:   Converts a vendor into the form [key, name, shortName]
+#
+def vendorToList(vendor):
+    return [vendor.key, vendor.name, vendor.shortName]
+
+def vendorFromList(value):
+    return VendorInformation(value[1], value[2], value[0])
+
+#
+#   Desc:   Converts an offer into the form
+#           [key, amount, currency, customerSpecific, turnovertime, [message*], {attribute: value}]
+#           The key is kept, so selections of offers stay valid. Additional attributes (e.g. isHq of GeneArt)
+#           are kept as well (see Entities.Offer.withAttributes).
+#
+def offerToList(offer):
+    attributes = offer.getAttributes()
+    return [offer.key, offer.price.amount, offer.price.currency.name, offer.price.customerSpecific, offer.turnovertime,
+            [messageToList(message) for message in offer.messages], attributes]
+
+def offerFromList(value):
+    key, amount, currency, customerSpecific, turnovertime, messages, attributes = value
+    offerType = Offer.withAttributes(attributes.keys())
+    offer = offerType(price=Price(amount=amount, currency=Currency[currency], customerSpecific=customerSpecific),
+                      turnovertime=turnovertime,
+                      messages=[messageFromList(message) for message in messages])
+    offer.key = key
+    for name, attribute in attributes.items():
+        setattr(offer, name, attribute)
+    return offer
+
+#
+#   Desc:   Converts a list of SequenceVendorOffers into the form
+#           [[sequence, [[vendor, [offer*]]*]]*]
+#
+def sequenceVendorOffersToList(seqvendoffers):
+    result = []
+    for seqvendoff in seqvendoffers:
+        vendorOffers = []
+        for vendoff in seqvendoff.vendorOffers:
+            vendorOffers.append([vendorToList(vendoff.vendorInformation),
+                                 [offerToList(offer) for offer in vendoff.offers]])
+        result.append([sequenceToList(seqvendoff.sequenceInformation), vendorOffers])
+    return result
+
+def sequenceVendorOffersFromList(value):
+    # Vendors are shared by all sequences
+    vendors = {}
+    result = []
+    for sequence, vendorOffers in value:
+        seqvendoff = SequenceVendorOffers(sequenceFromList(sequence), [])
+        for vendor, offers in vendorOffers:
+            vendorKey = tuple(vendor)
+            if vendorKey not in vendors:
+                vendors[vendorKey] = vendorFromList(vendor)
+            seqvendoff.vendorOffers.append(VendorOffers(vendors[vendorKey], [offerFromList(offer) for offer in offers]))
+        result.append(seqvendoff)
+    return result
+
+#
+#   Desc:   Converts a list of messages, that may contain plain strings as well (see global messages).
+#
+def messagesToList(messages):
+    return [message if isinstance(message, str) else messageToList(message) for message in messages]
+
+def messagesFromList(value):
+    return [message if isinstance(message, str) else messageFromList(message) for message in value]
+
+#
+#   Desc:   Converts vendor messages of the form {vendorkey: [message*]}.
+#           JSON only knows string keys, so the vendor keys are converted back to int.
+#
+def vendorMessagesToDict(vendorMessages):
+    return {str(key): messagesToList(messages) for key, messages in vendorMessages.items()}
+
+def vendorMessagesFromDict(value):
+    return {int(key): messagesFromList(messages) for key, messages in value.items()}
+
+#
+#   Desc:   Converts a JSON compatible value into a compact JSON string.
+#
+def dumps(value):
+    return json.dumps(value, separators=(",", ":"))
+
+def loads(value):
+    return json.loads(value)
@@ -1,26 +1,78 @@
 import json
+import random
 import re
-from datetime import datetime
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 import requests
+import threading
 import time
 import uuid
 from .Pinger import *
 from .Validator import *
+from .ClientPool import createHttpSession
 
     # Class to represent a TwistException.
+    # retry_after is the delay in seconds requested by the server (Retry-After header) or None.
 class TwistError(Exception):
 
-    def __init__(self, message, status_code):
+    def __init__(self, message, status_code, retry_after = None):
         self.message = message
         self.status_code = status_code
+        self.retry_after = retry_after
         Exception.__init__(self, '{}: {}'.format(message, status_code))
+
+    # Class to define how often the Twist API is asked for results that take some time (scores, quotes).
+    # The first poll is done after initial_interval seconds. The interval grows by multiplier up to max_interval.
+    # Every interval is changed randomly by up to jitter (fraction of the interval), so concurrent searches
+    # do not poll at the same time. Delays requested by the server (Retry-After header) are used instead.
+    # Polling is stopped after deadline seconds.
+class PollingStrategy():
+
+    def __init__(self, initial_interval = 0.5, max_interval = 30, multiplier = 2, jitter = 0.2, deadline = 600):
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.deadline = deadline
+
+        # Poll until done. request is called without parameters and returns a tuple (done, result, retry_after).
+        # Returns the result of the first request that is done. Throws a TwistError if the deadline is exceeded.
+    def poll(self, request):
+        deadline = time.monotonic() + self.deadline
+        interval = self.initial_interval
+        while True:
+            done, result, retry_after = request()
+            if done:
+                return result
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TwistError('No result within {} seconds'.format(self.deadline), None)
+            if retry_after is not None:
+                delay = retry_after
+            else:
+                delay = interval * (1 + random.uniform(-self.jitter, self.jitter))
+                interval = min(interval * self.multiplier, self.max_interval)
+            self.sleep(min(delay, remaining))
+
+        # Waits between two polls.
+    def sleep(self, seconds):
+        time.sleep(seconds)
         
     # Class to define client for the Twist API.
     # This implementation is based on version 1.0.10846 of the TWIST-API.
     # All documentation for the API can be found here: https://twist-api.twistbioscience-staging.com/login?next=/swagger/
 class TwistClient():
 
-    def __init__(self, email, password, apitoken, eutoken, username, firstname, lastname, host = 'https://twist-api.twistbioscience-staging.com/', timeout = 60):
+    # poolSize is the number of connections kept alive for concurrent requests
+    # polling is the PollingStrategy used to wait for scores and quotes
+    # profile_max_age is the number of seconds the shipping address and payment methods are kept
+    def __init__(self, email, password, apitoken, eutoken, username, firstname, lastname, host = 'https://twist-api.twistbioscience-staging.com/', timeout = 60, poolSize = 10, polling = None, profile_max_age = 3600):
+        self.polling = polling if polling is not None else PollingStrategy()
+        self.profile_max_age = profile_max_age
+        self.__profile = None
+        self.__profile_loaded = 0
+        self.__profile_lock = threading.Lock()
         self.__email = email
         self.__password = password
         self.__apitoken = apitoken
@@ -30,33 +82,66 @@ class TwistClient():
         self.__lastname = lastname
         self.__host = host
         self.__timeout = timeout
-        self.__session = requests.Session()
+        self.__session = createHttpSession(poolSize)
         self.__session.headers.update(
             {'Authorization': 'JWT ' + ''.join(self.__apitoken.split()),
              'X-End-User-Token': ''.join(self.__eutoken.split()),
              'Accept-Encoding': 'json'})
-        addresses = self.get_addresses()
         self.address = "No_Address"
-        for add in addresses:
-            if(add['first_name'] == self.__firstname and add['last_name'] == self.__lastname):
-                self.address = add['id']
-        if(self.address == "No_Address"):
-            raise AuthenticationError("The given first name and last name do not have a shipping address for this account.")
+        self.get_profile()
+
+        # Get the account profile of the form {'address': id of the shipping address, 'payments': [payment*]}.
+        # The profile is loaded again after profile_max_age seconds or if refresh is True.
+    def get_profile(self, refresh = False):
+        with self.__profile_lock:
+            if refresh or self.__profile is None or time.monotonic() - self.__profile_loaded >= self.profile_max_age:
+                address = "No_Address"
+                for add in self.get_addresses():
+                    if(add['first_name'] == self.__firstname and add['last_name'] == self.__lastname):
+                        address = add['id']
+                if(address == "No_Address"):
+                    raise AuthenticationError("The given first name and last name do not have a shipping address for this account.")
+                self.__profile = {'address': address, 'payments': self.get_payments()}
+                self.__profile_loaded = time.monotonic()
+                self.address = address
+            return self.__profile
 
             # Check response. Throws a TwistError if the response's status code is not the expected one.
     def check_response(self, resp, target):
         if not resp.status_code == target:
-            raise TwistError(resp.content, resp.status_code)
+            raise TwistError(resp.content, resp.status_code, self.get_retry_after(resp))
 
         return resp.json()
 
+        # Returns the delay in seconds requested by the server (Retry-After header) or None.
+        # The header contains either seconds or a date.
+    def get_retry_after(self, resp):
+        value = resp.headers.get('Retry-After')
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            date = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if date.tzinfo is None:
+            date = date.replace(tzinfo=timezone.utc)
+        return max(0.0, (date - datetime.now(timezone.utc)).total_seconds())
+
         # GET method.
     def get(self, url, params=None, timeout = 60):
+        return self.get_polled(url, params)[0]
+
+        # GET method used while polling. Returns a tuple (response, delay requested by the server or None).
+    def get_polled(self, url, params=None):
         if not params:
             params = {}
 
         resp = self.__session.get(self.__host + url, params=params, timeout = self.__timeout)
-        return self.check_response(resp, 200)
+        return self.check_response(resp, 200), self.get_retry_after(resp)
     
         # POST method.
     def post(self, url, json, target=200, timeout = 60):
@@ -126,27 +211,24 @@ class TwistClient():
 
         # Get scores.
     def get_scores(self, ids, max_errors=100):
-        resp = None
+        url = self.get_email_url('v1/users/{}/constructs/describe/')
         errors = 0
 
-        while True:
-            url = self.get_email_url('v1/users/{}/constructs/describe/')
-
+        def request():
+            nonlocal errors
             try:
-                resp = self.get(url, {'scored': 'True',
-                                        'id__in': ','.join(ids)})
-
-                if {datum['id'] for datum in resp} == set(ids):
-                    break
+                resp, retry_after = self.get_polled(url, {'scored': 'True',
+                                                          'id__in': ','.join(ids)})
             except TwistError as exc:
                 errors += 1
 
                 if errors == max_errors:
                     raise exc
+                return False, None, exc.retry_after
 
-            time.sleep(1)
+            return {datum['id'] for datum in resp} == set(ids), resp, retry_after
 
-        return resp
+        return self.polling.poll(request)
     
         # Get quote.
     def get_quote(self, construct_ids, external_id, address_id,
@@ -176,16 +258,13 @@ class TwistClient():
     
         # Check quote. Throws ValueError if the quote couldn't be checked by the server.
     def check_quote(self, quote_id):
-        resp = None
-
-        while True:
-            url = self.get_email_url('v1/users/{}/quotes/%s/') % quote_id
-            resp = self.get(url)
+        url = self.get_email_url('v1/users/{}/quotes/%s/') % quote_id
 
-            if resp['status_info']['status'] != 'PENDING':
-                break
+        def request():
+            resp, retry_after = self.get_polled(url)
+            return resp['status_info']['status'] != 'PENDING', resp, retry_after
 
-            time.sleep(50)
+        resp = self.polling.poll(request)
 
         if resp['status_info']['status'] == 'SUCCESS':
             return resp
@@ -204,11 +283,73 @@ class TwistClient():
         return resp
 
 
+    # Class to delete quotes in the background, so nobody waits for the deletion.
+    # Quotes are deleted when they are due. Quotes used for an order are cancelled before.
+class QuoteCleanup():
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        # quote id -> (due time, client)
+        self.pending = {}
+        self.thread = None
+
+        # Deletes a quote with the given client after delay seconds.
+    def schedule(self, client, quote_id, delay = 0):
+        with self.condition:
+            self.pending[quote_id] = (time.monotonic() + delay, client)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+        # Keeps a quote. Returns True if the quote was not deleted yet.
+    def cancel(self, quote_id):
+        with self.condition:
+            return self.pending.pop(quote_id, None) is not None
+
+        # Deletes quotes when they are due. Runs inside of the background thread.
+    def run(self):
+        while True:
+            with self.condition:
+                now = time.monotonic()
+                due = [quote_id for quote_id, (when, client) in self.pending.items() if when <= now]
+                if not due:
+                    timeout = min([when for when, client in self.pending.values()], default = now + 60) - now
+                    self.condition.wait(timeout)
+                    continue
+                quotes = [(quote_id, self.pending.pop(quote_id)[1]) for quote_id in due]
+            for quote_id, client in quotes:
+                try:
+                    client.delete_quote(quote_id)
+                except Exception as err:
+                    print("QuoteCleanup: Quote", quote_id, "could not be deleted")
+                    print(err)
+
+# Deletes the quotes of all Twist pingers
+quote_cleanup = QuoteCleanup()
+
+# Offers of Twist. constructId is the id of the construct at Twist, used for ordering.
+TwistOffer = Offer.withAttributes(["constructId"])
+
+
     # Class to define pinger for the Twist API.
 class Twist(BasePinger):
     currencies = {"EUR":Currency.EUR, "USD":Currency.USD}
-    def __init__(self, email, password, apitoken, eutoken, username, firstname, lastname, host = 'https://twist-api.twistbioscience-staging.com/', timeout = 60):
+    # Offers are ordered by the constructs and the quote of the search, so they can not be copied to other sequences
+    sharedOffers = False
+    # If a client is given, it is used instead of creating and authenticating a new one (see ClientPool).
+    # Constructs are submitted in requests of at most batchSize sequences (one plate by default).
+    # Up to parallelism requests are sent at the same time.
+    # The quote of a search is kept for quoteMaxAge seconds and used for ordering the same constructs.
+    def __init__(self, email, password, apitoken, eutoken, username, firstname, lastname, host = 'https://twist-api.twistbioscience-staging.com/', timeout = 60, client = None, batchSize = 96, parallelism = 4, quoteMaxAge = 1800):
         self.running = False        
+        self.batchSize = batchSize
+        self.parallelism = parallelism
+        self.quoteMaxAge = quoteMaxAge
+        # Quote of the last search: (construct ids, quote id, quote, expiration time) or None
+        self.quote = None
+        # Offers of the last search and their index (see get_construct_index)
+        self.construct_index = None
     
         self.__email = email
         self.__password = password
@@ -220,17 +361,18 @@ class Twist(BasePinger):
         self.__firstname = firstname
         self.__lastname = lastname
         self.__timeout = timeout
-        try:
-            self.client = TwistClient(self.__email, 
-                      self.__password, self.__apitoken, self.__eutoken,
-                      self.__username, self.__firstname, self.__lastname,
-                      self.__host, self.__timeout)
-        except requests.exceptions.RequestException as err:
-            raise UnavailableError("Request got Timeout") from err
-        except TwistError as exc:
-            raise UnavailableError("Request got an error: " + str(exc.message) + "and status code = " + str(exc.status_code)) from exc
+        self.client = client
+        if self.client is None:
+            try:
+                self.client = TwistClient(self.__email, 
+                          self.__password, self.__apitoken, self.__eutoken,
+                          self.__username, self.__firstname, self.__lastname,
+                          self.__host, self.__timeout)
+            except requests.exceptions.RequestException as err:
+                raise UnavailableError("Request got Timeout") from err
+            except TwistError as exc:
+                raise UnavailableError("Request got an error: " + str(exc.message) + "and status code = " + str(exc.status_code)) from exc
 
-        self.__address = self.client.address
         self.vendorMessage = []
         self.offers = []
         self.validator = EntityValidator(raiseError=True)
@@ -241,7 +383,7 @@ class Twist(BasePinger):
     #
     def encode_sequence(self, seqInf):
         if isinstance(seqInf, SequenceInformation):
-            if self.validator.validate(seqInf):
+            if self.validator.validateInternal(seqInf):
                 return { "idN": seqInf.key, "name": seqInf.name, "sequence": seqInf.sequence}
         else:
             type_name = seqInf.__class__.__name__
@@ -318,6 +460,18 @@ class Twist(BasePinger):
 
         return response
 
+        # Get the account profile.
+    def get_profile(self, refresh = False):
+        try:
+            response = self.client.get_profile(refresh)
+        except requests.exceptions.RequestException as err:
+            raise UnavailableError("Request got Timeout") from err
+
+        except TwistError as exc:
+            raise UnavailableError("Request got an error: " + str(exc.message) + "and status code = " + str(exc.status_code)) from exc
+
+        return response
+
         # Get addresses.
     def get_addresses(self):
         try:
@@ -490,59 +644,28 @@ class Twist(BasePinger):
             raise IsRunningError("Pinger is currently running and can not perform a other action")
         try:
             self.running = True
-            offers = [] # Empty Offers List
-            twistSequences  = []
-            constrcutIds = []
             self.vendorMessage = []
 
-            for s in seqInf:
-                # Encode each element in JSON-Format with fields readable by the TWISTClient and add it to the list.
-                self.validator.validate(s)
-                seq = self.encode_sequence(s)
-                twistSequences.append(seq)
-
-            constructs = self.submit_constructs(twistSequences)
-
-            ids = [i['id'] for i in constructs]
-            scores = self.get_scores(ids)
-            counter = 0
+            # Large uploads are submitted in several requests. A failed request only fails its own sequences.
+            chunkResults = searchInChunks(seqInf, self.searchChunk, self.batchSize, self.parallelism)
             idsforquoting = []
-            for identifier in ids:
-                for constructscore in scores:
-                    if(constructscore['id'] == identifier):
-                        issues = constructscore["score_data"]["issues"]
-                        # If the construct can be produced
-                        if (constructscore["score"] == "BUILDABLE" and len(issues) == 0):
-                            messageText = constructscore["name"] + "_" + "accepted" + "->ConstructID =" + str(identifier)
-                            message = Message(MessageType.INFO, messageText)
-                            idsforquoting.append(identifier)
-
-                        # If the construct can not be produced
-                        if (constructscore["score"] != "BUILDABLE" and len(issues) != 0):
-                            messageText = constructscore["name"] + "_" + "rejected_"
-                            for issue in issues:
-                                 messageText = messageText + issue['title'] + "."
-                            message = Message(MessageType.SYNTHESIS_ERROR, messageText)
-                        turnOverTime = -1
-                        price = Price()
-                        self.validator.validate(message)
-                        currentOffer = Offer(price = price, turnovertime = turnOverTime, messages = [message])
-                        seqOffer = SequenceOffers(seqInf[counter], [currentOffer])
-                        offers.append(seqOffer)
-                        self.validator.validate(seqOffer)
-                        counter = counter + 1
+            for chunk, result, error in chunkResults:
+                if error is None:
+                    idsforquoting.extend(result[1])
+            offers = mergeChunks([(chunk, None if result is None else result[0], error) for chunk, result, error in chunkResults])
 
             self.offers = offers
             quoteID = self.get_quote(idsforquoting, 
                         external_id=str(uuid.uuid4()),
-                        address_id=self.__address,
+                        address_id=self.get_profile()['address'],
                         first_name=self.__firstname,
                         last_name=self.__lastname)
 
             quote = self.check_quote(quoteID)
             turnOverTime = quote['tat']['business_days']
             amount = quote['quote']['price']
-            self.delete_quote(quoteID)
+            # The quote is deleted later, unless it is used for ordering
+            self.keep_quote(idsforquoting, quoteID, quote)
             self.vendorMessage = [Message(MessageType.VENDOR_INFO, "Twist can only provide the total price and time of the synthesizable sequences. Price: " + str(amount) + " $ , Time: " + str(turnOverTime) + " BD")]
             self.running = False
 
@@ -562,6 +685,55 @@ class Twist(BasePinger):
             self.running = False
             raise UnavailableError from err
 
+    #
+    #   Submits and scores a chunk of the sequences of searchOffers(seqInf).
+    #       Returns a tuple (SequenceOffer for every sequence of the chunk, ids of the buildable constructs)
+    #
+    def searchChunk(self, seqInf):
+        offers = [] # Empty Offers List
+        twistSequences  = []
+        constrcutIds = []
+
+        for s in seqInf:
+            # Encode each element in JSON-Format with fields readable by the TWISTClient and add it to the list.
+            self.validator.validateInternal(s)
+            seq = self.encode_sequence(s)
+            twistSequences.append(seq)
+
+        constructs = self.submit_constructs(twistSequences)
+
+        ids = [i['id'] for i in constructs]
+        scores = self.get_scores(ids)
+        counter = 0
+        idsforquoting = []
+        for identifier in ids:
+            for constructscore in scores:
+                if(constructscore['id'] == identifier):
+                    issues = constructscore["score_data"]["issues"]
+                    # If the construct can be produced
+                    if (constructscore["score"] == "BUILDABLE" and len(issues) == 0):
+                        messageText = constructscore["name"] + "_" + "accepted" + "->ConstructID =" + str(identifier)
+                        message = Message(MessageType.INFO, messageText)
+                        idsforquoting.append(identifier)
+
+                    # If the construct can not be produced
+                    if (constructscore["score"] != "BUILDABLE" and len(issues) != 0):
+                        messageText = constructscore["name"] + "_" + "rejected_"
+                        for issue in issues:
+                             messageText = messageText + issue['title'] + "."
+                        message = Message(MessageType.SYNTHESIS_ERROR, messageText)
+                    turnOverTime = -1
+                    price = Price()
+                    self.validator.validateInternal(message)
+                    currentOffer = TwistOffer(price = price, turnovertime = turnOverTime, messages = [message])
+                    # Used to find the construct when ordering
+                    currentOffer.constructId = identifier
+                    seqOffer = SequenceOffers(seqInf[counter], [currentOffer])
+                    offers.append(seqOffer)
+                    self.validator.validateInternal(seqOffer)
+                    counter = counter + 1
+        return (offers, idsforquoting)
+
     #
     #   Checks if the Pinger is Running.
     #
@@ -602,6 +774,55 @@ class Twist(BasePinger):
         self.running = False
         self.offers = [] # Empty Offers List
         self.vendorMessage = [] # Empty vendorMessage List
+        self.discard_quote()
+
+    #
+    #   Returns an index of the offers of the last search of the form {offer key: (SequenceInformation, construct id)}.
+    #   The index is built again, if the offers were replaced (e.g. by OfferCache.CachingPinger).
+    #
+    def get_construct_index(self):
+        if self.construct_index is None or self.construct_index[0] is not self.offers:
+            index = {}
+            for sequenceOffer in self.offers:
+                for offer in sequenceOffer.offers:
+                    constructId = getattr(offer, 'constructId', None)
+                    if constructId is not None:
+                        index[offer.key] = (sequenceOffer.sequenceInformation, constructId)
+            self.construct_index = (self.offers, index)
+        return self.construct_index[1]
+
+    #
+    #   Keeps the quote of a search for ordering. The previous quote is deleted.
+    #   The quote is deleted in the background after quoteMaxAge seconds.
+    #
+    def keep_quote(self, construct_ids, quote_id, quote):
+        self.discard_quote()
+        self.quote = (frozenset(construct_ids), quote_id, quote, time.monotonic() + self.quoteMaxAge)
+        quote_cleanup.schedule(self.client, quote_id, self.quoteMaxAge)
+
+    #
+    #   Deletes the kept quote in the background.
+    #
+    def discard_quote(self):
+        if self.quote is not None:
+            quote_cleanup.schedule(self.client, self.quote[1])
+            self.quote = None
+
+    #
+    #   Returns the kept quote as tuple (quote id, quote), if it contains exactly the given constructs and is not
+    #   expired. The quote is not deleted anymore. Returns None otherwise.
+    #
+    def take_quote(self, construct_ids):
+        if self.quote is None:
+            return None
+        kept_ids, quote_id, quote, expires = self.quote
+        if kept_ids != frozenset(construct_ids) or expires <= time.monotonic():
+            return None
+        self.quote = None
+        # The quote may have been deleted in the meantime
+        if not quote_cleanup.cancel(quote_id):
+            return None
+        return quote_id, quote
 
 
 
@@ -640,8 +861,9 @@ class Twist(BasePinger):
 
         self.running = True
         constructIDs = []
-        addresses = self.get_addresses()
-        payments = self.get_payments()
+        # The profile is loaded once and kept by the client
+        profile = self.get_profile()
+        payments = profile['payments']
 
 
         if payments:
@@ -651,14 +873,12 @@ class Twist(BasePinger):
                 offersToBuy = []
 
                 # find offers with id in given offerIds
-                for sequenceOffer in self.offers:
-                    for offer in sequenceOffer.offers:
-                        # match
-                        if offer.key in offerIds:
-                            # add to list
-                            offersToBuy.append(sequenceOffer.sequenceInformation)
-                            messagetext = offer.messages[0].text
-                            constructIDs.append(messagetext[-36:len(messagetext)])
+                constructIndex = self.get_construct_index()
+                for offerId in offerIds:
+                    if offerId in constructIndex:
+                        sequenceInformation, constructID = constructIndex[offerId]
+                        offersToBuy.append(sequenceInformation)
+                        constructIDs.append(constructID)
 
                 if len(offersToBuy) != len(offerIds):
                     raise InvalidInputError("Some of the offerIds are not found")
@@ -666,13 +886,18 @@ class Twist(BasePinger):
                 print("Order", len(offersToBuy), "sequences at TWIST")
                 order = Order()
                 
-                quoteID = self.get_quote(constructIDs, 
-                                        external_id=str(uuid.uuid4()),
-                                        address_id=self.__address,
-                                        first_name=self.__firstname,
-                                        last_name=self.__lastname)
-
-                quote = self.check_quote(quoteID)            
+                # The quote of the search is used, if the same constructs are ordered
+                keptQuote = self.take_quote(constructIDs)
+                if keptQuote is not None:
+                    quoteID, quote = keptQuote
+                else:
+                    quoteID = self.get_quote(constructIDs, 
+                                            external_id=str(uuid.uuid4()),
+                                            address_id=profile['address'],
+                                            first_name=self.__firstname,
+                                            last_name=self.__lastname)
+
+                    quote = self.check_quote(quoteID)            
                 redirectURL = quote['pdf_download_link']
                 # Ordering is DEACTIVATED. Uncomment the next line to activate the ordering operation.
                 #self.submit_order(quoteID, payments[0]['id'])
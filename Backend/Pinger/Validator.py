@@ -10,7 +10,10 @@
 #########################################################
 
 from .Entities import *
+from enum import Enum
 import numbers
+import threading
+import weakref
 
 #
 #   Desc:   Interface of a standard Validator
@@ -40,6 +43,19 @@ class Validator:
     def validate(self, obj):
         raise NotImplementedError
 
+#
+#   Desc:   Defines which objects are validated (see EntityValidator.configure).
+#
+#           STRICT: Every object is validated. Used for tests and debugging.
+#           BOUNDARY: Only objects entering at trust boundaries (vendor responses, uploads of
+#           the user) are validated. Objects built or already validated by the backend are not.
+#           OFF: Nothing is validated.
+#
+class ValidationLevel(Enum):
+    STRICT = "strict"
+    BOUNDARY = "boundary"
+    OFF = "off"
+
 #
 #   Desc:   A Concrete Validator to validate Entities from the Pinger Library.
 #
@@ -47,8 +63,37 @@ class Validator:
 #           to raise a specific errors. To configure set the specific variables 
 #           in the constructor.
 #
+#           The check of an object is looked up by its type, subclasses use the check of
+#           their nearest entity class. Valid VendorOffers and SequenceOffers are remembered
+#           together with a fingerprint of their information and offers, so they are not
+#           checked again (e.g. when results are stored again) unless information or offers
+#           were replaced, added or removed. Offers are expected to be replaced instead of
+#           changed after they were validated.
+#
+#           validate checks objects at trust boundaries, validateInternal checks objects built
+#           by the backend. Which of them are checked depends on the ValidationLevel.
+#
 class EntityValidator(Validator):
 
+    # Validation level of all validators
+    level = ValidationLevel.STRICT
+
+    # Type -> name of the method checking objects of the type
+    typeChecks = {
+        VendorInformation: "validateVendorInformation",
+        SequenceInformation: "validateSequenceInformation",
+        Price: "validatePrice",
+        SequenceVendorOffers: "validateSequenceVendorOffers",
+        SequenceOffers: "validateSequenceOffers",
+        VendorOffers: "validateVendorOffers",
+        Offer: "validateOffer",
+        Message: "validateMessage",
+        list: "validateList",
+    }
+
+    # Types of list elements, whose keys must be unique
+    keyedTypes = (SequenceInformation, VendorInformation, Offer)
+
     #
     #   Desc:   Constructor
     #           
@@ -67,163 +112,267 @@ class EntityValidator(Validator):
         self.raiseError = raiseError
         self.errorClass = errorClass
         self.printError = printError
+        # Type -> bound check method, filled on first use of a type
+        self.checks = {}
+        # Valid VendorOffers or SequenceOffers -> fingerprint at the time of the validation.
+        # The objects are not kept alive. Validators are shared by threads, so it is only used with the lock.
+        self.validOffers = weakref.WeakKeyDictionary()
+        self.validOffersLock = threading.Lock()
 
+    #
+    #   Desc:   Sets the validation level of all validators.
+    #
+    #   @param level
+    #           Type ValidationLevel.
+    #
+    @staticmethod
+    def configure(level=ValidationLevel.STRICT):
+        EntityValidator.level = level
+
+    #
+    #   Desc:   Validates an object entering at a trust boundary, e.g. a vendor response or an
+    #           upload. Skipped if the level is OFF.
+    #
+    #   see Validator.validate
+    #
     def validate(self, obj):
-        # VendorInformation
-        if isinstance(obj, VendorInformation):
-            # Check Types
-            if(not isinstance(obj.key, int)):
-                return self.raiseFalse("key is not a numeric value")
-            if(not isinstance(obj.shortName, str)):
-                return self.raiseFalse("shortName is not a String")
-            if(not isinstance(obj.name, str)):
-                return self.raiseFalse("name is not a String")
-
-        # SequenceInformation
-        elif isinstance(obj, SequenceInformation):
-            # Check Types
-            if(not isinstance(obj.key, str)):
-                return self.raiseFalse("key is not a String")
-            if(not isinstance(obj.name, str)):
-                return self.raiseFalse("name is not a String")
-            if(not isinstance(obj.sequence, str)):
-                return self.raiseFalse("sequence is not a String")
-
-        # Price
-        elif isinstance(obj, Price):
-            # Check Types
-            if(not isinstance(obj.currency, Currency)):
-                return self.raiseFalse("currency is not of type Currency")
-            if(not isinstance(obj.amount, numbers.Number)):
-                return self.raiseFalse("amount is not a number")
-            if(not isinstance(obj.customerSpecific, bool)):
-                return self.raiseFalse("customerSpecific is not a boolean")
-
-        # SequenceVendorOffers
-        elif isinstance(obj, SequenceVendorOffers):
-            if isinstance(obj.sequenceInformation, SequenceInformation):
-                if (not self.validate(obj.sequenceInformation)):
-                    return self.raiseFalse("SequenceVendorOffers contains invalid SequenceInformation")
-            else:
-                return self.raiseFalse("sequenceInformation is not of type SequenceInformation")
-            if isinstance(obj.vendorOffers, list):
-                for vendorOffers in obj.vendorOffers:
-                    if isinstance(vendorOffers, VendorOffers):
-                        if (not self.validate(vendorOffers)):
-                            return self.raiseFalse("SequenceVendorOffers contains invalid VendorOffers")
-                    else:
-                        return self.raiseFalse("vendorOffers has elements with other type than VendorOffer")
-            else:
-                return self.raiseFalse("vendorOffers is not of type list")
-
-        # SequenceOffers
-        elif isinstance(obj, SequenceOffers):
-            if isinstance(obj.sequenceInformation, SequenceInformation):
-                if (not self.validate(obj.sequenceInformation)):
-                    return self.raiseFalse("SequenceOffers contains invalid SequenceInformation")
-            else:
-                return self.raiseFalse("sequenceInformation is not of type SequenceInformation")
-            if isinstance(obj.offers, list):
-                for offer in obj.offers:
-                    if isinstance(offer, Offer):
-                        if (not self.validate(offer)):
-                            return self.raiseFalse("one offer in offers is invalid")
-                    else:
-                        return self.raiseFalse("one object in offers is not of type Offer")
-            else:
-                return self.raiseFalse("offers is not of type List")
-
-        # VendorOffers
-        elif isinstance(obj, VendorOffers):
-            # vendorInformation
-            if isinstance(obj.vendorInformation, VendorInformation):
-                if (not self.validate(obj.vendorInformation)):
-                    return self.raiseFalse("VendorOffers contains invalid VendorInformation")
-            else:
-                return self.raiseFalse("vendorInformation is not of type VendorInformation")
-
-            # offers
-            if isinstance(obj.offers, list):
-                for offer in obj.offers:
-                    if isinstance(offer, Offer):
-                        if (not self.validate(offer)):
-                            return self.raiseFalse("one offer in offers is invalid")
-                    else:
-                        return self.raiseFalse("one object in offers is not of type Offer")
-            else:
-                return self.raiseFalse("offers is not of type List")
-        
-        # Offer
-        elif isinstance(obj, Offer):
-            # key
-            if (not isinstance(obj.key, int)):
-                return self.raiseFalse("key is not of type int")
-            
-            # price
-            if (not isinstance(obj.price, Price)):
-                return self.raiseFalse("Attribute price is not of type Price")
-            if (not self.validate(obj.price)):
-                return self.raiseFalse("Attribute price is invalid")
-            
-            #turnovertime
-            if (not isinstance(obj.turnovertime, int)):
-                return self.raiseFalse("turnovertime is not of type int")
-            
-            # messages
-            if isinstance(obj.messages, list):
-                for message in obj.messages:
-                    if isinstance(message, Message):
-                        if (not self.validate(message)):
-                            return self.raiseFalse("one message in messages is invalid")
-                    else:
-                        return self.raiseFalse("one object in message is not of type Message")
-            else:
-                return self.raiseFalse("messages is not of type List")
-
-        # Message
-        elif isinstance(obj, Message):
-            if(not isinstance(obj.messageType, MessageType)):
-                return self.raiseFalse("attribute type of Message has not type MessageType")
-            if(not isinstance(obj.text, str)):
-                return self.raiseFalse("text is not of type String")
-
-        # List
-        elif isinstance(obj, list):
-            # Check that all elements in the list have the same type and that keys are unique
-            
-            elemType = None
-            firstElem = True
-            keys = []
-
-            # For every element in the list...
-            for elem in obj:
-                # ... check that it is valide
-                if (not self.validate(elem)):
-                    return self.raiseFalse("List contains invalid elements")
-
-                if firstElem:
-                    # Take the type of the first element to compare with the other types
-                    elemType = type(elem)
-                    firstElem = False
-                elif elemType != type(elem):
-                    # Can be ok because of polymorphism, but currently there is no reason
-                    # Maybe remove this later
-                    return self.raiseFalse("List contains various types")
-
-                # Check that keys are unique for specific types
-                if (isinstance(elem, SequenceInformation)
-                        or isinstance(elem, VendorInformation)
-                        or isinstance(elem, Offer)):
-                    if elem.key in keys:
-                        return self.raiseFalse("Identifier is not unique")
-
-                    keys.append(elem.key)
+        if EntityValidator.level is ValidationLevel.OFF:
+            return self.raiseTrue()
+        return self.check(obj)
 
+    #
+    #   Desc:   Validates an object built or already validated by the backend. Only done if the
+    #           level is STRICT.
+    #
+    #   see Validator.validate
+    #
+    def validateInternal(self, obj):
+        if EntityValidator.level is not ValidationLevel.STRICT:
+            return self.raiseTrue()
+        return self.check(obj)
+
+    #
+    #   Desc:   Validates an object regardless of the level.
+    #
+    #   see Validator.validate
+    #
+    def check(self, obj):
+        check = self.checks.get(type(obj))
+        if check is None:
+            check = self.getCheck(type(obj))
+        return check(obj)
+
+    #
+    #   Desc:   Looks up the check of a type and remembers it.
+    #
+    #   @param objType
+    #           Type of the object to validate.
+    #
+    #   @result
+    #           Method validating objects of the type.
+    #
+    def getCheck(self, objType):
+        check = self.validateUnsupported
+        for baseType in objType.__mro__:
+            if baseType in EntityValidator.typeChecks:
+                check = getattr(self, EntityValidator.typeChecks[baseType])
+                break
+        self.checks[objType] = check
+        return check
+
+    #
+    #   Desc:   Fingerprint of VendorOffers or SequenceOffers.
+    #
+    #   @param information
+    #           Type VendorInformation or SequenceInformation. Information of the offers.
+    #
+    #   @param offers
+    #           Type ArrayOf(Offer). The offers.
+    #
+    #   @result
+    #           Type tuple. Equal as long as information and offers are not changed or replaced.
+    #
+    def getFingerprint(self, information, offers):
+        return (information, getattr(information, "key", None), getattr(information, "name", None),
+                getattr(information, "shortName", None), getattr(information, "sequence", None), offers,
+                tuple(offers) if isinstance(offers, list) else None)
+
+    #
+    #   Desc:   Returns True, if the offers were valid and did not change since.
+    #
+    def isValidated(self, obj, information, offers):
+        with self.validOffersLock:
+            fingerprint = self.validOffers.get(obj)
+        return fingerprint is not None and fingerprint == self.getFingerprint(information, offers)
+
+    #
+    #   Desc:   Remembers valid offers, so they are not checked again until they change (see isValidated).
+    #
+    def setValidated(self, obj, information, offers):
+        fingerprint = self.getFingerprint(information, offers)
+        with self.validOffersLock:
+            self.validOffers[obj] = fingerprint
+
+    def validateVendorInformation(self, obj):
+        # Check Types
+        if(not isinstance(obj.key, int)):
+            return self.raiseFalse("key is not a numeric value")
+        if(not isinstance(obj.shortName, str)):
+            return self.raiseFalse("shortName is not a String")
+        if(not isinstance(obj.name, str)):
+            return self.raiseFalse("name is not a String")
+        return self.raiseTrue()
+
+    def validateSequenceInformation(self, obj):
+        # Check Types
+        if(not isinstance(obj.key, str)):
+            return self.raiseFalse("key is not a String")
+        if(not isinstance(obj.name, str)):
+            return self.raiseFalse("name is not a String")
+        if(not isinstance(obj.sequence, str)):
+            return self.raiseFalse("sequence is not a String")
+        return self.raiseTrue()
+
+    def validatePrice(self, obj):
+        # Check Types
+        if(not isinstance(obj.currency, Currency)):
+            return self.raiseFalse("currency is not of type Currency")
+        if(not isinstance(obj.amount, numbers.Number)):
+            return self.raiseFalse("amount is not a number")
+        if(not isinstance(obj.customerSpecific, bool)):
+            return self.raiseFalse("customerSpecific is not a boolean")
+        return self.raiseTrue()
+
+    def validateSequenceVendorOffers(self, obj):
+        if isinstance(obj.sequenceInformation, SequenceInformation):
+            if (not self.check(obj.sequenceInformation)):
+                return self.raiseFalse("SequenceVendorOffers contains invalid SequenceInformation")
+        else:
+            return self.raiseFalse("sequenceInformation is not of type SequenceInformation")
+        if isinstance(obj.vendorOffers, list):
+            for vendorOffers in obj.vendorOffers:
+                if isinstance(vendorOffers, VendorOffers):
+                    if (not self.check(vendorOffers)):
+                        return self.raiseFalse("SequenceVendorOffers contains invalid VendorOffers")
+                else:
+                    return self.raiseFalse("vendorOffers has elements with other type than VendorOffer")
+        else:
+            return self.raiseFalse("vendorOffers is not of type list")
+        return self.raiseTrue()
+
+    def validateSequenceOffers(self, obj):
+        if self.isValidated(obj, obj.sequenceInformation, obj.offers):
+            return self.raiseTrue()
+
+        if isinstance(obj.sequenceInformation, SequenceInformation):
+            if (not self.check(obj.sequenceInformation)):
+                return self.raiseFalse("SequenceOffers contains invalid SequenceInformation")
+        else:
+            return self.raiseFalse("sequenceInformation is not of type SequenceInformation")
+        if (not self.validateOffers(obj.offers)):
+            return False
+
+        self.setValidated(obj, obj.sequenceInformation, obj.offers)
+        return self.raiseTrue()
+
+    def validateVendorOffers(self, obj):
+        if self.isValidated(obj, obj.vendorInformation, obj.offers):
+            return self.raiseTrue()
+
+        # vendorInformation
+        if isinstance(obj.vendorInformation, VendorInformation):
+            if (not self.check(obj.vendorInformation)):
+                return self.raiseFalse("VendorOffers contains invalid VendorInformation")
+        else:
+            return self.raiseFalse("vendorInformation is not of type VendorInformation")
+
+        # offers
+        if (not self.validateOffers(obj.offers)):
+            return False
+
+        self.setValidated(obj, obj.vendorInformation, obj.offers)
+        return self.raiseTrue()
+
+    #
+    #   Desc:   Validates the offers of SequenceOffers and VendorOffers.
+    #
+    def validateOffers(self, offers):
+        if isinstance(offers, list):
+            for offer in offers:
+                if isinstance(offer, Offer):
+                    if (not self.check(offer)):
+                        return self.raiseFalse("one offer in offers is invalid")
+                else:
+                    return self.raiseFalse("one object in offers is not of type Offer")
+        else:
+            return self.raiseFalse("offers is not of type List")
+        return self.raiseTrue()
+
+    def validateOffer(self, obj):
+        # key
+        if (not isinstance(obj.key, int)):
+            return self.raiseFalse("key is not of type int")
+
+        # price
+        if (not isinstance(obj.price, Price)):
+            return self.raiseFalse("Attribute price is not of type Price")
+        if (not self.check(obj.price)):
+            return self.raiseFalse("Attribute price is invalid")
+
+        #turnovertime
+        if (not isinstance(obj.turnovertime, int)):
+            return self.raiseFalse("turnovertime is not of type int")
+
+        # messages
+        if isinstance(obj.messages, list):
+            for message in obj.messages:
+                if isinstance(message, Message):
+                    if (not self.check(message)):
+                        return self.raiseFalse("one message in messages is invalid")
+                else:
+                    return self.raiseFalse("one object in message is not of type Message")
         else:
-            return self.raiseFalse("The object to validate has a not supported type")
+            return self.raiseFalse("messages is not of type List")
+        return self.raiseTrue()
+
+    def validateMessage(self, obj):
+        if(not isinstance(obj.messageType, MessageType)):
+            return self.raiseFalse("attribute type of Message has not type MessageType")
+        if(not isinstance(obj.text, str)):
+            return self.raiseFalse("text is not of type String")
+        return self.raiseTrue()
+
+    def validateList(self, obj):
+        # Check that all elements in the list have the same type and that keys are unique
+        if not obj:
+            return self.raiseTrue()
+
+        elemType = type(obj[0])
+        keyed = isinstance(obj[0], EntityValidator.keyedTypes)
+        keys = set()
+
+        # For every element in the list...
+        for elem in obj:
+            # ... check that it is valide
+            if (not self.check(elem)):
+                return self.raiseFalse("List contains invalid elements")
+
+            if elemType != type(elem):
+                # Can be ok because of polymorphism, but currently there is no reason
+                # Maybe remove this later
+                return self.raiseFalse("List contains various types")
+
+            # Check that keys are unique for specific types
+            if keyed:
+                if elem.key in keys:
+                    return self.raiseFalse("Identifier is not unique")
+                keys.add(elem.key)
 
         return self.raiseTrue()
 
+    def validateUnsupported(self, obj):
+        return self.raiseFalse("The object to validate has a not supported type")
+
     #
     #   Desc:   Called if validation failed.
     #
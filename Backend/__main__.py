@@ -3,8 +3,11 @@ import sys
 import optparse
 import time
 from Controller.app import app
+from Controller.routes import configurator
 
 if __name__ == '__main__':
+    # Authenticate at the vendors while the first sessions are created
+    configurator.warmUpVendors()
     app.run(host='0.0.0.0', port=8080, debug=False)
 
 from Controller import routes
@@ -23,9 +23,14 @@ setuptools.setup(
         'Flask',
         'Flask-Session',
         'biopython',
+        'numpy',
         'pysbol',
         'requests',
         'pyyaml'
-    ]
+    ],
+    extras_require={
+        # Session store redis (see sessionStore in config.yml)
+        'redis': ['redis']
+    }
 )
 
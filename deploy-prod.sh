@@ -12,6 +12,16 @@ docker container stop dnafrontend
 docker container rm dnafrontend
 docker container stop dnabackend
 docker container rm dnabackend
+docker container stop dnaredis
+docker container rm dnaredis
+
+echo "Create the secret key of the sessions, if there is none"
+mkdir /srv/dnascanner -p
+if [ ! -f /srv/dnascanner/secret_key ]; then
+    openssl rand -hex 32 > /srv/dnascanner/secret_key
+    chmod 600 /srv/dnascanner/secret_key
+fi
+export SECRET_KEY=${SECRET_KEY:-$(cat /srv/dnascanner/secret_key)}
 
 echo "Start container"
 docker-compose -f docker-compose.yml -f docker-compose.prod.yml up -d --build --force-recreate 
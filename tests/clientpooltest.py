@@ -0,0 +1,347 @@
+import threading
+import time
+import unittest
+
+from Pinger import Pinger, Entities, IDT
+from Pinger.ClientPool import VendorClientPool, LazyPinger, createHttpAdapter, createHttpSession
+from dummy.pinger import RecordingPinger
+
+class TestClientPool(unittest.TestCase):
+
+    name = "ClientPool"
+
+    #
+    #   Desc:   Test that clients are created once and shared.
+    #
+    def testReuse(self):
+        print ("--->>> Start test for: " + TestClientPool.name + " - Reuse")
+        created = []
+
+        def factory():
+            created.append(object())
+            return created[-1]
+
+        pool = VendorClientPool()
+        self.assertFalse(pool.contains("a"))
+        client = pool.get("a", factory)
+        self.assertIs(client, pool.get("a", factory))
+        self.assertTrue(pool.contains("a"))
+        self.assertEqual(1, len(created))
+
+        # Other keys get other clients
+        self.assertIsNot(client, pool.get("b", factory))
+        self.assertEqual(2, len(created))
+
+        # Invalidated clients are created again
+        pool.invalidate("a")
+        self.assertFalse(pool.contains("a"))
+        self.assertIsNot(client, pool.get("a", factory))
+        self.assertEqual(3, len(created))
+
+    #
+    #   Desc:   Test that clients are created again after their maximum age.
+    #
+    def testMaxAge(self):
+        print ("--->>> Start test for: " + TestClientPool.name + " - MaxAge")
+        pool = VendorClientPool()
+        client = pool.get("a", object, maxAge=0.1)
+        self.assertIs(client, pool.get("a", object, maxAge=0.1))
+        time.sleep(0.15)
+        self.assertFalse(pool.contains("a"))
+        self.assertIsNot(client, pool.get("a", object, maxAge=0.1))
+
+    #
+    #   Desc:   Test that failing factories raise and are called again next time.
+    #
+    def testFailure(self):
+        print ("--->>> Start test for: " + TestClientPool.name + " - Failure")
+        calls = []
+
+        def factory():
+            calls.append(1)
+            if len(calls) == 1:
+                raise ConnectionError("vendor unavailable")
+            return object()
+
+        pool = VendorClientPool()
+        with self.assertRaises(ConnectionError):
+            pool.get("a", factory)
+        self.assertFalse(pool.contains("a"))
+        self.assertIsNotNone(pool.get("a", factory))
+        self.assertEqual(2, len(calls))
+
+    #
+    #   Desc:   Test that concurrent sessions authenticate only once.
+    #
+    def testConcurrentGet(self):
+        print ("--->>> Start test for: " + TestClientPool.name + " - ConcurrentGet")
+        created = []
+
+        def factory():
+            time.sleep(0.05)
+            created.append(object())
+            return created[-1]
+
+        pool = VendorClientPool()
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(pool.get("a", factory))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(1, len(created))
+        self.assertEqual(8, len(results))
+        for client in results:
+            self.assertIs(created[0], client)
+
+    #
+    #   Desc:   Test that HTTP sessions share connections only if they share the adapter.
+    #
+    def testHttpSession(self):
+        print ("--->>> Start test for: " + TestClientPool.name + " - HttpSession")
+        session = createHttpSession(poolSize=4)
+        adapter = session.get_adapter("https://example.org")
+        self.assertIs(adapter, session.get_adapter("http://example.org"))
+        self.assertEqual(4, adapter._pool_maxsize)
+
+        shared = createHttpAdapter(poolSize=2)
+        session1 = createHttpSession(adapter=shared)
+        session2 = createHttpSession(adapter=shared)
+        self.assertIs(shared, session1.get_adapter("https://example.org"))
+        self.assertIs(shared, session2.get_adapter("https://example.org"))
+        # Cookies of different users are not shared
+        session1.cookies.set("boost-jwt", "token")
+        self.assertEqual(0, len(session2.cookies))
+
+    #
+    #   Desc:   Test that vendors are skipped while their client is created in the background.
+    #
+    def testLazyPinger(self):
+        print ("--->>> Start test for: " + TestClientPool.name + " - LazyPinger")
+        authenticated = threading.Event()
+
+        def factory():
+            authenticated.wait(5)
+            return object()
+
+        pool = VendorClientPool()
+        lazy = LazyPinger(pool, "slow", factory, lambda client: RecordingPinger())
+        ready = RecordingPinger()
+        p = Pinger.CompositePinger()
+        p.registerVendor(Entities.VendorInformation(name="Slow", shortName="Slow", key=0), lazy)
+        p.registerVendor(Entities.VendorInformation(name="Ready", shortName="Ready", key=1), ready)
+
+        seqInf = [Entities.SequenceInformation("ACGT", "Seq1", "s1")]
+
+        # The ready vendor is searched, the other one stays pending
+        p.searchOffers(seqInf)
+        self.assertTrue(p.waitForCompletion(5))
+        self.assertEqual(1, len(ready.searches))
+        self.assertEqual(Entities.SearchStatus.PENDING, p.getSearchStatus()[0])
+        self.assertEqual(Entities.SearchStatus.FINISHED, p.getSearchStatus()[1])
+        self.assertEqual(1, len(p.getVendorMessages()[0]))
+        self.assertTrue(pool.isWarming("slow"))
+
+        # As soon as the client is created, the vendor is searched
+        authenticated.set()
+        for _ in range(100):
+            if pool.contains("slow"):
+                break
+            time.sleep(0.05)
+        p.searchOffers(seqInf, vendors=[0])
+        self.assertTrue(p.waitForCompletion(5))
+        self.assertEqual(Entities.SearchStatus.FINISHED, p.getSearchStatus()[0])
+        self.assertEqual(1, len(lazy.pinger.searches))
+        self.assertEqual(1, len(p.getOffers()[0].vendorOffers[0].offers))
+
+    #
+    #   Desc:   Test that replaced clients reach the vendor pinger and offers found before can still be ordered.
+    #
+    def testLazyPingerRefresh(self):
+        print ("--->>> Start test for: " + TestClientPool.name + " - LazyPingerRefresh")
+        clients = []
+
+        def createPinger(client):
+            clients.append(client)
+            return RecordingPinger()
+
+        pool = VendorClientPool()
+        pool.get("vendor", object)
+        lazy = LazyPinger(pool, "vendor", object, createPinger)
+        seqInf = [Entities.SequenceInformation("ACGT", "Seq1", "s1")]
+        lazy.searchOffers(seqInf)
+
+        # The same client keeps the vendor pinger
+        lazy.searchOffers(seqInf)
+        self.assertEqual(1, len(clients))
+        offerKey = lazy.getOffers()[0].offers[0].key
+
+        # An invalidated client is replaced, the new vendor pinger gets the offers of the old one
+        pool.invalidate("vendor")
+        client = pool.get("vendor", object)
+        self.assertEqual(Entities.OrderType.URL_REDIRECT, lazy.order([offerKey]).getType())
+        self.assertEqual([client], clients[1:])
+
+        lazy.searchOffers(seqInf)
+        self.assertEqual(2, len(clients))
+        self.assertEqual(1, len(lazy.pinger.searches))
+
+    #
+    #   Desc:   Test that vendors, which could not authenticate, fail and are tried again.
+    #
+    def testLazyPingerFailure(self):
+        print ("--->>> Start test for: " + TestClientPool.name + " - LazyPingerFailure")
+        calls = []
+
+        def factory():
+            calls.append(1)
+            raise ConnectionError("vendor unavailable")
+
+        pool = VendorClientPool()
+        lazy = LazyPinger(pool, "failing", factory, lambda client: RecordingPinger())
+        p = Pinger.CompositePinger()
+        p.registerVendor(Entities.VendorInformation(name="Failing", shortName="Failing", key=0), lazy)
+
+        seqInf = [Entities.SequenceInformation("ACGT", "Seq1", "s1")]
+        # Starts creating the client
+        lazy.isReady()
+        for _ in range(100):
+            if not pool.isWarming("failing"):
+                break
+            time.sleep(0.05)
+
+        p.searchOffers(seqInf)
+        self.assertTrue(p.waitForCompletion(5))
+        self.assertEqual(Entities.SearchStatus.FAILED, p.getSearchStatus()[0])
+        self.assertEqual(Entities.MessageType.API_CURRENTLY_UNAVAILABLE, p.getVendorMessages()[0][0].messageType)
+        for _ in range(100):
+            if len(calls) == 2:
+                break
+            time.sleep(0.05)
+        self.assertEqual(2, len(calls))
+
+    #
+    #   Desc:   Test that a vendor using an outdated client after a failed refresh or a rejected client gets a new
+    #           client, as soon as it can be created again.
+    #
+    def testLazyPingerRecovery(self):
+        print ("--->>> Start test for: " + TestClientPool.name + " - LazyPingerRecovery")
+        calls = []
+
+        def factory():
+            calls.append(1)
+            if len(calls) == 1:
+                raise ConnectionError("vendor unavailable")
+            return object()
+
+        clients = []
+
+        def createPinger(client):
+            clients.append(client)
+            return RejectingPinger() if len(clients) == 2 else RecordingPinger()
+
+        pool = VendorClientPool()
+        outdated = pool.get("vendor", object, maxAge=0.05)
+        lazy = LazyPinger(pool, "vendor", factory, createPinger, maxAge=60)
+        seqInf = [Entities.SequenceInformation("ACGT", "Seq1", "s1")]
+        time.sleep(0.1)
+
+        # Refreshing fails, the outdated client is used until the next try succeeds
+        self.assertTrue(lazy.isReady())
+        waitForWarmUp(pool, "vendor")
+        self.assertIsNotNone(pool.getError("vendor"))
+        lazy.searchOffers(seqInf)
+        waitForWarmUp(pool, "vendor")
+        self.assertTrue(pool.contains("vendor"))
+        self.assertEqual(2, len(calls))
+        self.assertEqual([outdated], clients)
+
+        # The vendor rejects the new client, so it is created again
+        with self.assertRaises(Entities.AuthenticationError):
+            lazy.searchOffers(seqInf)
+        waitForWarmUp(pool, "vendor")
+        self.assertEqual(3, len(calls))
+        lazy.searchOffers(seqInf)
+        self.assertEqual(3, len(clients))
+        self.assertEqual(1, len(lazy.pinger.searches))
+
+    #
+    #   Desc:   Test that a client rejected by a vendor pinger is created again, although the pinger reports the
+    #           rejection as UnavailableError.
+    #
+    def testVendorPingerRejection(self):
+        print ("--->>> Start test for: " + TestClientPool.name + " - VendorPingerRejection")
+        clients = []
+
+        def factory():
+            # The token of the first client has expired, so the vendor can not generate a new one
+            clients.append(RejectedIDTClient() if not clients else AcceptedIDTClient())
+            return clients[-1]
+
+        def createPinger(client):
+            return IDT.IDT("username", "password", "client_id", "client_secret", "shared_secret", client=client)
+
+        pool = VendorClientPool()
+        lazy = LazyPinger(pool, "vendor", factory, createPinger, maxAge=60)
+        seqInf = [Entities.SequenceInformation("ACGT", "Seq1", "s1")]
+        waitForWarmUp(pool, "vendor")
+        self.assertTrue(lazy.isReady())
+
+        with self.assertRaises(Entities.UnavailableError):
+            lazy.searchOffers(seqInf)
+        waitForWarmUp(pool, "vendor")
+        self.assertEqual(2, len(clients))
+        self.assertIs(clients[1], pool.peek("vendor"))
+
+        lazy.searchOffers(seqInf)
+        self.assertEqual("Seq1_accepted", lazy.getOffers()[0].offers[0].messages[0].text)
+
+        # Other errors keep the client
+        clients[1].error = ConnectionError("vendor unavailable")
+        with self.assertRaises(Entities.UnavailableError):
+            lazy.searchOffers(seqInf)
+        waitForWarmUp(pool, "vendor")
+        self.assertEqual(2, len(clients))
+
+#
+#   Waits until the client is not created in the background anymore
+#
+def waitForWarmUp(pool, key):
+    for _ in range(100):
+        if not pool.isWarming(key):
+            return
+        time.sleep(0.05)
+
+#
+#   Pinger whose client is rejected by the vendor
+#
+class RejectingPinger(RecordingPinger):
+
+    def searchOffers(self, seqInf):
+        raise Entities.AuthenticationError("Wrong Credentials")
+
+#
+#   IDT client, whose screening requests pass or fail with error
+#
+class AcceptedIDTClient():
+
+    def __init__(self):
+        self.token = "token"
+        self.error = None
+
+    def screening(self, sequences):
+        if self.error is not None:
+            raise self.error
+        return [[] for _ in sequences]
+
+#
+#   IDT client, that can not generate a new token (see IDT.IDTClient.getToken)
+#
+class RejectedIDTClient(AcceptedIDTClient):
+
+    def __init__(self):
+        super().__init__()
+        self.error = Entities.AuthenticationError("Access token could not be generated. Check your credentials.")
+
+if __name__ == '__main__':
+    unittest.main()
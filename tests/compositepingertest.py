@@ -1,9 +1,15 @@
+import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 
 from Pinger import Pinger, Entities
 from dummy.pinger import DummyPinger
 from dummy.pinger import NotAvailablePinger
 from dummy.pinger import AlwaysRunningPinger
+from dummy.pinger import SleepingPinger
+from dummy.pinger import RecordingPinger
+from dummy.pinger import NamingPinger
+from dummy.pinger import StatefulPinger
 
 class TestCompositePinger(unittest.TestCase):
 
@@ -223,5 +229,258 @@ class TestCompositePinger(unittest.TestCase):
         # Expect error because auf duplicated keys of sequences
         with self.assertRaises(Entities.InvalidInputError): p.searchOffers(sequences)
 
+    #
+    #   Desc:   Test that equal sequences are sent to the vendor once and get their own offers.
+    #
+    def testEqualSequences(self):
+        print ("--->>> Start test for: " + TestCompositePinger.name + " - EqualSequences")
+        sequences = [
+                Entities.SequenceInformation("ACTG", "Plasmid1", "ts1"),
+                Entities.SequenceInformation("GGCC", "Plasmid2", "ts2"),
+                Entities.SequenceInformation("ac tg", "Plasmid3", "ts3")
+            ]
+        vendor = RecordingPinger()
+        p = Pinger.CompositePinger()
+        p.registerVendor(Entities.VendorInformation(name="Recording", shortName="Recording", key=1), vendor)
+
+        p.searchOffers(sequences)
+        self.assertTrue(p.waitForCompletion(5))
+        self.assertEqual([["ACTG", "GGCC"]], vendor.searches)
+
+        offers = p.getOffers()
+        self.assertEqual(["ts1", "ts2", "ts3"], [seqOffers.sequenceInformation.key for seqOffers in offers])
+        original = offers[0].vendorOffers[0].offers[0]
+        duplicate = offers[2].vendorOffers[0].offers[0]
+        self.assertNotEqual(original.key, duplicate.key)
+        self.assertEqual(original.price.amount, duplicate.price.amount)
+
+        # Keys of the copies stay the same
+        self.assertEqual(duplicate.key, p.getOffers()[2].vendorOffers[0].offers[0].key)
+        self.assertEqual([duplicate.key], [offer.key for seqOffers in p.getVendorOffers(1)
+                                           if seqOffers.sequenceInformation.key == "ts3" for offer in seqOffers.offers])
+
+        # Copies are ordered as the offer of the vendor
+        self.assertIsInstance(p.order([duplicate.key], 1), Entities.UrlRedirectOrder)
+        self.assertIsInstance(p.order([original.key, duplicate.key], 1), Entities.UrlRedirectOrder)
+
+    #
+    #   Desc:   Test that the copies for equal sequences name their own sequence in the messages.
+    #
+    def testEqualSequencesMessages(self):
+        print ("--->>> Start test for: " + TestCompositePinger.name + " - EqualSequencesMessages")
+        sequences = [
+                Entities.SequenceInformation("ACTG", "Plasmid1", "ts1"),
+                Entities.SequenceInformation("ACTG", "Plasmid2", "ts2")
+            ]
+        vendor = NamingPinger()
+        p = Pinger.CompositePinger()
+        p.registerVendor(Entities.VendorInformation(name="Naming", shortName="Naming", key=1), vendor)
+
+        p.searchOffers(sequences)
+        self.assertTrue(p.waitForCompletion(5))
+        self.assertEqual([["ACTG"]], vendor.searches)
+        offers = p.getOffers()
+        self.assertEqual(["Plasmid1_accepted", "Synthesis is possible"],
+                         [message.text for message in offers[0].vendorOffers[0].offers[0].messages])
+        self.assertEqual(["Plasmid2_accepted", "Synthesis is possible"],
+                         [message.text for message in offers[1].vendorOffers[0].offers[0].messages])
+        # The offer of the vendor is not changed
+        self.assertEqual("Plasmid1_accepted", vendor.getOffers()[0].offers[0].messages[0].text)
+
+    #
+    #   Desc:   Test that vendors whose offers can not be copied get equal sequences once for every sequence.
+    #
+    def testEqualSequencesStatefulVendor(self):
+        print ("--->>> Start test for: " + TestCompositePinger.name + " - EqualSequencesStatefulVendor")
+        sequences = [
+                Entities.SequenceInformation("ACTG", "Plasmid1", "ts1"),
+                Entities.SequenceInformation("GGCC", "Plasmid2", "ts2"),
+                Entities.SequenceInformation("ac tg", "Plasmid3", "ts3")
+            ]
+        shared = RecordingPinger()
+        stateful = StatefulPinger()
+        p = Pinger.CompositePinger()
+        p.registerVendor(Entities.VendorInformation(name="Shared", shortName="Shared", key=1), shared)
+        p.registerVendor(Entities.VendorInformation(name="Stateful", shortName="Stateful", key=2), stateful)
+
+        p.searchOffers(sequences)
+        self.assertTrue(p.waitForCompletion(5))
+        self.assertEqual([["ACTG", "GGCC"]], shared.searches)
+        self.assertEqual([["ACTG", "GGCC", "ac tg"]], stateful.searches)
+
+        offers = p.getOffers()
+        self.assertEqual([[1, 2]] * 3, [[vendorOffers.vendorInformation.key for vendorOffers in seqOffers.vendorOffers]
+                                        for seqOffers in offers])
+        # Every sequence has the offer the vendor found for it
+        vendorKeys = [seqOffers.offers[0].key for seqOffers in stateful.getOffers()]
+        self.assertEqual(vendorKeys, [seqOffers.vendorOffers[1].offers[0].key for seqOffers in offers])
+        self.assertEqual(3, len(p.getVendorOffers(2)))
+        self.assertEqual({}, p.getOfferAliases().get(2, {}))
+
+        # The offers are ordered with their own keys
+        self.assertIsInstance(p.order([vendorKeys[0], vendorKeys[2]], 2), Entities.UrlRedirectOrder)
+
+    #
+    #   Desc:   Test that offers of vendors are only merged again, if they changed.
+    #
+    def testCollectOffers(self):
+        print ("--->>> Start test for: " + TestCompositePinger.name + " - CollectOffers")
+        sequences = [Entities.SequenceInformation("ACTG" + "A" * i, "Seq" + str(i), "ts" + str(i)) for i in range(384)]
+        vendor1 = RecordingPinger()
+        vendor2 = RecordingPinger()
+        p = Pinger.CompositePinger()
+        p.registerVendor(Entities.VendorInformation(name="Recording1", shortName="Recording1", key=1), vendor1)
+        p.registerVendor(Entities.VendorInformation(name="Recording2", shortName="Recording2", key=2), vendor2)
+
+        p.searchOffers(sequences)
+        self.assertTrue(p.waitForCompletion(5))
+        offers = p.getOffers()
+        self.assertEqual(384, len(offers))
+        self.assertEqual([1, 2], [vendorOffers.vendorInformation.key for vendorOffers in offers[5].vendorOffers])
+        vendorOffers = offers[5].vendorOffers
+        self.assertIs(vendorOffers, p.getOffers()[5].vendorOffers)
+
+        # New offers of a vendor are merged in the order of the vendors
+        vendor1.searchOffers(sequences[:1])
+        offers = p.getOffers()
+        self.assertIsNot(vendorOffers, offers[5].vendorOffers)
+        self.assertEqual([2], [vendorOffers.vendorInformation.key for vendorOffers in offers[5].vendorOffers])
+        self.assertEqual([1, 2], [vendorOffers.vendorInformation.key for vendorOffers in offers[0].vendorOffers])
+
+    #
+    #   Desc:   Test that the vendors are searched at the same time, if the CompositePinger has an executor.
+    #
+    def testParallelSearch(self):
+        sequences = [
+                Entities.SequenceInformation("ACTG", "TestSequence", "ts1"),
+                Entities.SequenceInformation("ACTG", "TestSequence2", "ts2")
+            ]
+
+        p = Pinger.CompositePinger(executor=ThreadPoolExecutor(max_workers=4))
+        for key in range(1, 4):
+            p.registerVendor(Entities.VendorInformation(name="DummySleeping", shortName="DummySleep", key=key), SleepingPinger(0.5))
+        p.registerVendor(Entities.VendorInformation(name="DummyNotAvailable", shortName="DummyNA", key=4), NotAvailablePinger())
+
+        start = time.time()
+        p.searchOffers(sequences)
+        # searchOffers returns immediately and the pinger is running until all vendors are finished
+        self.assertTrue(p.isRunning())
+        self.assertTrue(p.waitForCompletion())
+        self.assertFalse(p.isRunning())
+        # All vendors were searched at the same time
+        self.assertLess(time.time() - start, 1.4)
+
+        res = p.getOffers()
+        self.assertEqual(2, len(res))
+        self.assertEqual(4, len(res[0].vendorOffers))
+        for vendorOffers in res[0].vendorOffers[:3]:
+            self.assertEqual(1, len(vendorOffers.offers))
+        self.assertEqual(0, len(res[0].vendorOffers[3].offers))
+
+        # Errors of vendors are stored as vendor message
+        messages = p.getVendorMessages()
+        self.assertEqual(Entities.MessageType.API_CURRENTLY_UNAVAILABLE, messages[4][0].messageType)
+
+        # Progress per vendor
+        status = p.getSearchStatus()
+        self.assertEqual([1, 2, 3, 4], sorted(status.keys()))
+        for key in range(1, 4):
+            self.assertEqual(Entities.SearchStatus.FINISHED, status[key])
+        self.assertEqual(Entities.SearchStatus.FAILED, status[4])
+
+        # Vendors excluded by the filter have no status
+        p.searchOffers(sequences, vendors=[1])
+        self.assertEqual([1], list(p.getSearchStatus().keys()))
+        p.waitForCompletion()
+
+    #
+    #   Desc:   Test waiting for a search with and without timeout.
+    #
+    def testWaitForCompletion(self):
+        sequences = [Entities.SequenceInformation("ACTG", "TestSequence", "ts1")]
+
+        # Sequential search is finished when searchOffers returns
+        p = Pinger.CompositePinger()
+        p.registerVendor(Entities.VendorInformation(name="DummySleeping", shortName="DummySleep", key=1), SleepingPinger(0.1))
+        p.searchOffers(sequences)
+        self.assertTrue(p.waitForCompletion(timeout=0))
+
+        # Concurrent search with timeout
+        p = Pinger.CompositePinger(executor=ThreadPoolExecutor(max_workers=2))
+        p.registerVendor(Entities.VendorInformation(name="DummySleeping", shortName="DummySleep", key=1), SleepingPinger(0.5))
+        p.searchOffers(sequences)
+        self.assertFalse(p.waitForCompletion(timeout=0.05))
+        self.assertTrue(p.isRunning())
+        self.assertTrue(p.waitForCompletion(timeout=5))
+        self.assertEqual(1, len(p.getOffers()[0].vendorOffers[0].offers))
+
+        # A vendor pinger that never finishes
+        p = Pinger.CompositePinger()
+        p.registerVendor(Entities.VendorInformation(name="DummyRunning", shortName="DummyRunning", key=1), AlwaysRunningPinger())
+        start = time.time()
+        self.assertFalse(p.waitForCompletion(timeout=0.2))
+        self.assertLess(time.time() - start, 1)
+
+    #
+    #   Desc:   Test getting the offers of a single vendor as soon as it is finished.
+    #
+    def testGetVendorOffers(self):
+        sequences = [Entities.SequenceInformation("ACTG", "TestSequence", "ts1")]
+
+        p = Pinger.CompositePinger(executor=ThreadPoolExecutor(max_workers=2))
+        p.registerVendor(Entities.VendorInformation(name="DummySleeping", shortName="DummySleep", key=1), SleepingPinger(0.5))
+        p.registerVendor(Entities.VendorInformation(name="DummyFast", shortName="DummyFast", key=2), SleepingPinger(0))
+        p.searchOffers(sequences)
+
+        # The fast vendor is finished before the slow one
+        deadline = time.time() + 5
+        while p.getSearchStatus()[2] != Entities.SearchStatus.FINISHED and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertNotEqual(Entities.SearchStatus.FINISHED, p.getSearchStatus()[1])
+        vendorOffers = p.getVendorOffers(2)
+        self.assertEqual(1, len(vendorOffers))
+        self.assertEqual("ts1", vendorOffers[0].sequenceInformation.key)
+        self.assertEqual(1, len(vendorOffers[0].offers))
+
+        self.assertTrue(p.waitForCompletion(timeout=5))
+        self.assertEqual(Entities.SearchStatus.FINISHED, p.getSearchStatus()[1])
+        self.assertEqual(1, len(p.getVendorOffers(1)))
+
+        # Unknown vendor
+        self.assertRaises(Entities.InvalidInputError, p.getVendorOffers, 3)
+
+    #
+    #   Desc:   Test splitting sequences into chunks searched concurrently and merging them in input order.
+    #
+    def testSearchInChunks(self):
+        sequences = [Entities.SequenceInformation("ACTG", "Seq" + str(i), "s" + str(i)) for i in range(10)]
+
+        def search(chunk):
+            # The last chunk is the smallest and finishes first
+            time.sleep(0.02 * len(chunk))
+            if chunk[0].key == "s3":
+                raise Entities.UnavailableError("chunk failed")
+            return [Entities.SequenceOffers(seq, [Entities.Offer(messages=[])]) for seq in chunk]
+
+        chunkResults = Pinger.searchInChunks(sequences, search, batchSize=3, parallelism=4)
+        self.assertEqual([3, 3, 3, 1], [len(chunk) for chunk, result, error in chunkResults])
+        self.assertIsInstance(chunkResults[1][2], Entities.UnavailableError)
+
+        # One failed chunk does not fail the other sequences
+        offers = Pinger.mergeChunks(chunkResults)
+        self.assertEqual([seq.key for seq in sequences], [offer.sequenceInformation.key for offer in offers])
+        self.assertEqual([], offers[0].offers[0].messages)
+        for offer in offers[3:6]:
+            self.assertEqual(Entities.MessageType.API_CURRENTLY_UNAVAILABLE, offer.offers[0].messages[0].messageType)
+
+        # Without batch size everything is one chunk
+        self.assertEqual(1, len(Pinger.searchInChunks(sequences, search)))
+
+        # If all chunks fail, the error is raised
+        def fail(chunk):
+            raise Entities.UnavailableError("vendor failed")
+        self.assertRaises(Entities.UnavailableError, Pinger.mergeChunks,
+                          Pinger.searchInChunks(sequences, fail, batchSize=3, parallelism=2))
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,16 +1,28 @@
+import time
 import unittest
 from itertools import combinations
 from sys import maxsize
 
 from Controller.app import app
+from Controller import routes
 from Controller.configurator import YmlConfigurator as Configurator
-from Controller.session import InMemorySessionManager
-from Pinger.Entities import SequenceInformation, SequenceVendorOffers, Currency
+from Controller.searchjob import SearchJob
+from Controller.session import InMemorySessionManager, RedisSessionManager, RedisSearchJob
+from Pinger.Entities import SequenceInformation, SequenceVendorOffers, VendorOffers, VendorInformation, Offer, \
+    Price, Message, MessageType, Currency, OrderType
 from Pinger.Pinger import CompositePinger
+from concurrent.futures import ThreadPoolExecutor
+from dummy.pinger import RecordingPinger, SleepingPinger
 from flask import json
 from random import random
 import random as rand
 
+# fakeredis stands in for a Redis server in the tests
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
 
 class TestController(unittest.TestCase):
     name = "TestController"
@@ -209,6 +221,103 @@ class TestController(unittest.TestCase):
             self.assertEqual(expectedCount, searchResult["count"],
                              "Mismatch between declared and actual sequence count!")
 
+    def test_search_endpoint(self) -> None:
+        print("\nTesting /search endpoint")
+
+        # Starting a search without sequences is an error
+        with app.test_client() as client:
+            self.assertIn("error", client.post('/api/search').get_json())
+
+        for i in range(10):
+            handle = open(self.sequence_path, 'rb')
+            self.client.post('/api/upload', content_type='multipart/form-data', data={'seqfile': handle})
+
+            response = self.client.post('/api/search').get_json()
+            self.assertIn("jobId", response)
+            jobId = response["jobId"]
+
+            # Unknown jobs are reported as error
+            self.assertIn("error", self.client.get('/api/search/' + jobId + "x").get_json())
+
+            status = self.client.get('/api/search/' + jobId).get_json()
+            while status["status"] == "RUNNING":
+                status = self.client.get('/api/search/' + jobId).get_json()
+            self.assertEqual("FINISHED", status["status"])
+            self.assertEqual(sorted(self.vendors), sorted([vendor["key"] for vendor in status["vendors"]]))
+            for vendor in status["vendors"]:
+                self.assertIn(vendor["status"], ["FINISHED", "FAILED"])
+
+            searchResult = self.client.post('/api/results', content_type='multipart/form-data',
+                                            data={'size': 1000, 'offset': 0}).get_json()
+            self.assertNotIn("error", searchResult)
+            self.assertFalse(searchResult["searchRunning"])
+
+            # All vendors are searched already. Offers must not be stored twice.
+            self.client.post('/api/search')
+            secondResult = self.client.post('/api/results', content_type='multipart/form-data',
+                                            data={'size': 1000, 'offset': 0}).get_json()
+            self.assertEqual(searchResult["result"], secondResult["result"])
+
+    def test_search_stream_endpoint(self) -> None:
+        print("\nTesting /search/<jobId>/stream endpoint")
+
+        handle = open(self.sequence_path, 'rb')
+        self.client.post('/api/upload', content_type='multipart/form-data', data={'seqfile': handle})
+        jobId = self.client.post('/api/search').get_json()["jobId"]
+
+        # Unknown jobs are reported as error
+        self.assertIn("error", self.client.get('/api/search/' + jobId + "x/stream").get_json())
+
+        response = self.client.get('/api/search/' + jobId + "/stream")
+        self.assertEqual("text/event-stream", response.mimetype)
+        events = [event for event in response.get_data(as_text=True).split("\n\n") if event]
+        offerVendors = set()
+        for event in events[:-1]:
+            name, data = event.split("\n", 1)
+            self.assertEqual("event: offers", name)
+            offerVendors.add(json.loads(data[len("data: "):])["vendorKey"])
+        self.assertEqual(sorted(self.vendors), sorted(offerVendors))
+
+        name, data = events[-1].split("\n", 1)
+        self.assertEqual("event: summary", name)
+        self.assertEqual("FINISHED", json.loads(data[len("data: "):])["status"])
+
+    def test_search_stream_wakeup(self) -> None:
+        print("\nTesting wake up and keep-alive of /search/<jobId>/stream")
+
+        vendor = VendorInformation("Vendor", "V", 0)
+        sequences = [SequenceInformation("ACTG", "seq0", "s0"), SequenceInformation("GGCC", "seq1", "s1")]
+        vendorExecutor = ThreadPoolExecutor(max_workers=1)
+        pinger = CompositePinger(executor=vendorExecutor)
+        pinger.registerVendor(vendor, SleepingPinger(0.5))
+        with self.client.session_transaction() as cookie:
+            cookie["sessionKey"] = "stream0"
+        session = routes.service.sessionManager("stream0")
+        session.storePinger(pinger)
+        keepAlive = routes.service.config.streamKeepAlive
+        routes.service.config.streamKeepAlive = 0.1
+        try:
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                job = SearchJob(pinger, sequences, [0])
+                version = job.getVersion()
+                job.start(executor)
+                session.storeSearchJob(job)
+
+                # The job wakes up waiting streams, when its status changes
+                self.assertTrue(job.waitForChange(version, timeout=5))
+                response = self.client.get('/api/search/' + job.id + "/stream")
+                self.assertEqual("no", response.headers.get("X-Accel-Buffering"))
+                events = [event for event in response.get_data(as_text=True).split("\n\n") if event]
+            self.assertIn(": keep-alive", events)
+            names = [event.split("\n", 1)[0] for event in events if event != ": keep-alive"]
+            self.assertEqual(["event: offers", "event: summary"], names)
+            self.assertEqual("FINISHED", job.getStatus()["status"])
+            self.assertFalse(job.waitForChange(job.getVersion(), timeout=0.1))
+        finally:
+            routes.service.config.streamKeepAlive = keepAlive
+            session.free()
+            vendorExecutor.shutdown()
+
     def test_vendor_endpoint(self) -> None:
         print("\nTesting /vendors endpoint")
 
@@ -548,6 +657,232 @@ class TestController(unittest.TestCase):
         for i in range(0, n_sessions):
             self.assertFalse(session.hasSession(i))
 
+    def test_in_memory_session_eviction(self) -> None:
+        print("\nTesting in-memory session eviction")
+
+        InMemorySessionManager(0).free()
+        idleTimeout = InMemorySessionManager.idleTimeout
+        maxSessions = InMemorySessionManager.maxSessions
+        try:
+            # Least recently used sessions are removed first
+            InMemorySessionManager.configure(idleTimeout=3600, maxSessions=3, sweepInterval=None)
+            for i in range(3):
+                InMemorySessionManager(i).storePinger(CompositePinger())
+            pinger = InMemorySessionManager(0).loadPinger()
+            evicted = InMemorySessionManager(1)
+            InMemorySessionManager(2)
+            InMemorySessionManager(3)
+            self.assertFalse(InMemorySessionManager.hasSession(0))
+            for i in range(1, 4):
+                self.assertTrue(InMemorySessionManager.hasSession(i))
+            # A removed session starts over
+            self.assertIsNone(InMemorySessionManager(0).loadPinger())
+            self.assertIsNotNone(pinger)
+            self.assertFalse(InMemorySessionManager.hasSession(1))
+            # Removed sessions are freed
+            self.assertIsNone(evicted.loadPinger())
+
+            # Idle sessions are removed by the sweeper
+            InMemorySessionManager.configure(idleTimeout=0.1, maxSessions=3, sweepInterval=None)
+            InMemorySessionManager(2)
+            time.sleep(0.15)
+            InMemorySessionManager(3)
+            InMemorySessionManager.sweep()
+            self.assertFalse(InMemorySessionManager.hasSession(0))
+            self.assertFalse(InMemorySessionManager.hasSession(2))
+            self.assertTrue(InMemorySessionManager.hasSession(3))
+
+            # Sessions used by a request are kept until they are released
+            used = InMemorySessionManager(3)
+            used.acquire()
+            used.storePinger(CompositePinger())
+            time.sleep(0.15)
+            InMemorySessionManager.sweep()
+            InMemorySessionManager.configure(idleTimeout=3600, maxSessions=1, sweepInterval=None)
+            InMemorySessionManager(4)
+            self.assertTrue(InMemorySessionManager.hasSession(3))
+            self.assertIsNotNone(used.loadPinger())
+            used.release()
+            InMemorySessionManager(5)
+            self.assertFalse(InMemorySessionManager.hasSession(3))
+            self.assertFalse(InMemorySessionManager.hasSession(4))
+
+            # Only the least recently used sessions are looked at, until enough are removed
+            InMemorySessionManager(0).free()
+            InMemorySessionManager.configure(idleTimeout=3600, maxSessions=100, sweepInterval=None)
+            for i in range(100):
+                InMemorySessionManager(i)
+            checked = []
+            for sid, single in InMemorySessionManager.sessions.items():
+                single.isInUse = lambda sid=sid: checked.append(sid) or sid == 1
+            InMemorySessionManager.evict()
+            self.assertEqual([], checked)
+            InMemorySessionManager.configure(idleTimeout=3600, maxSessions=98, sweepInterval=None)
+            InMemorySessionManager.evict()
+            self.assertEqual([0, 1, 2], checked)
+            self.assertEqual(98, len(InMemorySessionManager.sessions))
+            self.assertTrue(InMemorySessionManager.hasSession(1))
+        finally:
+            InMemorySessionManager.configure(idleTimeout=idleTimeout, maxSessions=maxSessions, sweepInterval=None)
+            InMemorySessionManager(0).free()
+
+    def test_merge_results(self) -> None:
+        print("\nTesting merging of search results")
+
+        def results(amounts):
+            return [SequenceVendorOffers(SequenceInformation("ACTG", "seq" + str(i), "s" + str(i)),
+                                         [VendorOffers(VendorInformation("Vendor", "V", vendor),
+                                                       [Offer(price=Price(amount=amount))])
+                                          for vendor in range(3)])
+                    for i, amount in enumerate(amounts)]
+
+        managers = [InMemorySessionManager(0)]
+        if fakeredis is not None:
+            RedisSessionManager.configure(client=fakeredis.FakeStrictRedis(), sweepInterval=None)
+            managers.append(RedisSessionManager("redis0"))
+        for session in managers:
+            session.free()
+            session.storeResults(results([1, 2]))
+            # Only offers of the listed vendors are added, unknown sequences are ignored
+            session.mergeResults(results([3, 4, 5]), [0, 2])
+            merged = session.loadResults()
+            self.assertEqual(["s0", "s1"], [seqvendoff.sequenceInformation.key for seqvendoff in merged])
+            for seqvendoff, amounts in zip(merged, [[1, 3], [2, 4]]):
+                self.assertEqual([amounts, amounts[:1], amounts],
+                                 [[offer.price.amount for offer in vendoff.offers]
+                                  for vendoff in seqvendoff.vendorOffers])
+            session.free()
+
+    @unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+    def test_redis_session(self) -> None:
+        print("\nTesting redis session management")
+
+        RedisSessionManager.configure(client=fakeredis.FakeStrictRedis(), sweepInterval=None)
+        RedisSessionManager("redis0").free()
+        self.assertFalse(RedisSessionManager.hasSession("redis0"))
+
+        # Values are visible to every manager of the session
+        vendor = VendorInformation("Vendor", "V", 0)
+        offer = Offer.withAttributes(["isHq"])(price=Price(amount=12.5, currency=Currency.USD, customerSpecific=True),
+                                               turnovertime=3, messages=[Message(MessageType.INFO, "accepted")])
+        offer.isHq = True
+        sequence = SequenceInformation("ACTG", "seq", "s0")
+        session = RedisSessionManager("redis0")
+        session.storeSequences([sequence])
+        session.storeFilter({"vendors": [0], "price": [0, 20], "deliveryDays": 5,
+                             "preselectByPrice": True, "preselectByDeliveryDays": False})
+        session.storeResults([SequenceVendorOffers(sequence, [VendorOffers(vendor, [offer])])])
+        session.addSearchedVendors([0])
+        session.addSearchedVendors([1])
+        session.addGlobalMessages([Message(MessageType.WRONG_CREDENTIALS, "wrong"), "text"])
+        session.addGlobalMessages(["text"])
+        session.storeVendorMessages({0: [Message(MessageType.VENDOR_INFO, "info")]})
+        session.storeSelection([offer.key])
+        session.storeHostOrganism("host")
+        session.storeJugglingStrategy("strategy")
+        pinger = CompositePinger()
+        session.storePinger(pinger)
+
+        session = RedisSessionManager("redis0")
+        self.assertTrue(RedisSessionManager.hasSession("redis0"))
+        self.assertFalse(RedisSessionManager.hasSession("redis1"))
+        self.assertEqual(["s0"], [seq.key for seq in session.loadSequences()])
+        self.assertEqual("ACTG", session.loadSequences()[0].sequence)
+        self.assertEqual(5, session.loadFilter()["deliveryDays"])
+        self.assertEqual([0, 1], session.loadSearchedVendors())
+        self.assertEqual([offer.key], session.loadSelection())
+        self.assertEqual("host", session.loadHostOrganism())
+        self.assertEqual("strategy", session.loadJugglingStrategy())
+        self.assertIs(pinger, session.loadPinger())
+
+        results = session.loadResults()
+        self.assertEqual(1, len(results))
+        self.assertEqual(0, results[0].vendorOffers[0].vendorInformation.key)
+        loadedOffer = results[0].vendorOffers[0].offers[0]
+        self.assertEqual(offer.key, loadedOffer.key)
+        self.assertEqual(12.5, loadedOffer.price.amount)
+        self.assertEqual(Currency.USD, loadedOffer.price.currency)
+        self.assertEqual(3, loadedOffer.turnovertime)
+        self.assertEqual("accepted", loadedOffer.messages[0].text)
+        self.assertTrue(loadedOffer.isHq)
+
+        globalMessages = session.loadGlobalMessages()
+        self.assertEqual(2, len(globalMessages))
+        self.assertEqual(MessageType.WRONG_CREDENTIALS, globalMessages[0].messageType)
+        self.assertEqual("text", globalMessages[1])
+        self.assertEqual("info", session.loadVendorMessages()[0][0].text)
+
+        # Another process only shares the stored values
+        InMemorySessionManager(0).free()
+        session = RedisSessionManager("redis0")
+        self.assertIsNone(session.loadPinger())
+        self.assertEqual(1, len(session.loadResults()))
+
+        session.free()
+        self.assertFalse(RedisSessionManager.hasSession("redis0"))
+
+    @unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+    def test_redis_search_job(self) -> None:
+        print("\nTesting search jobs of redis sessions in other processes")
+
+        RedisSessionManager.configure(client=fakeredis.FakeStrictRedis(), sweepInterval=None)
+        session = RedisSessionManager("redis0")
+        session.free()
+        vendor = VendorInformation("Vendor", "V", 0)
+        sequences = [SequenceInformation("ACTG", "seq0", "s0"), SequenceInformation("GGCC", "seq1", "s1")]
+        session.storeSequences(sequences)
+        session.storeResults([SequenceVendorOffers(seq, [VendorOffers(vendor, [])]) for seq in sequences])
+        pinger = CompositePinger()
+        pinger.registerVendor(vendor, RecordingPinger())
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            job = SearchJob(pinger, sequences, [0])
+            job.start(executor)
+            session.storeSearchJob(job)
+            job.wait()
+        self.assertIs(job, session.loadSearchJob())
+
+        # Another process sees the published job
+        workerId = RedisSessionManager.workerId
+        InMemorySessionManager(0).free()
+        RedisSessionManager.workerId = "other"
+        try:
+            session = RedisSessionManager("redis0")
+            remote = session.loadSearchJob()
+            self.assertIsInstance(remote, RedisSearchJob)
+            self.assertEqual(job.id, remote.id)
+            self.assertFalse(remote.isRunning())
+            self.assertIsNone(remote.getError())
+            self.assertEqual(job.getStatus(), remote.getStatus())
+            self.assertEqual([0], remote.getSearchedVendors())
+            self.assertEqual(["s0", "s1"], [seqOffers.sequenceInformation.key
+                                            for seqOffers in remote.pinger.getVendorOffers(0)])
+
+            # The result is merged by one process only
+            self.assertTrue(session.markSearchJobMerged(remote))
+            self.assertFalse(session.markSearchJobMerged(job))
+            session.mergeResults(remote.pinger.getOffers(), remote.vendors)
+
+            # Offers found by the other process can be ordered by a new pinger
+            orderPinger = CompositePinger()
+            orderPinger.registerVendor(vendor, RecordingPinger())
+            orderPinger.registerOffers(session.loadResults(), remote.getOfferAliases())
+            offerKey = session.loadResults()[1].vendorOffers[0].offers[0].key
+            self.assertEqual(OrderType.URL_REDIRECT, orderPinger.order([offerKey], 0).getType())
+
+            # Jobs of stopped processes are interrupted
+            state = session.load("searchJob", None)
+            state["status"]["status"] = "RUNNING"
+            state["worker"] = "stopped"
+            session.store("searchJob", state)
+            interrupted = session.loadSearchJob()
+            self.assertFalse(interrupted.isRunning())
+            self.assertIsNotNone(interrupted.getError())
+            self.assertEqual("FAILED", interrupted.getStatus()["status"])
+        finally:
+            RedisSessionManager.workerId = workerId
+            session.free()
+
     def testSelectionEndpoint(self) -> None:
         print("\nTesting /select endpoint")
 
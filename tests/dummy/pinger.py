@@ -1,3 +1,5 @@
+import time
+
 from Pinger.Pinger import *
 from Pinger.Entities import *
 
@@ -14,6 +16,7 @@ class DummyPinger(BasePinger):
         self.tempOffer = Offer(price=Price(currency=Currency.EUR,amount=120),turnovertime=14)
         self.tempOffer.messages.append(Message(MessageType.DEBUG, "This offer is created from Dummy"))
         self.offers = []
+        self.vendorMessages = []
 
     #
     #   After:
@@ -52,10 +55,16 @@ class DummyPinger(BasePinger):
     def order(self, offerIds):
         return Order()
 
+    def getVendorMessages(self):
+        return self.vendorMessages
+
+    def addVendorMessage(self, message):
+        self.vendorMessages.append(message)
+
 class NotAvailablePinger(BasePinger):
 
     def __init__(self):
-        pass
+        self.vendorMessages = []
 
     def searchOffers(self, seqInf):
         raise UnavailableError("This is a unavailable Dummy")
@@ -72,6 +81,12 @@ class NotAvailablePinger(BasePinger):
     def order(self, seqInf):
         raise UnavailableError("This is a unavailable Dummy")
 
+    def getVendorMessages(self):
+        return self.vendorMessages
+
+    def addVendorMessage(self, message):
+        self.vendorMessages.append(message)
+
 class AlwaysRunningPinger(BasePinger):
 
     def __init__(self):
@@ -91,3 +106,66 @@ class AlwaysRunningPinger(BasePinger):
 
     def order(self, seqInf):
         raise IsRunningError("Tis is a running Dummy")
+
+#
+#   Pinger that needs some time to answer. Used to test concurrent searches.
+#
+class SleepingPinger(DummyPinger):
+
+    def __init__(self, seconds):
+        super().__init__()
+        self.seconds = seconds
+
+    def searchOffers(self, seqInf):
+        self.running = True
+        time.sleep(self.seconds)
+        self.offers = []
+        for s in seqInf:
+            self.offers.append(SequenceOffers(sequenceInformation=s, offers=[self.tempOffer]))
+        self.running = False
+
+    def getOffers(self):
+        return self.offers
+
+#
+#   Pinger remembering the sequences of every search. Used to test which sequences reach the vendor.
+#   Orders are only accepted for offers of the last search.
+#
+class RecordingPinger(SleepingPinger):
+
+    def __init__(self):
+        super().__init__(0)
+        self.searches = []
+
+    def searchOffers(self, seqInf):
+        self.searches.append([s.sequence for s in seqInf])
+        super().searchOffers(seqInf)
+        # Every sequence gets its own offer
+        for seqOffers in self.offers:
+            seqOffers.offers = [Offer(price=Price(currency=Currency.EUR, amount=120), turnovertime=14, messages=[])]
+
+    def order(self, offerIds):
+        offerKeys = [offer.key for seqOffers in self.offers for offer in seqOffers.offers]
+        for offerId in offerIds:
+            if offerId not in offerKeys:
+                return Order(OrderType.NOT_SUPPORTED)
+        return UrlRedirectOrder("http://www.example.com")
+
+#
+#   Returns offers with messages naming the sequence like the ones of IDT
+#
+class NamingPinger(RecordingPinger):
+
+    def searchOffers(self, seqInf):
+        super().searchOffers(seqInf)
+        for seqOffers in self.offers:
+            seqOffers.offers[0].messages = [
+                Message(MessageType.INFO, seqOffers.sequenceInformation.name + "_accepted"),
+                Message(MessageType.INFO, "Synthesis is possible")]
+
+#
+#   Pinger whose offers can only be ordered for the sequence they were found for, like the ones of Twist
+#
+class StatefulPinger(RecordingPinger):
+
+    sharedOffers = False
@@ -46,5 +46,36 @@ class TestEntities(unittest.TestCase):
             # add key to list
             keys.append(key)
 
+    #
+    #   Desc:   Test offers with additional attributes.
+    #
+    def test_offer_attributes(self):
+        offerType = Entities.Offer.withAttributes(["isHq"])
+        # Offers with the same attributes share their class
+        self.assertIs(offerType, Entities.Offer.withAttributes(("isHq",)))
+        self.assertIs(Entities.Offer, Entities.Offer.withAttributes([]))
+
+        offer = offerType(turnovertime=3)
+        self.assertIsInstance(offer, Entities.Offer)
+        self.assertEqual({}, offer.getAttributes())
+        offer.isHq = True
+        self.assertEqual({"isHq": True}, offer.getAttributes())
+        self.assertEqual({}, Entities.Offer().getAttributes())
+
+        # Entities only have their own attributes
+        with self.assertRaises(AttributeError):
+            Entities.Offer().isHq = True
+        with self.assertRaises(AttributeError):
+            Entities.SequenceInformation("ACTG").color = "red"
+
+    #
+    #   Desc:   Test that interned messages are shared.
+    #
+    def test_message_intern(self):
+        message = Entities.Message.intern(Entities.MessageType.INFO, "accepted")
+        self.assertIs(message, Entities.Message.intern(Entities.MessageType.INFO, "accepted"))
+        self.assertIsNot(message, Entities.Message.intern(Entities.MessageType.DEBUG, "accepted"))
+        self.assertEqual("accepted", message.text)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,138 @@
+import threading
+import time
+import unittest
+
+import requests
+
+from Pinger import Entities, GeneArt
+
+#
+#   GeneArt client answering without the GeneArt API. Every construct is accepted.
+#   The validation of a product waits delays[product] seconds and raises errors[product] if given.
+#
+class FakeGeneArtClient():
+
+    def __init__(self, delays=None, errors=None):
+        self.delays = delays or {}
+        self.errors = errors or {}
+        self.validated = []
+        self.lock = threading.Lock()
+
+    def projectValidate(self, sequences, product):
+        time.sleep(self.delays.get(product, 0))
+        if product in self.errors:
+            raise self.errors[product]
+        with self.lock:
+            self.validated.append(product)
+        eComInfo = {"productionDaysEstimated": 5, "currencyIsoCode": "EUR",
+                    "lineItems": [{"customerSpecificPrice": 10 if product == "dnaStrings" else 20}]}
+        return {"name": "project", "constructs": [{"name": seq["name"], "product": product, "accepted": True,
+                                                   "reasons": [], "eComInfo": eComInfo} for seq in sequences]}
+
+class TestGeneArtProducts(unittest.TestCase):
+
+    name = "GeneArtProducts"
+
+    def createPinger(self, client, dnaStrings=True, hqDnaStrings=True, batchSize=GeneArt.GeneArt.batchSize_default):
+        return GeneArt.GeneArt("username", "token", dnaStrings=dnaStrings, hqDnaStrings=hqDnaStrings, client=client,
+                               batchSize=batchSize)
+
+    def createSequences(self, count):
+        return [Entities.SequenceInformation("ACGT", "Seq" + str(i), "s" + str(i)) for i in range(count)]
+
+    #
+    #   Desc:   Test that getProducts returns the enabled products for every combination of the flags.
+    #           The flags are enabled by True, 'enabled' or 'true' (as read from config.yml).
+    #
+    def testGetProducts(self):
+        print ("--->>> Start test for: " + TestGeneArtProducts.name + " - GetProducts")
+        client = FakeGeneArtClient()
+        for enabled, disabled in (True, False), ("enabled", "disabled"), ("true", "false"), ("True", "False"):
+            self.assertEqual(["dnaStrings", "hqDnaStrings"], self.createPinger(client, enabled, enabled).getProducts())
+            self.assertEqual(["dnaStrings"], self.createPinger(client, enabled, disabled).getProducts())
+            self.assertEqual(["hqDnaStrings"], self.createPinger(client, disabled, enabled).getProducts())
+            self.assertEqual([], self.createPinger(client, disabled, disabled).getProducts())
+
+    #
+    #   Desc:   Test that searchOffers only validates the enabled products and
+    #           gives every sequence an empty offer list if no product is enabled.
+    #
+    def testSearchEnabledProducts(self):
+        print ("--->>> Start test for: " + TestGeneArtProducts.name + " - SearchEnabledProducts")
+        sequences = self.createSequences(2)
+        for dnaStrings, hqDnaStrings in (True, True), (True, False), (False, True), (False, False):
+            client = FakeGeneArtClient()
+            pinger = self.createPinger(client, dnaStrings, hqDnaStrings)
+            pinger.searchOffers(sequences)
+            products = pinger.getProducts()
+            self.assertEqual(sorted(products), sorted(client.validated))
+            offers = pinger.getOffers()
+            if products:
+                self.assertEqual(len(sequences) * len(products), len(offers))
+                self.assertEqual([product == "hqDnaStrings" for product in products for _ in sequences],
+                                 [seqOffer.offers[0].isHq for seqOffer in offers])
+            else:
+                self.assertEqual([seq.key for seq in sequences], [seqOffer.sequenceInformation.key for seqOffer in offers])
+                self.assertTrue(all(seqOffer.offers == [] for seqOffer in offers))
+            self.assertFalse(pinger.isRunning())
+
+    #
+    #   Desc:   Test that the offers keep the order of the products and sequences,
+    #           even if the hqDnaStrings validation finishes before the dnaStrings validation.
+    #
+    def testOutOfOrderProducts(self):
+        print ("--->>> Start test for: " + TestGeneArtProducts.name + " - OutOfOrderProducts")
+        client = FakeGeneArtClient(delays={"dnaStrings": 0.3})
+        pinger = self.createPinger(client)
+        sequences = self.createSequences(3)
+        pinger.searchOffers(sequences)
+
+        self.assertEqual(["hqDnaStrings", "dnaStrings"], client.validated)
+        offers = pinger.getOffers()
+        self.assertEqual([seq.key for seq in sequences] * 2, [seqOffer.sequenceInformation.key for seqOffer in offers])
+        self.assertEqual([False] * 3 + [True] * 3, [seqOffer.offers[0].isHq for seqOffer in offers])
+        self.assertEqual([10] * 3 + [20] * 3, [seqOffer.offers[0].price.amount for seqOffer in offers])
+
+    #
+    #   Desc:   Test that an error in the validation of one product fails the search with an UnavailableError
+    #           caused by that error, after the other product was validated, and that the pinger can search again.
+    #
+    def testProductError(self):
+        print ("--->>> Start test for: " + TestGeneArtProducts.name + " - ProductError")
+        error = RuntimeError("validation failed")
+        client = FakeGeneArtClient(delays={"hqDnaStrings": 0.1}, errors={"hqDnaStrings": error})
+        pinger = self.createPinger(client)
+        sequences = self.createSequences(2)
+
+        with self.assertRaises(Entities.UnavailableError) as context:
+            pinger.searchOffers(sequences)
+        self.assertIs(error, context.exception.__cause__)
+        self.assertEqual(["dnaStrings"], client.validated)
+        self.assertFalse(pinger.isRunning())
+        self.assertEqual([], pinger.getOffers())
+
+        client.errors = {}
+        pinger.searchOffers(sequences)
+        self.assertEqual(4, len(pinger.getOffers()))
+
+    #
+    #   Desc:   Test that the pinger stops running, if the requests of all chunks fail, and can search again.
+    #
+    def testAllChunksFail(self):
+        print ("--->>> Start test for: " + TestGeneArtProducts.name + " - AllChunksFail")
+        error = requests.exceptions.ConnectionError("connection refused")
+        client = FakeGeneArtClient(errors={"dnaStrings": error, "hqDnaStrings": error})
+        pinger = self.createPinger(client, batchSize=2)
+        sequences = self.createSequences(5)
+
+        with self.assertRaises(Entities.UnavailableError):
+            pinger.searchOffers(sequences)
+        self.assertFalse(pinger.isRunning())
+        self.assertTrue(pinger.waitForCompletion(1))
+
+        client.errors = {}
+        pinger.searchOffers(sequences)
+        self.assertEqual(10, len(pinger.getOffers()))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+
+import requests
+
+from Pinger import Entities, IDT
+
+#
+#   IDT client answering without the IDT API. Every sequence passes the screening.
+#   If error is given, every screening request raises it.
+#
+class FakeIDTClient():
+
+    def __init__(self, error=None):
+        self.token = "token"
+        self.error = error
+        self.requests = 0
+
+    def screening(self, sequences):
+        self.requests = self.requests + 1
+        if self.error is not None:
+            raise self.error
+        return [[] for _ in sequences]
+
+class TestIDTChunks(unittest.TestCase):
+
+    name = "IDTChunks"
+
+    def createPinger(self, client):
+        return IDT.IDT("username", "password", "client_id", "client_secret", "shared_secret", client=client,
+                       batchSize=2, parallelism=2)
+
+    def createSequences(self, count):
+        return [Entities.SequenceInformation("ACGT", "Seq" + str(i), "s" + str(i)) for i in range(count)]
+
+    #
+    #   Desc:   Test that the sequences are screened in chunks and get their offers in order.
+    #
+    def testChunks(self):
+        print ("--->>> Start test for: " + TestIDTChunks.name + " - Chunks")
+        client = FakeIDTClient()
+        pinger = self.createPinger(client)
+        sequences = self.createSequences(5)
+        pinger.searchOffers(sequences)
+        self.assertEqual(3, client.requests)
+        self.assertEqual([seq.key for seq in sequences], [seqOffers.sequenceInformation.key for seqOffers in pinger.getOffers()])
+        self.assertEqual("Seq4_accepted", pinger.getOffers()[4].offers[0].messages[0].text)
+
+    #
+    #   Desc:   Test that the pinger stops running, if the requests of all chunks fail, and can search again.
+    #
+    def testAllChunksFail(self):
+        print ("--->>> Start test for: " + TestIDTChunks.name + " - AllChunksFail")
+        client = FakeIDTClient(requests.exceptions.ConnectionError("connection refused"))
+        pinger = self.createPinger(client)
+        sequences = self.createSequences(5)
+
+        with self.assertRaises(Entities.UnavailableError):
+            pinger.searchOffers(sequences)
+        self.assertEqual(3, client.requests)
+        self.assertFalse(pinger.isRunning())
+        self.assertTrue(pinger.waitForCompletion(1))
+
+        client.error = None
+        pinger.searchOffers(sequences)
+        self.assertEqual(5, len(pinger.getOffers()))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import random
+import unittest
+
+import numpy as np
+
+from Pinger.KmerIndex import KmerIndex, hashKmers
+from Pinger.Scanner import encodeSequences
+
+class TestKmerIndex(unittest.TestCase):
+
+    name = "KmerIndex"
+
+    #
+    #   Desc:   Test that equal k-mers get equal hashes for every k.
+    #
+    def testHash(self):
+        print ("--->>> Start test for: " + TestKmerIndex.name + " - Hash")
+        random.seed(1)
+        sequence = "".join(random.choice("ACGT") for _ in range(300))
+        codes = encodeSequences([sequence + sequence])[0]
+        for k in (1, 2, 7, 20, 33, 64):
+            hashes = hashKmers(codes, k)
+            self.assertEqual(len(codes) - k + 1, len(hashes))
+            self.assertTrue(np.array_equal(hashes[:300 - k + 1], hashes[300:600 - k + 1]))
+            if k >= 20:
+                self.assertEqual(300 - k + 1, len(np.unique(hashes[:300 - k + 1])))
+        self.assertEqual(0, len(hashKmers(codes, 601)))
+
+    #
+    #   Desc:   Test that repeats are found inside of sequences, but not across them.
+    #
+    def testRepeats(self):
+        print ("--->>> Start test for: " + TestKmerIndex.name + " - Repeats")
+        index = KmerIndex(["ACGTACCCCACGTAG", "ACGTAG", "", "TTTTTT", "ACGTANNNACGTA"], k=5)
+        self.assertEqual([1, 0, 0, 1, 1], list(index.repeats))
+        self.assertEqual("ACGTA", index.getRepeat(0))
+        self.assertEqual("TTTTT", index.getRepeat(3))
+        self.assertIsNone(index.getRepeat(1))
+        # k-mers with other characters are left out
+        self.assertEqual(1, index.kmers[4])
+        self.assertEqual("ACGTA", index.getRepeat(4))
+
+    #
+    #   Desc:   Test that similar sequences are paired.
+    #
+    def testSimilarPairs(self):
+        print ("--->>> Start test for: " + TestKmerIndex.name + " - SimilarPairs")
+        random.seed(3)
+        sequences = ["".join(random.choice("ACGT") for _ in range(500)) for _ in range(20)]
+        # Sequence 20 is a part of sequence 3, sequence 21 is sequence 7 with a mutation
+        sequences.append(sequences[3][100:300])
+        sequences.append(sequences[7][:250] + ("A" if sequences[7][250] != "A" else "T") + sequences[7][251:])
+
+        pairs = KmerIndex(sequences, k=16).getSimilarPairs(0.8)
+        self.assertEqual([(3, 20), (7, 21)], [(first, second) for first, second, similarity in pairs])
+        self.assertAlmostEqual(1.0, pairs[0][2])
+        self.assertLess(pairs[1][2], 1.0)
+
+        # k-mers found in too many sequences are not compared
+        self.assertEqual([], KmerIndex(["ACGTACGTAC"] * 3, k=4, maxOccurrences=2).getSimilarPairs(0.5))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,184 @@
+import os
+import tempfile
+import time
+import unittest
+
+from Pinger import Entities
+from Pinger.ClientPool import VendorClientPool, LazyPinger
+from Pinger.OfferCache import InMemoryOfferCache, SqliteOfferCache, CachingPinger
+from dummy.pinger import RecordingPinger, NamingPinger
+
+class TestOfferCache(unittest.TestCase):
+
+    name = "OfferCache"
+
+    #
+    #   Desc:   Test expiration and eviction of the in-memory cache.
+    #
+    def testInMemoryOfferCache(self):
+        print ("--->>> Start test for: " + TestOfferCache.name + " - InMemoryOfferCache")
+        offers = [Entities.Offer()]
+
+        cache = InMemoryOfferCache(ttl=0.1, maxEntries=2)
+        cache.put("a", offers)
+        self.assertIs(offers, cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+
+        # Expired entries are not returned
+        time.sleep(0.15)
+        self.assertIsNone(cache.get("a"))
+
+        # Least recently used entry is removed
+        cache = InMemoryOfferCache(ttl=60, maxEntries=2)
+        cache.put("a", offers)
+        cache.put("b", offers)
+        cache.get("a")
+        cache.put("c", offers)
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("c"))
+
+        cache.clear()
+        self.assertIsNone(cache.get("a"))
+
+    #
+    #   Desc:   Test storing offers in the SQLite cache and reading them after a restart.
+    #
+    def testSqliteOfferCache(self):
+        print ("--->>> Start test for: " + TestOfferCache.name + " - SqliteOfferCache")
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cache", "offers.db")
+            # Offers with additional attributes like the ones of GeneArt
+            offerType = Entities.Offer.withAttributes(["isHq"])
+            offer = offerType(price=Entities.Price(amount=12.5, currency=Entities.Currency.USD, customerSpecific=True),
+                              turnovertime=7,
+                              messages=[Entities.Message(Entities.MessageType.INFO, "dnaStrings_accepted")])
+            offer.isHq = True
+            key = (1, "digest", "options")
+
+            cache = SqliteOfferCache(path, ttl=60)
+            self.assertIsNone(cache.get(key))
+            cache.put(key, [offer, Entities.Offer(messages=[])])
+
+            # A new cache on the same file knows the offers
+            offers = SqliteOfferCache(path, ttl=60).get(key)
+            self.assertEqual(2, len(offers))
+            self.assertEqual(12.5, offers[0].price.amount)
+            self.assertEqual(Entities.Currency.USD, offers[0].price.currency)
+            self.assertTrue(offers[0].price.customerSpecific)
+            self.assertEqual(7, offers[0].turnovertime)
+            self.assertEqual(Entities.MessageType.INFO, offers[0].messages[0].messageType)
+            self.assertEqual("dnaStrings_accepted", offers[0].messages[0].text)
+            self.assertTrue(offers[0].isHq)
+            self.assertEqual([], offers[1].messages)
+            self.assertIsNone(cache.get((2, "digest", "options")))
+
+            # Storing again replaces the offers
+            cache.put(key, [offer])
+            self.assertEqual(1, len(cache.get(key)))
+
+            # Expired entries are not returned and are deleted
+            expiredCache = SqliteOfferCache(path, ttl=0)
+            self.assertIsNone(expiredCache.get(key))
+            self.assertIsNone(cache.get(key))
+
+    #
+    #   Desc:   Test that only sequences missing in the cache are sent to the vendor.
+    #
+    def testCachingPinger(self):
+        print ("--->>> Start test for: " + TestOfferCache.name + " - CachingPinger")
+        cache = InMemoryOfferCache()
+        vendor = RecordingPinger()
+        pinger = CachingPinger(vendor, cache, 1)
+
+        pinger.searchOffers([Entities.SequenceInformation("ACTG", "s1", "s1"),
+                             Entities.SequenceInformation("GGCC", "s2", "s2")])
+        self.assertEqual([["ACTG", "GGCC"]], vendor.searches)
+        firstKeys = [seqOffers.offers[0].key for seqOffers in pinger.getOffers()]
+
+        # Another session with one known sequence. Case and whitespace do not matter.
+        otherVendor = RecordingPinger()
+        otherPinger = CachingPinger(otherVendor, cache, 1)
+        otherPinger.searchOffers([Entities.SequenceInformation("actg\n", "s3", "s3"),
+                                  Entities.SequenceInformation("TTTT", "s4", "s4")])
+        self.assertEqual([["TTTT"]], otherVendor.searches)
+
+        offers = otherPinger.getOffers()
+        self.assertEqual(["s3", "s4"], [seqOffers.sequenceInformation.key for seqOffers in offers])
+        self.assertEqual(1, len(offers[0].offers))
+        self.assertEqual(120, offers[0].offers[0].price.amount)
+
+        # Cached offers get new keys and can be ordered
+        self.assertNotIn(offers[0].offers[0].key, firstKeys)
+        order = otherPinger.order([offers[0].offers[0].key])
+        self.assertEqual(Entities.OrderType.URL_REDIRECT, order.getType())
+
+        # Other vendors and options do not share offers
+        CachingPinger(otherVendor, cache, 2).searchOffers([Entities.SequenceInformation("ACTG", "s1", "s1")])
+        CachingPinger(otherVendor, cache, 1, "hq").searchOffers([Entities.SequenceInformation("ACTG", "s1", "s1")])
+        self.assertEqual([["TTTT"], ["ACTG"], ["ACTG"]], otherVendor.searches)
+
+    #
+    #   Desc:   Test that offers with vendor errors are not cached.
+    #
+    def testVendorErrorsNotCached(self):
+        print ("--->>> Start test for: " + TestOfferCache.name + " - CachingPinger with vendor errors")
+        vendor = UnavailableOffersPinger()
+        pinger = CachingPinger(vendor, InMemoryOfferCache(), 1)
+
+        pinger.searchOffers([Entities.SequenceInformation("ACTG", "s1", "s1")])
+        pinger.searchOffers([Entities.SequenceInformation("ACTG", "s1", "s1")])
+        self.assertEqual(2, len(vendor.searches))
+
+    #
+    #   Desc:   Test that messages naming the sequence get the name of the sequence of the session.
+    #
+    def testCachedMessages(self):
+        print ("--->>> Start test for: " + TestOfferCache.name + " - CachingPinger with named messages")
+        cache = InMemoryOfferCache()
+        CachingPinger(NamingPinger(), cache, 1).searchOffers([Entities.SequenceInformation("ACTG", "secret", "s1")])
+
+        otherVendor = NamingPinger()
+        otherPinger = CachingPinger(otherVendor, cache, 1)
+        otherPinger.searchOffers([Entities.SequenceInformation("ACTG", "mine", "s2")])
+        self.assertEqual([], otherVendor.searches)
+        texts = [message.text for message in otherPinger.getOffers()[0].offers[0].messages]
+        self.assertEqual(["mine_accepted", "Synthesis is possible"], texts)
+
+    #
+    #   Desc:   Test ordering cached offers of a vendor pinger created lazily (see BasePinger.registerOffers).
+    #
+    def testCachingLazyPinger(self):
+        print ("--->>> Start test for: " + TestOfferCache.name + " - CachingPinger with LazyPinger")
+        cache = InMemoryOfferCache()
+        pool = VendorClientPool()
+        pool.get("vendor", lambda: "client")
+        seq = Entities.SequenceInformation("ACTG", "s1", "s1")
+        CachingPinger(LazyPinger(pool, "vendor", None, lambda client: RecordingPinger()), cache, 1).searchOffers([seq])
+
+        vendor = RecordingPinger()
+        lazy = LazyPinger(pool, "vendor", None, lambda client: vendor)
+        pinger = CachingPinger(lazy, cache, 1)
+        pinger.searchOffers([seq])
+        self.assertEqual([], vendor.searches)
+        # The vendor pinger is created for ordering and gets the cached offers
+        order = pinger.order([pinger.getOffers()[0].offers[0].key])
+        self.assertEqual(Entities.OrderType.URL_REDIRECT, order.getType())
+        self.assertIs(pinger.getOffers(), vendor.offers)
+
+        # Offers holding state for ordering are not shared
+        self.assertTrue(pinger.sharedOffers)
+        self.assertFalse(CachingPinger(LazyPinger(pool, "vendor", None, None, sharedOffers=False), cache, 1).sharedOffers)
+
+#
+#   Returns offers with a vendor error
+#
+class UnavailableOffersPinger(RecordingPinger):
+
+    def searchOffers(self, seqInf):
+        super().searchOffers(seqInf)
+        for seqOffers in self.offers:
+            seqOffers.offers[0].messages.append(Entities.Message(Entities.MessageType.API_CURRENTLY_UNAVAILABLE))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import random
+import unittest
+
+from Pinger.Scanner import scanSequences, encodeSequences, C, G, OTHER
+
+#
+#   Naive measurements to compare the scanner with
+#
+def gcContent(sequence):
+    if len(sequence) == 0:
+        return 0
+    return 100 * (sequence.count("G") + sequence.count("C")) / len(sequence)
+
+def windowGcRange(sequence, window):
+    if len(sequence) == 0:
+        return (0, 0)
+    width = min(window, len(sequence))
+    contents = [gcContent(sequence[i:i + width]) for i in range(len(sequence) - width + 1)]
+    return (min(contents), max(contents))
+
+def longestHomopolymer(sequence):
+    longest = 0
+    run = 0
+    for position in range(len(sequence)):
+        run = run + 1 if position > 0 and sequence[position] == sequence[position - 1] else 1
+        longest = max(longest, run)
+    return longest
+
+class TestScanner(unittest.TestCase):
+
+    name = "Scanner"
+
+    #
+    #   Desc:   Test that sequences are encoded one after another.
+    #
+    def testEncode(self):
+        print ("--->>> Start test for: " + TestScanner.name + " - Encode")
+        codes, offsets = encodeSequences(["ACG", "", "GNc"])
+        self.assertEqual([0, 3, 3, 6], list(offsets))
+        self.assertEqual([G, OTHER, C], list(codes[3:6]))
+
+    #
+    #   Desc:   Test the measurements against naive implementations.
+    #
+    def testScan(self):
+        print ("--->>> Start test for: " + TestScanner.name + " - Scan")
+        random.seed(4)
+        sequences = ["", "A", "GGGG", "ACGT acgt", "AAAATTTTGGGGCCCC"]
+        for _ in range(50):
+            sequences.append("".join(random.choice("AACGTTT") for _ in range(random.randint(1, 300))))
+
+        scan = scanSequences(sequences, windows=(4, 50), terminalWindow=10)
+        for index, sequence in enumerate(sequences):
+            sequence = "".join(sequence.split()).upper()
+            self.assertEqual(len(sequence), scan.lengths[index])
+            self.assertAlmostEqual(gcContent(sequence), scan.gc[index])
+            for window in (4, 50):
+                lowest, highest = windowGcRange(sequence, window)
+                self.assertAlmostEqual(lowest, scan.windowGc[window][0][index])
+                self.assertAlmostEqual(highest, scan.windowGc[window][1][index])
+            self.assertAlmostEqual(gcContent(sequence[:10]), scan.startGc[index])
+            self.assertAlmostEqual(gcContent(sequence[-10:]) if sequence else 0, scan.endGc[index])
+            run = longestHomopolymer(sequence)
+            self.assertEqual(run, scan.homopolymers[index])
+            self.assertIn(scan.homopolymerBases[index] * run, sequence)
+
+if __name__ == '__main__':
+    unittest.main()
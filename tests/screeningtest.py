@@ -0,0 +1,135 @@
+import unittest
+
+from Pinger import Entities
+import random
+
+from Pinger.Screening import ScreeningProfile, ScreeningPinger
+from dummy.pinger import RecordingPinger
+
+class TestScreening(unittest.TestCase):
+
+    name = "Screening"
+
+    #
+    #   Desc:   Test that every broken rule creates a message.
+    #
+    def testProfile(self):
+        print ("--->>> Start test for: " + TestScreening.name + " - Profile")
+        profile = ScreeningProfile(minLength=10, maxLength=20, minGc=25, maxGc=75, gcWindow=10, minWindowGc=10,
+                                   maxWindowGc=90, maxHomopolymer=6, repeatLength=8)
+        good = Entities.SequenceInformation("ACGTAGCTAG CATGCA", "Good", "good")
+        self.assertEqual([[]], profile.screen([good]))
+
+        def messageTypes(sequence):
+            return [message.messageType for message in profile.screen([Entities.SequenceInformation(sequence, "Seq", "s")])[0]]
+
+        self.assertEqual([Entities.MessageType.SEQUENCE_TOO_SHORT], messageTypes("ACGTAGCT"))
+        self.assertEqual([Entities.MessageType.SEQUENCE_TOO_LONG], messageTypes("ACGTAGCTAGCATGCATCGATCGT"))
+        self.assertEqual([Entities.MessageType.GC_PROBLEM, Entities.MessageType.GC_PROBLEM],
+                         messageTypes("ATTAATATTTAGTAAT"))
+        self.assertEqual([Entities.MessageType.TOO_MANY_REPEATS], messageTypes("ACGTAAAAAAAGCATG"))
+        self.assertEqual([Entities.MessageType.TOO_MANY_REPEATS], messageTypes("ACGTAGCTTACGTAGCTT"))
+
+        # Rules without limits are not checked
+        self.assertEqual([[]], ScreeningProfile().screen([Entities.SequenceInformation("A", "Seq", "s")]))
+
+        # Terminal GC content and multiple windows
+        profile = ScreeningProfile(gcWindow=[4, 8], maxWindowGc=90, terminalWindow=4, minTerminalGc=25)
+        messages = profile.screen([Entities.SequenceInformation("ATATGCGCGCGCATGCAT", "Seq", "s")])[0]
+        self.assertEqual(3, len(messages))
+        self.assertIn("window of 4 bp", messages[0].text)
+        self.assertIn("window of 8 bp", messages[1].text)
+        self.assertIn("first 4 bp", messages[2].text)
+
+    #
+    #   Desc:   Test that similar sequences of a search are reported.
+    #
+    def testHomology(self):
+        print ("--->>> Start test for: " + TestScreening.name + " - Homology")
+        random.seed(2)
+        sequence = "".join(random.choice("ACGT") for _ in range(400))
+        seqInf = [Entities.SequenceInformation(sequence, "Seq1", "s1"),
+                  Entities.SequenceInformation(sequence[:200] + ("A" if sequence[200] != "A" else "T") + sequence[201:],
+                                               "Seq2", "s2"),
+                  Entities.SequenceInformation("".join(random.choice("ACGT") for _ in range(400)), "Seq3", "s3")]
+
+        result = ScreeningProfile(homologyLength=20, maxSimilarity=0.8).screen(seqInf)
+        self.assertEqual([Entities.MessageType.HOMOLOGY], [message.messageType for message in result[0]])
+        self.assertIn("Seq2", result[0][0].text)
+        self.assertIn("Seq1", result[1][0].text)
+        self.assertEqual([], result[2])
+
+        # Only similarities above the limit are reported
+        self.assertEqual([[], [], []], ScreeningProfile(homologyLength=20, maxSimilarity=0.99).screen(seqInf))
+
+    #
+    #   Desc:   Test that only sequences passing the screening are sent to the vendor.
+    #
+    def testScreeningPinger(self):
+        print ("--->>> Start test for: " + TestScreening.name + " - ScreeningPinger")
+        vendor = RecordingPinger()
+        pinger = ScreeningPinger(vendor, ScreeningProfile(maxLength=10))
+        seqInf = [Entities.SequenceInformation("ACGT", "Seq1", "s1"),
+                  Entities.SequenceInformation("ACGTACGTACGT", "Seq2", "s2"),
+                  Entities.SequenceInformation("GGCC", "Seq3", "s3")]
+
+        pinger.searchOffers(seqInf)
+        self.assertEqual([["ACGT", "GGCC"]], vendor.searches)
+        offers = pinger.getOffers()
+        self.assertEqual(["s1", "s2", "s3"], [seqOffers.sequenceInformation.key for seqOffers in offers])
+        self.assertEqual(120, offers[0].offers[0].price.amount)
+        self.assertEqual(-1, offers[1].offers[0].price.amount)
+        self.assertEqual(Entities.MessageType.SEQUENCE_TOO_LONG, offers[1].offers[0].messages[0].messageType)
+
+        # Offers of the vendor can be ordered
+        self.assertIsInstance(pinger.order([offers[2].offers[0].key]), Entities.UrlRedirectOrder)
+
+        # The vendor is not contacted, if all sequences are rejected
+        pinger.searchOffers(seqInf[1:2])
+        self.assertEqual(1, len(vendor.searches))
+        self.assertEqual(1, len(pinger.getOffers()))
+
+    #
+    #   Desc:   Test that similar sequences are still sent to the vendor with a warning,
+    #           unless the profile rejects them.
+    #
+    def testHomologyWarning(self):
+        print ("--->>> Start test for: " + TestScreening.name + " - HomologyWarning")
+        random.seed(3)
+        sequence = "".join(random.choice("ACGT") for _ in range(200))
+        seqInf = [Entities.SequenceInformation(sequence, "Seq1", "s1"),
+                  Entities.SequenceInformation(sequence[:100] + ("A" if sequence[100] != "A" else "T") + sequence[101:],
+                                               "Seq2", "s2"),
+                  Entities.SequenceInformation("".join(random.choice("ACGT") for _ in range(200)), "Seq3", "s3")]
+
+        vendor = RecordingPinger()
+        pinger = ScreeningPinger(vendor, ScreeningProfile(homologyLength=20, maxSimilarity=0.8))
+        pinger.searchOffers(seqInf)
+        self.assertEqual([[seq.sequence for seq in seqInf]], vendor.searches)
+        offers = pinger.getOffers()
+        for seqOffers, other in zip(offers, ["Seq2", "Seq1"]):
+            offer = seqOffers.offers[0]
+            self.assertEqual(120, offer.price.amount)
+            self.assertEqual([Entities.MessageType.HOMOLOGY], [message.messageType for message in offer.messages])
+            self.assertTrue(offer.messages[0].text.startswith("Warning: "))
+            self.assertIn(other, offer.messages[0].text)
+        self.assertEqual([], offers[2].offers[0].messages)
+
+        # The offers of the vendor are not changed and can be ordered
+        self.assertEqual([], vendor.getOffers()[0].offers[0].messages)
+        self.assertIsInstance(pinger.order([offers[0].offers[0].key]), Entities.UrlRedirectOrder)
+
+        # Vendors rejecting similar sequences only get the others
+        vendor = RecordingPinger()
+        pinger = ScreeningPinger(vendor, ScreeningProfile(homologyLength=20, maxSimilarity=0.8, rejectHomologs=True))
+        pinger.searchOffers(seqInf)
+        self.assertEqual([[seqInf[2].sequence]], vendor.searches)
+        offers = pinger.getOffers()
+        for seqOffers in offers[:2]:
+            self.assertEqual(-1, seqOffers.offers[0].price.amount)
+            self.assertEqual(Entities.MessageType.HOMOLOGY, seqOffers.offers[0].messages[0].messageType)
+            self.assertFalse(seqOffers.offers[0].messages[0].text.startswith("Warning: "))
+        self.assertEqual(120, offers[2].offers[0].price.amount)
+
+if __name__ == '__main__':
+    unittest.main()
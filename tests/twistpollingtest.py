@@ -0,0 +1,83 @@
+import unittest
+
+from Pinger.Twist import PollingStrategy, TwistError, TwistClient
+
+#
+#   Polling strategy recording the waits instead of sleeping
+#
+class RecordingPollingStrategy(PollingStrategy):
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.sleeps = []
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+
+#
+#   Response with headers only
+#
+class HeaderResponse():
+
+    def __init__(self, headers):
+        self.headers = headers
+
+class TestTwistPolling(unittest.TestCase):
+
+    name = "TwistPolling"
+
+    #
+    #   Desc:   Test that intervals grow exponentially up to the maximum.
+    #
+    def testBackoff(self):
+        print ("--->>> Start test for: " + TestTwistPolling.name + " - Backoff")
+        polling = RecordingPollingStrategy(initial_interval=0.5, max_interval=3, multiplier=2, jitter=0)
+        results = iter([(False, None, None)] * 5 + [(True, "done", None)])
+        self.assertEqual("done", polling.poll(lambda: next(results)))
+        self.assertEqual([0.5, 1, 2, 3, 3], polling.sleeps)
+
+        # A result available at once is returned without waiting
+        polling = RecordingPollingStrategy()
+        self.assertEqual("done", polling.poll(lambda: (True, "done", None)))
+        self.assertEqual([], polling.sleeps)
+
+    #
+    #   Desc:   Test that intervals are changed randomly within the jitter.
+    #
+    def testJitter(self):
+        print ("--->>> Start test for: " + TestTwistPolling.name + " - Jitter")
+        polling = RecordingPollingStrategy(initial_interval=1, max_interval=1, jitter=0.2)
+        results = iter([(False, None, None)] * 50 + [(True, "done", None)])
+        polling.poll(lambda: next(results))
+        for seconds in polling.sleeps:
+            self.assertTrue(0.8 <= seconds <= 1.2)
+        self.assertGreater(len(set(polling.sleeps)), 1)
+
+    #
+    #   Desc:   Test that delays requested by the server are used instead of the interval.
+    #
+    def testRetryAfter(self):
+        print ("--->>> Start test for: " + TestTwistPolling.name + " - RetryAfter")
+        polling = RecordingPollingStrategy(initial_interval=0.5, jitter=0)
+        results = iter([(False, None, 7), (False, None, None), (True, "done", None)])
+        polling.poll(lambda: next(results))
+        self.assertEqual([7, 0.5], polling.sleeps)
+
+        # Parsing of the header
+        client = TwistClient.__new__(TwistClient)
+        self.assertEqual(120, client.get_retry_after(HeaderResponse({'Retry-After': '120'})))
+        self.assertIsNone(client.get_retry_after(HeaderResponse({})))
+        self.assertEqual(0, client.get_retry_after(HeaderResponse({'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'})))
+        self.assertIsNone(client.get_retry_after(HeaderResponse({'Retry-After': 'soon'})))
+
+    #
+    #   Desc:   Test that polling stops after the deadline.
+    #
+    def testDeadline(self):
+        print ("--->>> Start test for: " + TestTwistPolling.name + " - Deadline")
+        polling = RecordingPollingStrategy(initial_interval=0.01, deadline=0)
+        with self.assertRaises(TwistError):
+            polling.poll(lambda: (False, None, None))
+
+if __name__ == '__main__':
+    unittest.main()
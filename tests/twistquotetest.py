@@ -0,0 +1,170 @@
+import copy
+import time
+import unittest
+
+from Pinger import Entities, Twist
+
+#
+#   Twist client answering without the Twist API. Every construct is buildable.
+#
+class FakeTwistClient():
+
+    def __init__(self):
+        self.quotes = 0
+        self.deleted = []
+
+    def submit_constructs(self, seqInf, typ='NON_CLONED_GENE'):
+        return [{'id': "%036d" % int(seq['idN'][1:])} for seq in seqInf]
+
+    def get_scores(self, ids, max_errors=100):
+        return [{'id': id_, 'name': id_, 'score': 'BUILDABLE', 'score_data': {'issues': []}} for id_ in ids]
+
+    def get_email_url(self, url):
+        return url.format("email")
+
+    def post(self, url, json, target=200):
+        self.quotes = self.quotes + 1
+        return {'id': "quote" + str(self.quotes)}
+
+    def check_quote(self, quote_id):
+        return {'tat': {'business_days': 3}, 'quote': {'price': 9}, 'pdf_download_link': quote_id + ".pdf"}
+
+    def delete_quote(self, quote_id):
+        self.deleted.append(quote_id)
+
+    def get_profile(self, refresh=False):
+        return {'address': "address", 'payments': [{'id': "payment"}]}
+
+#
+#   Twist client counting the requests for the profile without the Twist API.
+#
+class ProfileTwistClient(Twist.TwistClient):
+
+    def __init__(self, profile_max_age):
+        self.requests = 0
+        super().__init__("email", "password", "apitoken", "eutoken", "username", "first", "last",
+                         profile_max_age=profile_max_age)
+
+    def get_addresses(self):
+        self.requests = self.requests + 1
+        return [{'id': "other", 'first_name': "other", 'last_name': "other"},
+                {'id': "address", 'first_name': "first", 'last_name': "last"}]
+
+    def get_payments(self):
+        return [{'id': "payment"}]
+
+class TestTwistQuote(unittest.TestCase):
+
+    name = "TwistQuote"
+
+    def createPinger(self, client, quoteMaxAge=60):
+        return Twist.Twist("email", "password", "apitoken", "eutoken", "username", "first", "last",
+                           client=client, quoteMaxAge=quoteMaxAge)
+
+    def waitForDeletion(self, client, count):
+        for _ in range(100):
+            if len(client.deleted) >= count:
+                break
+            time.sleep(0.02)
+
+    #
+    #   Desc:   Test that the quote of the search is used for ordering the same constructs.
+    #
+    def testReuseQuote(self):
+        print ("--->>> Start test for: " + TestTwistQuote.name + " - ReuseQuote")
+        client = FakeTwistClient()
+        pinger = self.createPinger(client)
+        sequences = [Entities.SequenceInformation("ACGT", "Seq" + str(i), "s" + str(i)) for i in range(3)]
+        pinger.searchOffers(sequences)
+        self.assertEqual(1, client.quotes)
+
+        offerIds = [seqOffers.offers[0].key for seqOffers in pinger.getOffers()]
+        order = pinger.order(offerIds)
+        self.assertEqual("quote1.pdf", order.url)
+        self.assertEqual(1, client.quotes)
+
+        # The quote is used only once. It is not deleted, because it belongs to the order.
+        pinger.order(offerIds)
+        self.assertEqual(2, client.quotes)
+        pinger.clear()
+        time.sleep(0.1)
+        self.assertEqual([], client.deleted)
+
+    #
+    #   Desc:   Test that other constructs get a new quote and unused quotes are deleted in the background.
+    #
+    def testNewQuote(self):
+        print ("--->>> Start test for: " + TestTwistQuote.name + " - NewQuote")
+        client = FakeTwistClient()
+        pinger = self.createPinger(client)
+        sequences = [Entities.SequenceInformation("ACGT", "Seq" + str(i), "s" + str(i)) for i in range(3)]
+        pinger.searchOffers(sequences)
+
+        # Ordering a part of the constructs needs a new quote
+        order = pinger.order([pinger.getOffers()[0].offers[0].key])
+        self.assertEqual("quote2.pdf", order.url)
+
+        # The quote of the search is deleted when replaced
+        pinger.searchOffers(sequences)
+        self.waitForDeletion(client, 1)
+        self.assertEqual(["quote1"], client.deleted)
+
+        pinger.clear()
+        self.waitForDeletion(client, 2)
+        self.assertEqual(["quote1", "quote3"], client.deleted)
+
+    #
+    #   Desc:   Test that quotes expire.
+    #
+    def testExpiredQuote(self):
+        print ("--->>> Start test for: " + TestTwistQuote.name + " - ExpiredQuote")
+        client = FakeTwistClient()
+        pinger = self.createPinger(client, quoteMaxAge=0.05)
+        sequences = [Entities.SequenceInformation("ACGT", "Seq1", "s1")]
+        pinger.searchOffers(sequences)
+        self.waitForDeletion(client, 1)
+        self.assertEqual(["quote1"], client.deleted)
+
+        order = pinger.order([pinger.getOffers()[0].offers[0].key])
+        self.assertEqual("quote2.pdf", order.url)
+
+    #
+    #   Desc:   Test that offers are found by their construct ids, even if they were copied (see CachingPinger).
+    #
+    def testConstructIndex(self):
+        print ("--->>> Start test for: " + TestTwistQuote.name + " - ConstructIndex")
+        client = FakeTwistClient()
+        pinger = self.createPinger(client)
+        sequences = [Entities.SequenceInformation("ACGT", "Seq" + str(i), "s" + str(i)) for i in range(3)]
+        pinger.searchOffers(sequences)
+        self.assertEqual("%036d" % 1, pinger.getOffers()[1].offers[0].constructId)
+
+        copies = []
+        for seqOffers in pinger.getOffers():
+            offer = copy.copy(seqOffers.offers[0])
+            offer.key = Entities.Offer.generateId()
+            copies.append(Entities.SequenceOffers(seqOffers.sequenceInformation, [offer]))
+        pinger.offers = copies
+        index = pinger.get_construct_index()
+        self.assertEqual(("s2", "%036d" % 2), (index[copies[2].offers[0].key][0].key, index[copies[2].offers[0].key][1]))
+
+        self.assertRaises(Entities.InvalidInputError, pinger.order, [-1])
+
+    #
+    #   Desc:   Test that the profile is loaded once and again after its maximum age.
+    #
+    def testProfile(self):
+        print ("--->>> Start test for: " + TestTwistQuote.name + " - Profile")
+        client = ProfileTwistClient(profile_max_age=0.1)
+        self.assertEqual("address", client.address)
+        self.assertEqual({'address': "address", 'payments': [{'id': "payment"}]}, client.get_profile())
+        self.assertEqual(1, client.requests)
+
+        client.get_profile(refresh=True)
+        self.assertEqual(2, client.requests)
+        time.sleep(0.15)
+        client.get_profile()
+        self.assertEqual(3, client.requests)
+
+if __name__ == '__main__':
+    unittest.main()
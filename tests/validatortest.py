@@ -1,4 +1,6 @@
+import sys
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 
 from Pinger import Entities, Validator
 
@@ -87,5 +89,117 @@ class TestEntities(unittest.TestCase):
         ott = Entities.VendorOffers(vendorInformation=Entities.VendorInformation(key=1, name="1", shortName="1"), offers=[Entities.Offer()], messages=[Entities.Message()])
         self.assertTrue(validator.validate(ott))
 
+    #
+    #   Desc:   Check that validated offers are checked again after changes
+    #
+    def test_changedoffers(self):
+
+        validator = Validator.EntityValidator(printError=True)
+        vendorInformation = Entities.VendorInformation(key=1, name="1", shortName="1")
+        ott = Entities.VendorOffers(vendorInformation=vendorInformation, offers=[Entities.Offer()])
+        self.assertTrue(validator.validate(ott))
+        self.assertTrue(validator.validate(ott))
+
+        # Added and replaced offers
+        ott.offers.append(Entities.Offer(turnovertime="3"))
+        self.assertFalse(validator.validate(ott))
+        ott.offers[-1] = Entities.Offer(turnovertime=3)
+        self.assertTrue(validator.validate(ott))
+        ott.offers = 1
+        self.assertFalse(validator.validate(ott))
+        ott.offers = []
+        self.assertTrue(validator.validate(ott))
+
+        # Changed information
+        vendorInformation.name = 1
+        self.assertFalse(validator.validate(ott))
+        vendorInformation.name = "1"
+        ott.vendorInformation = 1
+        self.assertFalse(validator.validate(ott))
+
+        sequenceInformation = Entities.SequenceInformation(key="1", name="1", sequence="ACTACG")
+        ott = Entities.SequenceOffers(sequenceInformation=sequenceInformation, offers=[Entities.Offer()])
+        self.assertTrue(validator.validate(ott))
+        sequenceInformation.sequence = None
+        self.assertFalse(validator.validate(ott))
+
+        # Subclasses are checked like their entity
+        class SpecialOffer(Entities.Offer):
+            pass
+        self.assertTrue(validator.validate(SpecialOffer()))
+        self.assertFalse(validator.validate(object()))
+
+    #
+    #   Desc:   Check uniqueness of keys in lists
+    #
+    def test_listkeys(self):
+
+        validator = Validator.EntityValidator(printError=True)
+        sequences = [Entities.SequenceInformation(key=str(i), name="1", sequence="ACTACG") for i in range(1000)]
+        self.assertTrue(validator.validate(sequences))
+        self.assertTrue(validator.validate([]))
+
+        sequences.append(Entities.SequenceInformation(key="500", name="1", sequence="ACTACG"))
+        self.assertFalse(validator.validate(sequences))
+        self.assertFalse(validator.validate([Entities.Offer(), Entities.Message()]))
+
+    #
+    #   Desc:   Check which objects are validated at every level
+    #
+    def test_levels(self):
+
+        validator = Validator.EntityValidator(printError=True)
+        invalid = Entities.SequenceInformation(key=1, name="1", sequence="ACTACG")
+        try:
+            self.assertFalse(validator.validate(invalid))
+            self.assertFalse(validator.validateInternal(invalid))
+
+            # Only objects at trust boundaries are validated
+            Validator.EntityValidator.configure(Validator.ValidationLevel.BOUNDARY)
+            self.assertFalse(validator.validate(invalid))
+            self.assertTrue(validator.validateInternal(invalid))
+
+            Validator.EntityValidator.configure(Validator.ValidationLevel.OFF)
+            self.assertTrue(validator.validate(invalid))
+            self.assertTrue(validator.validateInternal(invalid))
+            self.assertFalse(validator.check(invalid))
+        finally:
+            Validator.EntityValidator.configure(Validator.ValidationLevel.STRICT)
+
+    #
+    #   Desc:   Check that a validator can be used by several threads at once, like the validator of the
+    #           CompositePinger is used by the searches of all sessions
+    #
+    def test_concurrentoffers(self):
+
+        validator = Validator.EntityValidator()
+        vendorInformation = Entities.VendorInformation(key=1, name="1", shortName="1")
+        shared = [Entities.VendorOffers(vendorInformation=vendorInformation, offers=[Entities.Offer()]) for _ in range(20)]
+
+        def validate(thread):
+            results = []
+            for i in range(200):
+                # New offers are remembered and dropped again, while the shared ones are looked up
+                sequenceInformation = Entities.SequenceInformation(key=str(i), name="1", sequence="ACTACG")
+                offers = Entities.SequenceOffers(sequenceInformation=sequenceInformation, offers=[Entities.Offer()])
+                results.append(validator.validate(offers))
+                results.append(validator.validate(shared[(thread + i) % len(shared)]))
+                invalid = Entities.VendorOffers(vendorInformation=vendorInformation, offers=[Entities.Offer(turnovertime="3")])
+                results.append(not validator.validate(invalid))
+            return all(results)
+
+        switchInterval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                self.assertEqual([True] * 16, list(executor.map(validate, range(16))))
+        finally:
+            sys.setswitchinterval(switchInterval)
+
+        # Shared offers are still checked again after changes
+        shared[0].offers.append(Entities.Offer(turnovertime="3"))
+        self.assertFalse(validator.validate(shared[0]))
+        self.assertTrue(validator.validate(shared[1]))
+
 if __name__ == '__main__':
     unittest.main()